@@ -1,3 +1,5 @@
+import ast
+import functools
 import re
 import logging
 
@@ -67,4 +69,74 @@ assertion_helpers = {
     "is_in_range": is_in_range,
     "length_is": length_is,
     "matches_regex": matches_regex,
-}
\ No newline at end of file
+}
+
+
+class AssertionCompileError(ValueError):
+    """Raised when an assertion expression is malformed or uses disallowed syntax."""
+
+
+# Expressions may only read `output`, call the helpers above and use plain operators,
+# literals, subscripts, attribute access and comprehensions.
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div,
+    ast.FloorDiv, ast.Mod, ast.Pow, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd, ast.Compare, ast.Eq,
+    ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.In, ast.NotIn, ast.Is, ast.IsNot, ast.IfExp,
+    ast.Call, ast.keyword, ast.Name, ast.Load, ast.Store, ast.Constant, ast.Subscript, ast.Slice,
+    ast.Attribute, ast.List, ast.Tuple, ast.Dict, ast.Set, ast.ListComp, ast.SetComp, ast.DictComp,
+    ast.GeneratorExp, ast.comprehension, ast.JoinedStr, ast.FormattedValue,
+)
+# Format strings resolve `{0.attr}` paths at runtime, out of reach of the name checks below.
+_FORBIDDEN_ATTRIBUTES = frozenset({"format", "format_map"})
+
+
+@functools.lru_cache(maxsize=None)
+def compile_assertion(expression: str):
+    """
+    Parses and validates an assertion expression once and returns its code object.
+    Raises AssertionCompileError for syntax errors and for any construct outside the
+    whitelist, including every name or attribute starting with an underscore and
+    `str.format` / `format_map`.
+    """
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as e:
+        raise AssertionCompileError(f"Invalid syntax in assertion \"{expression}\": {e.msg}") from e
+
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise AssertionCompileError(f"'{type(node).__name__}' is not allowed in assertion \"{expression}\"")
+        name = node.id if isinstance(node, ast.Name) else node.attr if isinstance(node, ast.Attribute) else None
+        if name is not None and name.startswith('_'):
+            raise AssertionCompileError(f"Private name '{name}' is not allowed in assertion \"{expression}\"")
+        if isinstance(node, ast.Attribute) and node.attr in _FORBIDDEN_ATTRIBUTES:
+            raise AssertionCompileError(f"'.{node.attr}' is not allowed in assertion \"{expression}\"")
+    return compile(tree, '<assertion>', 'eval')
+
+
+@functools.lru_cache(maxsize=None)
+def referenced_fields(expression: str) -> frozenset[str] | None:
+    """
+    Returns the top-level output keys an assertion reads via `output['key']`, or None
+    if it uses `output` in any other way (and so may depend on the whole output).
+    """
+    tree = ast.parse(expression.strip(), mode='eval')
+    fields = set()
+    field_nodes = set()
+    for node in ast.walk(tree):
+        if (isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == 'output'
+                and isinstance(node.slice, ast.Constant) and isinstance(node.slice.value, str)):
+            fields.add(node.slice.value)
+            field_nodes.add(id(node.value))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id == 'output' and id(node) not in field_nodes:
+            return None
+    return frozenset(fields)
+
+
+_EVAL_GLOBALS = {"__builtins__": {}, **assertion_helpers}
+
+
+def evaluate_assertion(expression: str, output):
+    """Evaluates a (cached) compiled assertion against an LLM output."""
+    return eval(compile_assertion(expression), {**_EVAL_GLOBALS, "output": output})
@@ -0,0 +1,122 @@
+"""
+Streaming JSONL input and output for `main.py run`.
+
+Input records are read one line at a time and results are appended as they
+complete, so memory use does not depend on the size of the input file. Every
+result line carries the 0-based line index of its input record, which is what a
+later run uses to resume where a previous one stopped.
+"""
+import json
+import os
+from pathlib import Path
+
+
+class CompletedRecords:
+    """
+    The input indices that already have a result. Results are written roughly in
+    input order, so they are kept as a watermark below which every index is done,
+    plus the few indices that completed ahead of it.
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self.ahead = set()
+        self.count = 0
+
+    def add(self, index: int):
+        if index in self:
+            return
+        self.count += 1
+        if index != self.watermark:
+            self.ahead.add(index)
+            return
+        self.watermark += 1
+        while self.watermark in self.ahead:
+            self.ahead.remove(self.watermark)
+            self.watermark += 1
+
+    def __contains__(self, index: int) -> bool:
+        return index < self.watermark or index in self.ahead
+
+
+def scan_output(path: str | Path, retry_errors: bool = False) -> CompletedRecords:
+    """
+    Reads the results already in `path`, if it exists. A final line cut short by an
+    interrupted run (it has no trailing newline) is truncated away, so appending
+    starts on a clean line. Any other line that is not a result record raises
+    ValueError and leaves the file untouched. With `retry_errors`, records whose
+    result was an error are run again, and their error lines are removed first so
+    every index keeps a single result.
+    """
+    completed = CompletedRecords()
+    path = Path(path)
+    if not path.exists():
+        return completed
+    valid_end = 0
+    errors = 0
+    with path.open("rb") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.endswith(b"\n"):
+                break
+            result = _parse_result(line, path, number)
+            valid_end += len(line)
+            if retry_errors and "error" in result:
+                errors += 1
+            else:
+                completed.add(result["index"])
+    if errors:
+        _drop_errors(path, valid_end)
+    elif valid_end < path.stat().st_size:
+        with path.open("r+b") as f:
+            f.truncate(valid_end)
+    return completed
+
+
+def _parse_result(line: bytes, path: Path, number: int) -> dict:
+    try:
+        result = json.loads(line)
+    except ValueError as e:
+        raise ValueError(f"'{path}' line {number} is not valid JSON: {e}") from e
+    if not isinstance(result, dict) or not isinstance(result.get("index"), int) or isinstance(result["index"], bool):
+        raise ValueError(f"'{path}' line {number} is not a result record with an integer 'index'.")
+    return result
+
+
+def _drop_errors(path: Path, valid_end: int):
+    """Rewrites the first `valid_end` bytes of `path` without the error results."""
+    tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    with path.open("rb") as src, tmp_path.open("wb") as dst:
+        remaining = valid_end
+        for line in src:
+            if remaining <= 0:
+                break
+            remaining -= len(line)
+            if "error" not in json.loads(line):
+                dst.write(line)
+    os.replace(tmp_path, path)
+
+
+def iter_records(lines):
+    """Yields (index, inputs or None, error or None) for each non-blank line."""
+    for index, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            inputs = json.loads(line)
+        except ValueError as e:
+            yield index, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(inputs, dict):
+            yield index, None, "Each input record must be a JSON object."
+            continue
+        yield index, inputs, None
+
+
+def result_line(index: int, response: dict) -> str:
+    if "error" in response:
+        record = {"index": index, "error": response["error"]}
+        if response.get("details"):
+            record["details"] = response["details"]
+    else:
+        record = {"index": index, "output": response}
+    return json.dumps(record, ensure_ascii=False) + "\n"
@@ -0,0 +1,79 @@
+"""
+Few-shot example formatting, token budgeting and per-request selection.
+
+Shared by the SDK and the lightweight `axiom.runtime`. NumPy is only imported when
+an `ExampleSelector` is built, i.e. for `example_selection: "knn"`.
+"""
+import json
+
+from .tokens import estimate_tokens
+
+EXAMPLE_SELECTION_MODES = ("all", "knn")
+DEFAULT_EXAMPLE_COUNT = 3
+
+
+def format_example(user_message: str, expected_output, compact: bool = False) -> str:
+    if compact:
+        output = json.dumps(expected_output, separators=(',', ':'), ensure_ascii=False)
+    else:
+        output = json.dumps(expected_output, indent=2)
+    return f"User:\n{user_message}\n\nAssistant:\n{output}"
+
+
+def examples_block(examples: list[str]) -> str:
+    examples_str = "\n\n".join(examples)
+    return f"--- EXAMPLES START ---\n\n{examples_str}\n\n--- EXAMPLES END ---"
+
+
+def fit_examples(pairs: list[tuple[str, object]], available_tokens: int | None) -> tuple[str, int, bool] | None:
+    """
+    Formats (user message, expected output) pairs as an examples block that fits in
+    `available_tokens`. If the pretty-printed block is too large, every example is
+    minified and examples are then dropped from the end of the list. Returns
+    (block, examples kept, minified), or None if not even one example fits.
+    """
+    block = examples_block([format_example(user, output) for user, output in pairs])
+    if available_tokens is None or estimate_tokens(block) <= available_tokens:
+        return block, len(pairs), False
+
+    compact = [format_example(user, output, compact=True) for user, output in pairs]
+    used = estimate_tokens(examples_block([]))
+    kept = 0
+    for example in compact:
+        used += estimate_tokens(example) + 1  # plus the blank line separating it from the next
+        if used > available_tokens:
+            break
+        kept += 1
+    if not kept:
+        return None
+    return examples_block(compact[:kept]), kept, True
+
+
+class ExampleSelector:
+    """
+    A TF-IDF index over the user messages of the examples, built once, that picks the
+    `count` examples most similar to a request's user message.
+    """
+
+    def __init__(self, pairs: list[tuple[str, object]], count: int = DEFAULT_EXAMPLE_COUNT):
+        from .similarity import TfidfIndex, tokenize
+
+        self.pairs = pairs
+        self.count = count
+        self._tokenize = tokenize
+        self._index = TfidfIndex([tokenize(user) for user, _ in pairs])
+
+    def select(self, user_message: str) -> list[tuple[str, object]]:
+        """The most similar examples first. A message sharing no words with any example gets the first ones."""
+        return [self.pairs[i] for i in self._index.most_similar(self._tokenize(user_message), self.count)]
+
+
+def validate_example_config(config: dict) -> tuple[str, int]:
+    """Returns (example_selection, example_count) from a prompt's config, rejecting invalid values."""
+    mode = config.get('example_selection', 'all')
+    if mode not in EXAMPLE_SELECTION_MODES:
+        raise ValueError(f"config example_selection must be one of {', '.join(EXAMPLE_SELECTION_MODES)}, got {mode!r}.")
+    count = config.get('example_count', DEFAULT_EXAMPLE_COUNT)
+    if isinstance(count, bool) or not isinstance(count, int) or count <= 0:
+        raise ValueError(f"config example_count must be a positive integer, got {count!r}.")
+    return mode, count
@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_HISTORY_PATH = Path(".axiom_cache") / "history.sqlite3"
+
+
+class TestHistory:
+    """
+    Outcomes of past test runs, kept in SQLite per suite (a prompt's `meta.id`) and
+    test name. Every outcome carries the fingerprint of what was tested: hashes of the
+    effective system prompt (with the model), the rendered user prompt and the
+    assertions. Used to run the tests most likely to fail first, and to skip tests
+    whose fingerprint passed recently. Pass `path=None` to keep the history in memory
+    only. The database is opened on first use.
+    """
+
+    __test__ = False  # Not a pytest test class, despite the name.
+
+    def __init__(self, path: Path | str | None = DEFAULT_HISTORY_PATH, window: int = 20,
+                 max_age_seconds: float = 90 * 24 * 3600, recent_pass_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path) if path is not None else None
+        # Only the most recent `window` runs of a test count towards its failure rate.
+        self.window = window
+        # How long a pass can be trusted for a test whose fingerprint has not changed.
+        self.recent_pass_seconds = recent_pass_seconds
+        self.max_age_seconds = max_age_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path if self.path is not None else ":memory:", check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " id INTEGER PRIMARY KEY, suite TEXT NOT NULL, test TEXT NOT NULL,"
+                " passed INTEGER NOT NULL, latency REAL, created_at REAL NOT NULL,"
+                " prompt_hash TEXT, user_hash TEXT, assertions_hash TEXT)"
+            )
+            # Histories written before fingerprints were recorded lack these columns.
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+            for column in ("prompt_hash", "user_hash", "assertions_hash"):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE results ADD COLUMN {column} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_test ON results (suite, test, id)")
+            self._conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            self._conn.commit()
+        return self._conn
+
+    def record(self, suite: str, results: list[tuple[str, bool, float, tuple]]):
+        """
+        Stores the outcomes of one run as (test name, passed, latency in seconds,
+        (prompt hash, user prompt hash, assertions hash)).
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT INTO results (suite, test, passed, latency, created_at, prompt_hash, user_hash, assertions_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(suite, name, int(passed), latency, now, *fingerprint) for name, passed, latency, fingerprint in results],
+            )
+            conn.commit()
+
+    def recent_passes(self, suite: str) -> set[tuple]:
+        """
+        The (test name, fingerprint) pairs whose latest run passed within `recent_pass_seconds`.
+        A pass followed by a failure of the same fingerprint does not count.
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT test, prompt_hash, user_hash, assertions_hash FROM ("
+                " SELECT test, prompt_hash, user_hash, assertions_hash, passed, created_at,"
+                " ROW_NUMBER() OVER (PARTITION BY test, prompt_hash, user_hash, assertions_hash ORDER BY id DESC)"
+                " AS recency FROM results WHERE suite = ? AND prompt_hash IS NOT NULL)"
+                " WHERE recency = 1 AND passed = 1 AND created_at >= ?",
+                (suite, time.time() - self.recent_pass_seconds),
+            ).fetchall()
+        return {(test, (prompt_hash, user_hash, assertions_hash)) for test, prompt_hash, user_hash, assertions_hash in rows}
+
+    def last_outcomes(self, suite: str) -> dict[str, bool]:
+        """Whether the latest run of each test passed."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT test, passed FROM ("
+                " SELECT test, passed, ROW_NUMBER() OVER (PARTITION BY test ORDER BY id DESC) AS recency"
+                " FROM results WHERE suite = ?) WHERE recency = 1",
+                (suite,),
+            ).fetchall()
+        return {test: bool(passed) for test, passed in rows}
+
+    def failure_scores(self, suite: str) -> dict[str, float]:
+        """
+        The smoothed failure rate of each test over its recent runs, (failures + 1) / (runs + 2).
+        Tests that were never run are missing; treat them as 0.5.
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT test, COUNT(*), SUM(passed) FROM ("
+                " SELECT test, passed, ROW_NUMBER() OVER (PARTITION BY test ORDER BY id DESC) AS recency"
+                " FROM results WHERE suite = ?) WHERE recency <= ? GROUP BY test",
+                (suite, self.window),
+            ).fetchall()
+        return {test: (runs - passes + 1) / (runs + 2) for test, runs, passes in rows}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,83 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSE_CACHE_DIR = Path(".axiom_cache") / "parse"
+_PARSER_SOURCES = [Path(__file__).parent / "parser" / "Axiom.g4", Path(__file__).parent / "parser" / "visitor.py"]
+
+
+def _parser_version() -> str:
+    """Hash of the grammar and visitor, so cached parses are dropped whenever either changes."""
+    digest = hashlib.sha256()
+    for source in _PARSER_SOURCES:
+        digest.update(source.read_bytes() if source.exists() else b"")
+    return digest.hexdigest()[:16]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Caches the visitor output of individual .axiom files, keyed by the hash of their
+    content. Lookups go to an in-process memo first and then to JSON files on disk.
+    Pass `directory=None` to keep the cache in memory only.
+
+    Merged results (a file plus all of its imports) are memoized in-process under a
+    signature made of every file hash in the import graph, so a change to any
+    imported file invalidates every file that transitively imports it.
+    """
+
+    def __init__(self, directory: Path | str | None = DEFAULT_PARSE_CACHE_DIR):
+        self.directory = Path(directory) if directory is not None else None
+        self.version = _parser_version()
+        self._parsed = {}
+        self._merged = {}
+        self._lock = threading.Lock()
+
+    def get_parsed(self, file_hash: str) -> dict | None:
+        with self._lock:
+            cached = self._parsed.get(file_hash)
+        if cached is None and self.directory is not None:
+            cache_file = self._cache_file(file_hash)
+            try:
+                cached = json.loads(cache_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._parsed[file_hash] = cached
+        return copy.deepcopy(cached) if cached is not None else None
+
+    def put_parsed(self, file_hash: str, prompt_dict: dict):
+        stored = copy.deepcopy(prompt_dict)
+        with self._lock:
+            self._parsed[file_hash] = stored
+        if self.directory is None:
+            return
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            cache_file = self._cache_file(file_hash)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_file.write_text(json.dumps(stored), encoding="utf-8")
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Could not write parse cache entry: {e}")
+
+    def get_merged(self, signature: tuple) -> dict | None:
+        with self._lock:
+            cached = self._merged.get(signature)
+        return copy.deepcopy(cached) if cached is not None else None
+
+    def put_merged(self, signature: tuple, prompt_dict: dict):
+        with self._lock:
+            self._merged[signature] = copy.deepcopy(prompt_dict)
+
+    def _cache_file(self, file_hash: str) -> Path:
+        return self.directory / f"{self.version}-{file_hash}.json"
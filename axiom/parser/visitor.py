@@ -1,9 +1,15 @@
 import json
+import re
 
 from gen.axiom.parser.AxiomParser import AxiomParser
 from gen.axiom.parser.AxiomVisitor import AxiomVisitor
 
 
+def _unescape(text: str, quote: str) -> str:
+    """Undoes the backslash escaping of `quote` and of backslashes inside a quoted string."""
+    return re.sub(r'\\([\\%s])' % quote, r'\1', text)
+
+
 class AxiomVisitorImpl(AxiomVisitor):
     def visitPrompt(self, ctx: AxiomParser.PromptContext):
         result = {"imports": [self.visit(imp) for imp in ctx.import_statement()]}
@@ -93,7 +99,7 @@ class AxiomVisitorImpl(AxiomVisitor):
         This is the new intelligent core. It parses the operator from the string.
         """
         # The grammar rule `assert_item: '-' STRING` gives us one child: the STRING token.
-        full_assertion_str = ctx.STRING(0).getText()[1:-1]  # Strip outer quotes
+        full_assertion_str = _unescape(ctx.STRING(0).getText()[1:-1], '"')  # Strip outer quotes
 
         # Check for our custom semantic operator
         if ' ~=' in full_assertion_str:
@@ -102,10 +108,10 @@ class AxiomVisitorImpl(AxiomVisitor):
             # The semantic part will be a string, likely with single quotes.
             # We strip whitespace and then the outer quotes (single or double).
             semantic_check = parts[1].strip()
-            if semantic_check.startswith("'") and semantic_check.endswith("'"):
-                semantic_check = semantic_check[1:-1]
-            elif semantic_check.startswith('"') and semantic_check.endswith('"'):
-                semantic_check = semantic_check[1:-1]
+            for quote in ("'", '"'):
+                if len(semantic_check) >= 2 and semantic_check[0] == semantic_check[-1] == quote:
+                    semantic_check = _unescape(semantic_check[1:-1], quote)
+                    break
         else:
             # If no operator is found, it's a standard assertion.
             expression = full_assertion_str
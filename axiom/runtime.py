@@ -0,0 +1,62 @@
+"""
+Lightweight loader for compiled `.axiomc` artifacts.
+
+Production workers only need the rendered system prompt and the payload template,
+so this module deliberately avoids importing the ANTLR runtime, the generated
+parser and the SDK. Artifacts are produced by `main.py build`.
+"""
+import json
+from pathlib import Path
+
+ARTIFACT_FORMAT = "axiomc"
+ARTIFACT_VERSION = 1
+
+
+class CompiledPrompt:
+    """A prompt loaded from a `.axiomc` artifact."""
+
+    def __init__(self, artifact: dict):
+        self.artifact = artifact
+        self.id = artifact.get("id")
+        self.source_hash = artifact["source_hash"]
+        self.system_prompt = artifact["system_prompt"]
+        self.payload = artifact["payload"]
+        self.prompt_dict = artifact["prompt"]
+        self.assertions = artifact.get("assertions", [])
+        # Only present for prompts built with `example_selection: "knn"`.
+        self.examples = artifact.get("examples", [])
+        self._template = None
+        self._selector = None
+
+    def render(self, **inputs) -> str:
+        """Renders the user payload for the given inputs."""
+        if self._template is None:
+            from jinja2 import Template
+            self._template = Template(self.payload)
+        return self._template.render(**inputs)
+
+    def system_prompt_for(self, user_message: str) -> str:
+        """
+        The system prompt for one request. For prompts built with `example_selection: "knn"`,
+        the examples most similar to `user_message` are appended (this needs NumPy).
+        """
+        if not self.examples:
+            return self.system_prompt
+        from .examples import ExampleSelector, fit_examples
+
+        if self._selector is None:
+            self._selector = ExampleSelector([(e["user"], e["expected_output"]) for e in self.examples],
+                                             self.artifact["example_count"])
+        fitted = fit_examples(self._selector.select(user_message.strip()), self.artifact.get("example_tokens"))
+        return self.system_prompt if fitted is None else f"{self.system_prompt}\n\n{fitted[0]}"
+
+
+def load_compiled(filepath: str | Path) -> CompiledPrompt:
+    """Reads a `.axiomc` artifact, rejecting files written in an unknown format or version."""
+    artifact = json.loads(Path(filepath).read_text(encoding="utf-8"))
+    if artifact.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"'{filepath}' is not a compiled axiom artifact.")
+    if artifact.get("version") != ARTIFACT_VERSION:
+        raise ValueError(f"'{filepath}' was built with artifact version {artifact.get('version')}, "
+                         f"but this runtime reads version {ARTIFACT_VERSION}. Rebuild it with 'main.py build'.")
+    return CompiledPrompt(artifact)
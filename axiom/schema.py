@@ -0,0 +1,74 @@
+"""
+Checks values against the field types of an `interface` block.
+
+Types are kept as the source text the visitor produced: `String`, `Float`, `Int`,
+`Boolean`, `Enum("A","B")`, `List<T>` or the name of a struct from a `types` block.
+Fields of an unknown type are accepted as they are.
+"""
+import re
+from functools import lru_cache
+
+_PRIMITIVES = {
+    "String": lambda v: isinstance(v, str),
+    "Float": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "Int": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "Boolean": lambda v: isinstance(v, bool),
+}
+_ENUM_RE = re.compile(r'^Enum\s*\((.*)\)$', re.S)
+_LIST_RE = re.compile(r'^List\s*<(.*)>$', re.S)
+_ENUM_VALUE_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+def struct_types(prompt_dict: dict) -> dict:
+    """Struct definitions from the top-level and the interface `types` blocks."""
+    return {**prompt_dict.get('types', {}), **prompt_dict.get('interface', {}).get('types', {})}
+
+
+@lru_cache(maxsize=256)
+def _parse_type(type_def: str) -> tuple:
+    type_def = type_def.strip()
+    enum = _ENUM_RE.match(type_def)
+    if enum:
+        return "enum", frozenset(_ENUM_VALUE_RE.findall(enum.group(1)))
+    element = _LIST_RE.match(type_def)
+    if element:
+        return "list", element.group(1)
+    return "name", type_def
+
+
+def check_value(value, type_def: str, types: dict, path: str) -> list[str]:
+    """Returns a message for every place where `value` does not match `type_def`."""
+    kind, arg = _parse_type(type_def)
+    if kind == "enum":
+        # Enum members are strings; anything else (including unhashable lists and dicts) is not one.
+        return [] if isinstance(value, str) and value in arg else [
+            f"{path} must be one of {', '.join(sorted(arg))}, got {value!r}."]
+    if kind == "list":
+        if not isinstance(value, list):
+            return [f"{path} must be a list, got {type(value).__name__}."]
+        errors = []
+        for i, item in enumerate(value):
+            errors.extend(check_value(item, arg, types, f"{path}[{i}]"))
+        return errors
+    if arg in _PRIMITIVES:
+        return [] if _PRIMITIVES[arg](value) else [f"{path} must be {arg}, got {type(value).__name__}."]
+    if arg in types:
+        if not isinstance(value, dict):
+            return [f"{path} must be a {arg} object, got {type(value).__name__}."]
+        return check_fields(types[arg], value, types, f"{path}.")
+    return []
+
+
+def check_fields(fields: list[dict], data: dict, types: dict, prefix: str = "", allow_extra: bool = True) -> list[str]:
+    """Checks that `data` has every declared field with a value of its type."""
+    errors = []
+    for field in fields:
+        name = field['name']
+        if name not in data:
+            errors.append(f"{prefix}{name} is missing.")
+        else:
+            errors.extend(check_value(data[name], field['type'], types, f"{prefix}{name}"))
+    if not allow_extra:
+        declared = {field['name'] for field in fields}
+        errors.extend(f"{prefix}{name} is not declared." for name in data if name not in declared)
+    return errors
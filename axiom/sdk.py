@@ -2,17 +2,40 @@ import json
 import re
 import textwrap
 import difflib
+import threading
+import time
 import click
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-from antlr4 import FileStream, CommonTokenStream
-from jinja2 import Template
+from typing import TYPE_CHECKING
+
+from llm.profiling import propagate_context, span
 
-from gen.axiom.parser.AxiomLexer import AxiomLexer
-from gen.axiom.parser.AxiomParser import AxiomParser
-from llm.llm_interface import LLMInterface
 # Relative imports for the package structure
-from .assertions import assertion_helpers
-from .parser.visitor import AxiomVisitorImpl
+from .assertions import AssertionCompileError, compile_assertion, evaluate_assertion, referenced_fields
+from .batch import CompletedRecords, iter_records, result_line, scan_output
+from .examples import ExampleSelector, fit_examples, validate_example_config
+from .history import TestHistory
+from .parse_cache import ParseCache, content_hash
+from .search import BudgetExhausted, BudgetedLLM, SearchBudget
+from .stats import SequentialPassRate, wilson_interval
+from .runtime import ARTIFACT_FORMAT, ARTIFACT_VERSION, CompiledPrompt
+from .tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from jinja2 import Template
+
+
+def _canonical_prompt(text: str) -> str:
+    """Normalises line endings and trailing whitespace, which would otherwise vary with the editor used."""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _template(source: str) -> "Template":
+    # jinja2 is only imported by the commands that actually render payloads.
+    from jinja2 import Template
+    return Template(source)
 
 
 class AxiomSDK:
@@ -20,8 +43,30 @@ class AxiomSDK:
     The main SDK for loading, parsing, testing, improving, and compiling .axiom files.
     """
 
-    def __init__(self, llm_interface):
+    # Test pairs whose inputs are less similar than this (TF-IDF cosine) are never sent to the meta-LLM.
+    TEST_CONFLICT_MIN_SIMILARITY = 0.3
+    # Number of candidate test pairs judged per meta-LLM call.
+    TEST_CONFLICT_BATCH_SIZE = 5
+    # Rules whose character-shingle vectors are at least this similar are reported as redundant locally.
+    RULE_DUPLICATE_MIN_SIMILARITY = 0.9
+
+    def __init__(self, llm_interface, jobs: int = 1, parse_cache: ParseCache = None, stream: bool = False,
+                 prompt_cache: bool = False, history: TestHistory = None):
         self.llm = llm_interface
+        # Number of tests allowed to wait on the LLM at the same time.
+        self.jobs = max(1, jobs)
+        # Shared by every pool that runs tests, so nested pools (beam candidates or improve
+        # sandboxes, each running a suite) still keep at most `jobs` tests in flight.
+        self._test_slots = threading.BoundedSemaphore(self.jobs)
+        # Stream test outputs and cancel generation on the first failing deterministic assertion.
+        self.stream = stream
+        # Send one canonical, pinned system prompt per file so the server's prefix cache is reused.
+        self.prompt_cache = prompt_cache
+        self._pinned_prompts = {}
+        self._parse_cache = parse_cache if parse_cache is not None else ParseCache()
+        # Outcomes of past test runs, used to run the tests most likely to fail first. Kept in
+        # memory unless a persistent TestHistory is passed, as the CLI does.
+        self.history = history if history is not None else TestHistory(path=None)
         try:
             grammar_path = Path(__file__).parent / "parser" / "Axiom.g4"
             if not grammar_path.exists():
@@ -29,30 +74,34 @@ class AxiomSDK:
         except FileNotFoundError:
             raise RuntimeError("Could not find 'Axiom.g4' in axiom/parser directory. Did you run the build script?")
 
-        # Initialize parser components
-        self._lexer = AxiomLexer(None)
-        self._parser = AxiomParser(None)
-        self._visitor = AxiomVisitorImpl()
+        # Parser components are created on the first cache miss, so cached loads never import ANTLR.
+        self._lexer = None
+        self._parser = None
+        self._visitor = None
+        # Per-file state for `render`, keyed by import-graph signature.
+        self._prepared = {}
 
     # --- Core Private Methods ---
 
     def _parse_and_transform(self, filepath: Path, visited_files=None) -> dict:
         """
         Recursively parses an axiom file and its imports, with cycle detection.
+        The merged result is reused as long as no file in the import graph has changed.
         """
         if visited_files is None:
-            visited_files = set()
+            signature = self._import_graph_signature(filepath)
+            prompt_dict = self._parse_cache.get_merged(signature)
+            if prompt_dict is None:
+                prompt_dict = self._parse_and_transform(filepath, set())
+                self._parse_cache.put_merged(signature, prompt_dict)
+            return prompt_dict
+
         str_filepath = str(filepath.resolve())
         if str_filepath in visited_files:
             return {}
         visited_files.add(str_filepath)
 
-        input_stream = FileStream(str_filepath, encoding='utf-8')
-        self._lexer.inputStream = input_stream
-        stream = CommonTokenStream(self._lexer)
-        self._parser.setInputStream(stream)
-        tree = self._parser.prompt()
-        prompt_dict = self._visitor.visit(tree)
+        _, prompt_dict = self._parse_file(filepath)
 
         if "imports" in prompt_dict and prompt_dict["imports"]:
             merged_imports = {}
@@ -71,6 +120,51 @@ class AxiomSDK:
 
         return prompt_dict
 
+    def _parse_file(self, filepath: Path) -> tuple[str, dict]:
+        """
+        Parses a single axiom file (without resolving imports) and returns its content
+        hash and prompt dict, skipping ANTLR on a cache hit.
+        """
+        with span("parse", file=str(filepath)) as trace:
+            text = filepath.read_text(encoding='utf-8')
+            file_hash = content_hash(text)
+            prompt_dict = self._parse_cache.get_parsed(file_hash)
+            cached = prompt_dict is not None
+            if prompt_dict is None:
+                from antlr4 import InputStream, CommonTokenStream
+
+                if self._parser is None:
+                    from gen.axiom.parser.AxiomLexer import AxiomLexer
+                    from gen.axiom.parser.AxiomParser import AxiomParser
+                    from .parser.visitor import AxiomVisitorImpl
+
+                    self._lexer = AxiomLexer(None)
+                    self._parser = AxiomParser(None)
+                    self._visitor = AxiomVisitorImpl()
+                self._lexer.inputStream = InputStream(text)
+                stream = CommonTokenStream(self._lexer)
+                self._parser.setInputStream(stream)
+                tree = self._parser.prompt()
+                prompt_dict = self._visitor.visit(tree)
+                self._parse_cache.put_parsed(file_hash, prompt_dict)
+            trace.set(chars=len(text), cached=cached)
+        return file_hash, prompt_dict
+
+    def _import_graph_signature(self, filepath: Path, visited_files=None) -> tuple:
+        """Returns the (path, content hash) of a file and of every file it transitively imports."""
+        if visited_files is None:
+            visited_files = set()
+        str_filepath = str(filepath.resolve())
+        if str_filepath in visited_files:
+            return ()
+        visited_files.add(str_filepath)
+
+        file_hash, prompt_dict = self._parse_file(filepath)
+        signature = ((str_filepath, file_hash),)
+        for imp in prompt_dict.get("imports") or []:
+            signature += self._import_graph_signature(filepath.parent / imp['path'], visited_files)
+        return signature
+
     def _deep_merge_dicts(self, base, new):
         """Helper to recursively merge dictionaries and extend lists."""
         for key, value in new.items():
@@ -84,16 +178,43 @@ class AxiomSDK:
                 base[key] = value
         return base
 
-    def _generate_system_prompt(self, prompt_dict: dict, use_examples=True) -> str:
-        """The core transpiler logic that builds the master system prompt."""
+    def _generate_system_prompt(self, prompt_dict: dict, use_examples=True, user_message: str = None,
+                                selector: ExampleSelector = None) -> str:
+        """
+        The core transpiler logic that builds the master system prompt.
+        With `example_selection: "knn"`, examples are only included for a given
+        `user_message`, picked by `selector` (built on the fly if not given).
+        """
+        with span("transpile", examples=use_examples) as trace:
+            sections = self._system_prompt_sections(prompt_dict, use_examples, user_message, selector)
+            full_prompt = "\n\n".join(text for _, text in sections).strip()
+            trace.set(chars=len(full_prompt))
+        return full_prompt
+
+    def _test_system_prompt(self, prompt_dict: dict) -> str:
+        """
+        The system prompt tests run against (without examples). In prompt-cache mode it is
+        canonicalised and pinned per content hash, so every request of a suite, and every
+        run on any machine, sends a byte-identical prefix the server can keep cached.
+        """
+        system_prompt = self._generate_system_prompt(prompt_dict, use_examples=False)
+        if not self.prompt_cache:
+            return system_prompt
+        system_prompt = _canonical_prompt(system_prompt)
+        return self._pinned_prompts.setdefault(content_hash(system_prompt), system_prompt)
+
+    def _system_prompt_sections(self, prompt_dict: dict, use_examples=True, user_message: str = None,
+                                selector: ExampleSelector = None) -> list[tuple[str, str]]:
+        """Builds the system prompt as a list of (section name, text) pairs, in prompt order."""
+        system_prompt_header = "You are an assistant that follows instructions precisely. After the examples, respond only to the final user input."
         persona = f"# PERSONA\n{prompt_dict.get('persona', 'You are a helpful AI assistant.')}"
+        sections = [("header", system_prompt_header), ("persona", persona)]
 
         rules_list = prompt_dict.get('rules', [])
-        rules = ""
         if rules_list:
             rule_texts = [r['text'] for r in self._normalize_rules(rules_list) if r['status'] != 'deleted']
             rule_items = "\n".join([f"- {text}" for text in rule_texts])
-            rules = f"# CORE INSTRUCTIONS & LOGIC\nYou must follow these rules:\n{rule_items}"
+            sections.append(("rules", f"# CORE INSTRUCTIONS & LOGIC\nYou must follow these rules:\n{rule_items}"))
 
         output_parts = ["# OUTPUT FORMAT", "Your response MUST be a single, valid JSON object with the following keys:"]
         if 'outputs' in prompt_dict.get('interface', {}):
@@ -103,87 +224,250 @@ class AxiomSDK:
                     for key, val in field['directives'].items():
                         field_str += f", {key.replace('_', ' ')}: {val}"
                 output_parts.append(field_str)
-        output_format = "\n".join(output_parts)
+        sections.append(("output format", "\n".join(output_parts)))
 
-        examples_block = ""
         config = prompt_dict.get('config', {})
         if use_examples and config.get('use_tests_as_examples', False) and 'tests' in prompt_dict:
-            payload_template = Template(prompt_dict.get("payload", ""))
             example_parts = [t for t in prompt_dict['tests'] if 'expected_output' in t]
             if example_parts:
-                examples_str = "\n\n".join(
-                    f"User:\n{payload_template.render(**t['inputs']).strip()}\n\nAssistant:\n{json.dumps(t['expected_output'], indent=2)}"
-                    for t in example_parts
-                )
-                examples_block = f"--- EXAMPLES START ---\n\n{examples_str}\n\n--- EXAMPLES END ---"
+                examples = self._examples_section(prompt_dict, example_parts, sections, user_message, selector)
+                if examples:
+                    sections.append(examples)
+        return sections
 
-        system_prompt_header = "You are an assistant that follows instructions precisely. After the examples, respond only to the final user input."
-        full_prompt = "\n\n".join(filter(None, [system_prompt_header, persona, rules, output_format, examples_block]))
-        return full_prompt.strip()
+    def _examples_section(self, prompt_dict: dict, example_parts: list, sections: list, user_message: str = None,
+                          selector: ExampleSelector = None) -> tuple[str, str] | None:
+        """
+        Renders the few-shot examples: all of them, or with `example_selection: "knn"` the
+        `example_count` most similar to `user_message`. With `config { max_prompt_tokens: N }`,
+        examples that would push the prompt over budget are minified and then dropped,
+        last-declared (or least similar) first. Returns None if no example is included.
+        """
+        config = prompt_dict.get('config', {})
+        mode, _ = validate_example_config(config)
+        budget = config.get('max_prompt_tokens')
+        if budget is not None and (isinstance(budget, bool) or not isinstance(budget, int) or budget <= 0):
+            raise ValueError(f"config max_prompt_tokens must be a positive integer, got {budget!r}.")
+
+        if mode == "knn":
+            if user_message is None:
+                return None  # Examples are chosen per request.
+            selector = selector or self._example_selector(prompt_dict)
+            pairs = selector.select(user_message.strip())
+        else:
+            payload_template = _template(prompt_dict.get("payload", ""))
+            pairs = [(payload_template.render(**t['inputs']).strip(), t['expected_output']) for t in example_parts]
+
+        available = None
+        if budget is not None:
+            # The examples are joined to the preceding sections by one more blank line.
+            available = budget - estimate_tokens("\n\n".join(text for _, text in sections) + "\n\n")
+        fitted = fit_examples(pairs, available)
+        if fitted is None:
+            return None
+        block, kept, minified = fitted
+        details = []
+        if mode == "knn":
+            details.append(f"{kept} nearest of {len(example_parts)}")
+        elif kept < len(example_parts):
+            details.append(f"{kept} of {len(example_parts)}")
+        if minified:
+            details.append("minified")
+        return (f"examples ({', '.join(details)})" if details else "examples"), block
+
+    def _example_selector(self, prompt_dict: dict) -> ExampleSelector | None:
+        """Builds the similarity index over the examples when the prompt uses `example_selection: "knn"`."""
+        config = prompt_dict.get('config', {})
+        mode, count = validate_example_config(config)
+        if mode != "knn" or not config.get('use_tests_as_examples', False):
+            return None
+        example_parts = [t for t in prompt_dict.get('tests', []) if 'expected_output' in t]
+        if not example_parts:
+            return None
+        payload_template = _template(prompt_dict.get("payload", ""))
+        return ExampleSelector([(payload_template.render(**t['inputs']).strip(), t['expected_output'])
+                                for t in example_parts], count)
+
+    def _execute_many(self, requests: list[tuple[str, str]]) -> list[dict]:
+        """
+        Sends independent (system_prompt, user_prompt) requests concurrently when the
+        backend supports it, and returns the responses in request order.
+        """
+        if hasattr(self.llm, "execute_many"):
+            return self.llm.execute_many(requests)
+        return [self.llm.execute(system_prompt, user_prompt) for system_prompt, user_prompt in requests]
 
     @classmethod
     def log_semantic(cls, sm_check):
-        return ' ~= ' + '"' + sm_check + '"' if sm_check else ''
-
-    def _run_single_test(self, test_case: dict, system_prompt: str, user_payload_template: Template):
+        return ' ~= ' + cls.quote_semantic_check(sm_check) if sm_check else ''
+
+    @staticmethod
+    def quote_semantic_check(sm_check: str) -> str:
+        """Writes a `~=` requirement as a single-quoted string, the way assertions spell it."""
+        return "'" + sm_check.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+    def _run_single_test(self, test_case: dict, system_prompt: str, user_payload_template: "Template",
+                         echo=click.secho):
+        with span("test", test=test_case['name']) as trace:
+            result = self._evaluate_test(test_case, system_prompt, user_payload_template, echo)
+            trace.set(passed=result[1])
+        return result
+
+    def _evaluate_test(self, test_case: dict, system_prompt: str, user_payload_template: "Template",
+                       echo=click.secho):
         """
         A helper to run one test, now with the correct logic for handling
         both standard and semantic assertions.
+
+        All console output goes through `echo`, so parallel runs can buffer it per test.
         """
         test_name = test_case['name']
-        click.secho(f"\n[RUNNING] Test: \"{test_name}\"", fg='cyan')
-        user_prompt = user_payload_template.render(**test_case['inputs'])
-
-        llm_output = self.llm.execute(system_prompt, user_prompt)
-        click.echo("  - LLM Output Received:")
-        click.echo(textwrap.indent(json.dumps(llm_output, indent=2), '    '))
+        echo(f"\n[RUNNING] Test: \"{test_name}\"", fg='cyan')
+        with span("render") as trace:
+            user_prompt = user_payload_template.render(**test_case['inputs'])
+            trace.set(chars=len(user_prompt))
+
+        early_failures = []
+        if self.stream and hasattr(self.llm, "execute_streaming"):
+            on_field = self._early_abort_checker(test_case, early_failures)
+            llm_output = self.llm.execute_streaming(system_prompt, user_prompt, on_field)
+        else:
+            llm_output = self.llm.execute(system_prompt, user_prompt)
+        echo("  - LLM Output Received:" if not early_failures else "  - Partial LLM Output Received:")
+        echo(textwrap.indent(json.dumps(llm_output, indent=2), '    '))
 
         if "error" in llm_output:
-            click.secho(f"  - ❌ FAIL (LLM call failed)", fg='red')
+            echo(f"  - ❌ FAIL (LLM call failed)", fg='red')
             return test_name, False, "LLM call failed", llm_output
 
-        click.echo("  - Evaluating Assertions:")
+        if early_failures:
+            echo(f"  - Generation cancelled on the first definitive failure:")
+            echo(f"    - Checking: {early_failures[0]}")
+            echo(f"    - ❌ FAILED", fg='red')
+            return test_name, False, early_failures[0], llm_output
+
+        echo("  - Evaluating Assertions:")
+        # Semantic assertions are collected and validated together in one call at the end.
+        semantic_checks = []
         for assertion in test_case.get('assert', []):
             expression = assertion['expression']
             semantic_check = assertion.get('semantic_check')
 
             full_assertion_str = f"{expression} {AxiomSDK.log_semantic(semantic_check)}"
-            click.echo(f"    - Checking: {full_assertion_str}")
+            echo(f"    - Checking: {full_assertion_str}")
 
             try:
-                # Always prepare the context for evaluation
-                context = {"output": llm_output, **assertion_helpers}
-
                 if not semantic_check:
                     # --- Standard Assertion Path ---
                     # The expression itself is the entire boolean check.
-                    result = eval(expression, {"__builtins__": {}}, context)
+                    with span("assertion", expression=expression) as trace:
+                        result = evaluate_assertion(expression, llm_output)
+                        trace.set(passed=bool(result))
                     if not result:
-                        click.secho(f"    - ❌ FAILED", fg='red')
+                        echo(f"    - ❌ FAILED", fg='red')
                         return test_name, False, expression, llm_output
                     else:
-                        click.secho(f"    - ✅ PASSED", fg='green')
+                        echo(f"    - ✅ PASSED", fg='green')
                 else:
                     # --- Semantic Assertion Path ---
                     # The expression is just the LEFT side, to get the content.
-                    content_to_check = eval(expression, {"__builtins__": {}}, context)
-
-                    validator_prompt = self._construct_semantic_check_prompt(content_to_check, semantic_check)
-                    validation_response = self.llm.execute(validator_prompt, "Validate.")
-
-                    if validation_response.get("isValid") is True:
-                        click.secho(f"    - ✅ SEMANTIC CHECK PASSED", fg='green')
-                    else:
-                        click.secho(f"    - ❌ SEMANTIC CHECK FAILED", fg='red')
-                        return test_name, False, full_assertion_str, llm_output
+                    with span("assertion", expression=expression, semantic=True):
+                        content_to_check = evaluate_assertion(expression, llm_output)
+                    semantic_checks.append((full_assertion_str, content_to_check, semantic_check))
+                    echo(f"    - ⏳ Queued for semantic validation")
 
             except Exception as e:
-                click.secho(f"    - ❌ ERROR during evaluation: {e}", fg='red')
+                echo(f"    - ❌ ERROR during evaluation: {e}", fg='red')
                 return test_name, False, f"Error evaluating: {expression}", llm_output
 
-        click.secho(f"\n  - ✅ All assertions PASSED for \"{test_name}\"", fg='green', bold=True)
+        if semantic_checks:
+            echo(f"  - Running {len(semantic_checks)} semantic check(s):")
+            verdicts = self._run_semantic_checks([(content, req) for _, content, req in semantic_checks], echo)
+            for (full_assertion_str, _, _), is_valid in zip(semantic_checks, verdicts):
+                if is_valid:
+                    echo(f"    - ✅ SEMANTIC CHECK PASSED: {full_assertion_str}", fg='green')
+                else:
+                    echo(f"    - ❌ SEMANTIC CHECK FAILED: {full_assertion_str}", fg='red')
+                    return test_name, False, full_assertion_str, llm_output
+
+        echo(f"\n  - ✅ All assertions PASSED for \"{test_name}\"", fg='green', bold=True)
         return test_name, True, None, llm_output
 
+    @staticmethod
+    def _early_abort_checker(test_case: dict, failures: list):
+        """
+        Returns an `on_field` callback for streamed execution. Each deterministic assertion
+        is evaluated as soon as every output field it reads has arrived; the first one that
+        fails is appended to `failures` and the callback returns False to cancel generation.
+        """
+        pending = []
+        for assertion in test_case.get('assert', []):
+            if assertion.get('semantic_check'):
+                continue
+            fields = referenced_fields(assertion['expression'])
+            # Assertions that read the whole output (or no field at all) wait for the full response.
+            if fields:
+                pending.append((assertion['expression'], fields))
+        received = {}
+
+        def on_field(key, value):
+            received[key] = value
+            for item in list(pending):
+                expression, fields = item
+                if not fields.issubset(received):
+                    continue
+                pending.remove(item)
+                try:
+                    passed = evaluate_assertion(expression, received)
+                except Exception:
+                    # Errors are reported by the regular evaluation of the full output.
+                    continue
+                if not passed:
+                    failures.append(expression)
+                    return False
+            return True
+
+        return on_field
+
+    def _run_semantic_checks(self, checks: list[tuple], echo=click.secho) -> list[bool]:
+        """
+        Validates (content, requirement) pairs with a single validator call and returns
+        one verdict per pair. Falls back to one call per pair only if the batched
+        response is malformed.
+        """
+        with span("semantic-check", checks=len(checks)) as trace:
+            if len(checks) > 1:
+                validator_prompt, checks_message = self._construct_batch_semantic_check_prompt(checks)
+                verdicts = self._parse_batch_verdicts(self.llm.execute(validator_prompt, checks_message), len(checks))
+                if verdicts is not None:
+                    trace.set(calls=1, passed=sum(verdicts))
+                    return verdicts
+                echo("    - ⚠️  Batched validator response was malformed. Validating one by one.", fg='yellow')
+
+            verdicts = []
+            for content_to_check, requirement in checks:
+                validator_prompt, check_message = self._construct_semantic_check_prompt(content_to_check, requirement)
+                verdicts.append(self.llm.execute(validator_prompt, check_message).get("isValid") is True)
+            trace.set(calls=len(checks) + (1 if len(checks) > 1 else 0), passed=sum(verdicts))
+            return verdicts
+
+    @staticmethod
+    def _parse_batch_verdicts(response: dict, expected_count: int) -> list[bool] | None:
+        """Returns the verdicts in check order, or None unless there is exactly one boolean per check."""
+        results = response.get("results")
+        if not isinstance(results, list) or len(results) != expected_count:
+            return None
+        verdicts = {}
+        for position, item in enumerate(results, start=1):
+            if not isinstance(item, dict) or not isinstance(item.get("isValid"), bool):
+                return None
+            check_id = item.get("id", position)
+            if (not isinstance(check_id, int) or isinstance(check_id, bool) or check_id in verdicts
+                    or not 1 <= check_id <= expected_count):
+                return None
+            verdicts[check_id] = item["isValid"]
+        return [verdicts[i] for i in range(1, expected_count + 1)]
+
     def _serialize_to_axiom_string(self, prompt_dict: dict) -> str:
         """Takes a prompt dictionary and writes it back to a formatted .axiom string."""
         content = []
@@ -191,6 +475,10 @@ class AxiomSDK:
         def escape(s: str) -> str:
             return s.replace('"', '\\"')
 
+        def escape_assertion(s: str) -> str:
+            # Assertion strings are unescaped by the visitor, so backslashes must be escaped too.
+            return s.replace('\\', '\\\\').replace('"', '\\"')
+
         def format_kv_pair(key, value, indent=4):
             val_str = ""
             if isinstance(value, str):
@@ -213,6 +501,15 @@ class AxiomSDK:
                 parts.append(f"({', '.join(dir_items)})")
             return " ".join(parts)
 
+        def format_assertion(assertion):
+            # Parsed assertions are split into the expression and the `~=` requirement.
+            if isinstance(assertion, dict):
+                text = assertion['expression']
+                if assertion.get('semantic_check'):
+                    text += f" ~= {self.quote_semantic_check(assertion['semantic_check'])}"
+                return text
+            return assertion
+
         if "imports" in prompt_dict and prompt_dict["imports"]:
             for imp in prompt_dict["imports"]:
                 parts = ", ".join(imp['parts'])
@@ -279,7 +576,7 @@ class AxiomSDK:
                     content.append("        }")
                 if "assert" in test:
                     content.append("        assert {")
-                    content.extend([f'            - "{escape(a)}"' for a in test["assert"]])
+                    content.extend([f'            - "{escape_assertion(format_assertion(a))}"' for a in test["assert"]])
                     content.append("        }")
                 if "expected_output" in test:
                     output_json = json.dumps(test["expected_output"], indent=4)
@@ -302,16 +599,36 @@ class AxiomSDK:
                 normalized.append(rule)
         return normalized
 
-    def _construct_semantic_check_prompt(self, content_to_check: any, requirement: str) -> str:
-        return f"""You are a precise and strict validation AI. Your task is to determine if a given piece of content satisfies a specific requirement.
-**Content to Analyze:**
+    # The validator instructions never change, so servers can reuse the cached prompt prefix;
+    # the checks themselves go in the user message.
+    SEMANTIC_CHECK_SYSTEM_PROMPT = """You are a precise and strict validation AI. Your task is to determine if a given piece of content satisfies a specific requirement.
+The user message contains the 'Content to Analyze' and the 'Requirement to Check'.
+**YOUR TASK:**
+Does the 'Content to Analyze' satisfy the 'Requirement to Check'? Respond with a single, valid JSON object with one key, "isValid", which is a boolean.
+"""
+    BATCH_SEMANTIC_CHECK_SYSTEM_PROMPT = """You are a precise and strict validation AI. Your task is to determine, for each numbered check in the user message, if the given piece of content satisfies its specific requirement.
+Judge every check independently of the others.
+**YOUR TASK:**
+For each check, does its 'Content to Analyze' satisfy its 'Requirement to Check'? Respond with a single, valid JSON object with one key, "results", which is a list containing exactly one entry per check, in order.
+**JSON Schema for your response:**
+{"results": [ {"id": <check number>, "isValid": <boolean>} ]}
+"""
+
+    def _construct_semantic_check_prompt(self, content_to_check: any, requirement: str) -> tuple[str, str]:
+        """Returns the (system prompt, user message) pair for one semantic check."""
+        return self.SEMANTIC_CHECK_SYSTEM_PROMPT, f"""**Content to Analyze:**
 {json.dumps(content_to_check, indent=2)}
 **Requirement to Check:**
 "{requirement}"
-**YOUR TASK:**
-Does the 'Content to Analyze' satisfy the 'Requirement to Check'? Respond with a single, valid JSON object with one key, "isValid", which is a boolean.
 """
 
+    def _construct_batch_semantic_check_prompt(self, checks: list[tuple]) -> tuple[str, str]:
+        """Returns the (system prompt, user message) pair for several numbered semantic checks."""
+        return self.BATCH_SEMANTIC_CHECK_SYSTEM_PROMPT, "\n".join(
+            f"**Check {i}:**\n- Content to Analyze: {json.dumps(content)}\n- Requirement to Check: \"{requirement}\""
+            for i, (content, requirement) in enumerate(checks, start=1)
+        )
+
     def _construct_brainstorm_meta_prompt(self, p_dict, test, bad_output, failed_assertion):
         """Constructs the NEW "brainstorm" prompt for the meta-LLM."""
         persona = p_dict.get('persona', 'A helpful AI assistant.')
@@ -378,6 +695,28 @@ Respond with a single JSON object.
 - If they are contradictory, respond with: `{{"is_conflicting": true, "reason": "<brief explanation>"}}`
 - If they are NOT contradictory, respond with: `{{"is_conflicting": false}}`"""
 
+    def _construct_test_conflict_batch_meta_prompt(self, pairs: list[tuple[dict, dict]]) -> str:
+        pair_blocks = "\n\n".join(
+            f"""**Pair {k}:**
+- Test Case 1: "{test1['name']}"
+  - Inputs: {json.dumps(test1['inputs'])}
+  - Assertions: {json.dumps(test1.get('assert', []))}
+- Test Case 2: "{test2['name']}"
+  - Inputs: {json.dumps(test2['inputs'])}
+  - Assertions: {json.dumps(test2.get('assert', []))}"""
+            for k, (test1, test2) in enumerate(pairs, start=1)
+        )
+        return f"""You are a logical analyst. Your task is to determine, for each numbered pair of test cases for an AI prompt below, if the two test cases are contradictory.
+A contradiction exists if the inputs are highly similar, but the required outputs (defined by assertions) are logically incompatible.
+Judge every pair independently of the others.
+
+{pair_blocks}
+
+**YOUR TASK:**
+Respond with a single JSON object with one key, "results", which is a list containing exactly one entry per pair, in order.
+**JSON Schema for your response:**
+{{"results": [ {{"pair": <pair number>, "is_conflicting": <boolean>, "reason": "<brief explanation if conflicting>"}} ]}}"""
+
     def _construct_improve_meta_prompt(self, p_dict, test, bad_output, failed_assertion, previous_failures=None):
         """Constructs the NEW, self-correcting Chain-of-Thought prompt for the meta-LLM."""
         persona = p_dict.get('persona', 'A helpful AI assistant.')
@@ -443,15 +782,28 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
 """
 
     def _validate_rules(self, rules: list) -> tuple[bool, dict | None]:
-        """Validates a list of rules and now returns detailed failure reasons."""
+        """
+        Validates a list of rules and now returns detailed failure reasons.
+        Exact and near-duplicate rules are found locally; the meta-LLM is only asked
+        about redundancy when that pass finds nothing.
+        """
         if len(rules) < 2: return True, None
+        from .similarity import normalize_text
+
+        duplicates = self._find_near_duplicate_rules(rules)
+        # The conflict check only needs to see each distinct rule once.
+        unique_rules = list({normalize_text(rule): rule for rule in rules}.values())
 
-        conflict_meta_prompt = self._construct_validation_meta_prompt(rules, "conflict")
-        conflict_response = self.llm.execute(conflict_meta_prompt, "Analyze.")
-        if "error" in conflict_response: return True, {"type": "warning",
-                                                       "message": "Meta-LLM call for conflict check failed."}
-        if conflict_response.get("is_conflicting"):
-            return False, {"type": "conflict", "details": conflict_response.get("conflicts", [])}
+        if len(unique_rules) >= 2:
+            conflict_meta_prompt = self._construct_validation_meta_prompt(unique_rules, "conflict")
+            conflict_response = self.llm.execute(conflict_meta_prompt, "Analyze.")
+            if "error" in conflict_response: return True, {"type": "warning",
+                                                           "message": "Meta-LLM call for conflict check failed."}
+            if conflict_response.get("is_conflicting"):
+                return False, {"type": "conflict", "details": conflict_response.get("conflicts", [])}
+
+        if duplicates:
+            return False, {"type": "redundancy", "details": duplicates}
 
         redundancy_meta_prompt = self._construct_validation_meta_prompt(rules, "redundancy")
         redundancy_response = self.llm.execute(redundancy_meta_prompt, "Analyze.")
@@ -462,15 +814,192 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
 
         return True, None
 
-    def _run_all_tests_and_get_failures(self, prompt_dict: dict) -> list:
-        """Runs all assertion tests and returns a list of failure details."""
-        system_prompt = self._generate_system_prompt(prompt_dict, use_examples=False)
-        user_payload_template = Template(prompt_dict.get("payload", ""))
+    def _find_near_duplicate_rules(self, rules: list) -> list[dict]:
+        """Flags pairs of rules with identical or nearly identical wording, in the meta-LLM's redundancy format."""
+        from .similarity import cosine_similarity_matrix, normalize_text, shingle_matrix, similar_pairs
+
+        similarities = cosine_similarity_matrix(shingle_matrix(rules))
+        duplicates = []
+        for i, j in similar_pairs(similarities, self.RULE_DUPLICATE_MIN_SIMILARITY):
+            if normalize_text(rules[i]) == normalize_text(rules[j]):
+                reason = "The rules are identical apart from case, punctuation or spacing."
+            else:
+                reason = f"Near-duplicate wording (similarity {similarities[i, j]:.2f})."
+            duplicates.append({"rules": [rules[i], rules[j]], "reason": reason})
+        return duplicates
+
+    def _compile_assertions(self, prompt_dict: dict) -> list[str]:
+        """Compiles every assertion in the file up front and returns one message per invalid assertion."""
+        errors = []
+        for test_case in prompt_dict.get('tests', []):
+            for assertion in test_case.get('assert', []):
+                try:
+                    compile_assertion(assertion['expression'])
+                except AssertionCompileError as e:
+                    errors.append(f"Test \"{test_case['name']}\": {e}")
+        return errors
+
+    def _check_assertions(self, prompt_dict: dict) -> bool:
+        """Reports invalid assertions before any LLM call is made. Returns False if there are any."""
+        errors = self._compile_assertions(prompt_dict)
+        for error in errors:
+            click.secho(f"❌ ERROR: {error}", fg='red')
+        return not errors
+
+    def _run_tests(self, tests: list, system_prompt: str, user_payload_template: "Template",
+                   echo=click.secho, suite: str = None) -> list:
+        """
+        Runs tests on a pool of up to `self.jobs` workers and returns their results
+        in suite order. Each test's output is buffered and replayed in that same
+        order, so logs read exactly as they do in a sequential run. Outcomes are
+        recorded in the test history under `suite`, if given.
+        """
+        def run_timed(test_case, test_echo):
+            with self._test_slots:
+                start = time.perf_counter()
+                result = self._run_single_test(test_case, system_prompt, user_payload_template, test_echo)
+                return result, time.perf_counter() - start
+
+        if self.jobs == 1 or len(tests) < 2:
+            timed = [run_timed(t, echo) for t in tests]
+        else:
+            def run_buffered(test_case):
+                lines = []
+                result, latency = run_timed(test_case, lambda message='', **style: lines.append((message, style)))
+                return result, latency, lines
+
+            timed = []
+            with ThreadPoolExecutor(max_workers=min(self.jobs, len(tests))) as pool:
+                # `map` yields in submission order, so output is flushed as soon as every earlier test is done.
+                for result, latency, lines in pool.map(propagate_context(run_buffered), tests):
+                    for message, style in lines:
+                        echo(message, **style)
+                    timed.append((result, latency))
+
+        if suite is not None and timed:
+            prompt_hash = self._prompt_hash(system_prompt)
+            self.history.record(suite, [(result[0], result[1], latency,
+                                         self._test_fingerprint(test_case, prompt_hash, user_payload_template))
+                                        for test_case, (result, latency) in zip(tests, timed)])
+        return [result for result, _ in timed]
+
+    def _run_until_failure(self, tests: list, system_prompt: str, user_payload_template: "Template",
+                           echo=click.secho, suite: str = None) -> tuple[int, tuple | None]:
+        """
+        Runs tests in order, `self.jobs` at a time, and stops after the batch in which
+        the first one fails. Returns (tests run, first failing result or None).
+        """
+        ran = 0
+        for start in range(0, len(tests), self.jobs):
+            batch = tests[start:start + self.jobs]
+            results = self._run_tests(batch, system_prompt, user_payload_template, echo, suite)
+            ran += len(batch)
+            failure = next((result for result in results if not result[1]), None)
+            if failure is not None:
+                return ran, failure
+        return ran, None
+
+    def _by_failure_risk(self, prompt_dict: dict, tests: list) -> list:
+        """The tests ordered by their historical failure rate, most likely to fail first."""
+        suite = self._suite(prompt_dict)
+        if suite is None:
+            return list(tests)
+        scores = self.history.failure_scores(suite)
+        return sorted(tests, key=lambda t: -scores.get(t['name'], 0.5))
+
+    @staticmethod
+    def _suite(prompt_dict: dict) -> str | None:
+        """The name test outcomes are recorded under: the prompt's meta id."""
+        return prompt_dict.get('meta', {}).get('id')
+
+    def _prompt_hash(self, system_prompt: str) -> str:
+        # The model is part of the effective prompt: a pass on one model says nothing about another.
+        return content_hash(f"{getattr(self.llm, 'model_id', '')}\n{system_prompt}")
+
+    @staticmethod
+    def _test_fingerprint(test_case: dict, prompt_hash: str, user_payload_template: "Template") -> tuple:
+        """(prompt hash, rendered user prompt hash, assertions hash): everything a test's outcome depends on."""
+        return (prompt_hash,
+                content_hash(user_payload_template.render(**test_case['inputs'])),
+                content_hash(json.dumps(test_case.get('assert', []), sort_keys=True)))
+
+    def _select_changed_tests(self, suite: str, tests: list, system_prompt: str,
+                              user_payload_template: "Template") -> tuple[list, list]:
+        """
+        Splits tests into (to run, skipped): a test is skipped when its latest run with
+        the same fingerprint passed recently. Tests whose last run failed go first.
+        """
+        prompt_hash = self._prompt_hash(system_prompt)
+        passes = self.history.recent_passes(suite)
+        to_run, skipped = [], []
+        for test_case in tests:
+            key = (test_case['name'], self._test_fingerprint(test_case, prompt_hash, user_payload_template))
+            (skipped if key in passes else to_run).append(test_case)
+        last_outcomes = self.history.last_outcomes(suite)
+        to_run.sort(key=lambda t: last_outcomes.get(t['name'], True))
+        return to_run, skipped
+
+    # Pass rates closer than this to the threshold are not worth more samples to tell apart.
+    SAMPLE_MARGIN = 0.1
+
+    def _sample_tests(self, tests: list, system_prompt: str, user_payload_template: "Template",
+                      samples: int, confidence: float, threshold: float) -> list[SequentialPassRate]:
+        """
+        Runs each test up to `samples` times on `self.jobs` workers and stops sampling a
+        test once its pass rate is decided above or below `threshold`. The next sample
+        always goes to the undecided test with the fewest, so no test waits for another
+        to finish. Returns one tracker per test, in suite order. Samples are not
+        recorded in the test history.
+        """
+        trackers = [SequentialPassRate(threshold, confidence, self.SAMPLE_MARGIN) for _ in tests]
+        in_flight = [0] * len(tests)
+
+        def next_test() -> int | None:
+            open_tests = [i for i, tracker in enumerate(trackers)
+                          if tracker.verdict is None and tracker.runs + in_flight[i] < samples]
+            return min(open_tests, key=lambda i: trackers[i].runs + in_flight[i], default=None)
+
+        quiet = lambda message='', **style: None
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            pending = {}
+            while True:
+                while len(pending) < self.jobs and (i := next_test()) is not None:
+                    pending[pool.submit(propagate_context(self._run_single_test), tests[i], system_prompt,
+                                        user_payload_template, quiet)] = i
+                    in_flight[i] += 1
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = pending.pop(future)
+                    in_flight[i] -= 1
+                    tracker = trackers[i]
+                    decided = tracker.verdict is not None
+                    tracker.add(future.result()[1])
+                    if not decided and (tracker.verdict is not None or tracker.runs == samples):
+                        self._echo_pass_rate(tests[i]['name'], tracker, confidence)
+        return trackers
+
+    @staticmethod
+    def _echo_pass_rate(test_name: str, tracker: SequentialPassRate, confidence: float):
+        low, high = wilson_interval(tracker.passes, tracker.runs, confidence)
+        label, color = {True: ("PASS", 'green'), False: ("FAIL", 'red'), None: ("UNDECIDED", 'yellow')}[tracker.verdict]
+        click.secho(f"[{label}] Test: \"{test_name}\" - {tracker.passes}/{tracker.runs} passed "
+                    f"({tracker.passes / tracker.runs:.0%}, {confidence:.0%} CI {low:.0%}-{high:.0%})", fg=color)
+
+    def _run_all_tests_and_get_failures(self, prompt_dict: dict, echo=click.secho, record: bool = True) -> list:
+        """
+        Runs all assertion tests and returns a list of failure details. Pass `record=False`
+        for trial rule sets, whose outcomes must not count in the suite's history.
+        """
+        system_prompt = self._test_system_prompt(prompt_dict)
+        user_payload_template = _template(prompt_dict.get("payload", ""))
         failing_tests = []
         tests_to_run = [t for t in prompt_dict.get('tests', []) if 'assert' in t]
 
-        for test in tests_to_run:
-            name, passed, failed_assertion, output = self._run_single_test(test, system_prompt, user_payload_template)
+        suite = self._suite(prompt_dict) if record else None
+        results = self._run_tests(tests_to_run, system_prompt, user_payload_template, echo, suite)
+        for test, (name, passed, failed_assertion, output) in zip(tests_to_run, results):
             if not passed:
                 failing_tests.append({
                     "name": name,
@@ -484,39 +1013,235 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
     # --- Public API Methods ---
 
     def load(self, filepath: str) -> tuple[str, str]:
+        """
+        Returns the system prompt and the payload template. With `example_selection: "knn"`
+        the system prompt has no examples; use `render` to get them for a request.
+        """
         prompt_dict = self._parse_and_transform(Path(filepath))
         system_prompt = self._generate_system_prompt(prompt_dict)
         return system_prompt, prompt_dict.get("payload", "")
 
-    def test(self, filepath: str) -> bool:
+    def render(self, filepath: str, inputs: dict) -> tuple[str, str]:
+        """
+        Returns the system prompt and the rendered user message for one request. With
+        `example_selection: "knn"`, the system prompt carries the examples most similar to
+        this request; the example index is built once per loaded version of the file.
+        """
+        return self._render_prepared(self._prepare(filepath), inputs)
+
+    def _render_prepared(self, prepared: tuple, inputs: dict) -> tuple[str, str]:
+        prompt_dict, payload_template, selector, static_prompt = prepared
+        user_message = payload_template.render(**inputs)
+        if selector is None:
+            return static_prompt, user_message
+        return self._generate_system_prompt(prompt_dict, user_message=user_message, selector=selector), user_message
+
+    def _prepare(self, filepath: str) -> tuple:
+        """Parses a file once per version and keeps what `render` needs for every request."""
+        path_obj = Path(filepath)
+        signature = self._import_graph_signature(path_obj)
+        prepared = self._prepared.get(signature)
+        if prepared is None:
+            prompt_dict = self._parse_and_transform(path_obj)
+            selector = self._example_selector(prompt_dict)
+            static_prompt = None if selector else self._generate_system_prompt(prompt_dict)
+            prepared = (prompt_dict, _template(prompt_dict.get("payload", "")), selector, static_prompt)
+            self._prepared[signature] = prepared
+        return prepared
+
+    def token_breakdown(self, filepath: str) -> dict:
+        """Estimated tokens per system prompt section, as sent by `load`, with the configured budget."""
+        prompt_dict = self._parse_and_transform(Path(filepath))
+        sections = self._system_prompt_sections(prompt_dict)
+        return {
+            "sections": [(name, estimate_tokens(text)) for name, text in sections],
+            "total": estimate_tokens(self._generate_system_prompt(prompt_dict)),
+            "budget": prompt_dict.get('config', {}).get('max_prompt_tokens'),
+        }
+
+    def build(self, filepath: str, output_path: str = None) -> Path:
+        """
+        Compiles an axiom file into a versioned `.axiomc` artifact that production code
+        can read with `axiom.runtime.load_compiled`, without ANTLR or the visitor.
+        """
+        path_obj = Path(filepath)
+        artifact = self._build_artifact(path_obj)
+        output = Path(output_path) if output_path else path_obj.with_suffix('.axiomc')
+        output.write_text(json.dumps(artifact, indent=2, ensure_ascii=False), encoding="utf-8")
+        return output
+
+    def compile(self, filepath: str) -> CompiledPrompt:
+        """Compiles an axiom file in memory, exactly as `build` would, without writing the artifact."""
+        return CompiledPrompt(self._build_artifact(Path(filepath)))
+
+    def _build_artifact(self, path_obj: Path) -> dict:
+        signature = self._import_graph_signature(path_obj)
+        prompt_dict = self._parse_and_transform(path_obj)
+
+        # Reject malformed assertions now rather than in the middle of a test run.
+        errors = self._compile_assertions(prompt_dict)
+        if errors:
+            raise AssertionCompileError("\n".join(errors))
+        assertions = [{"test": t['name'], "assert": t['assert']} for t in prompt_dict.get('tests', []) if 'assert' in t]
+
+        artifact = {
+            "format": ARTIFACT_FORMAT,
+            "version": ARTIFACT_VERSION,
+            "id": prompt_dict.get('meta', {}).get('id'),
+            # Covers the file and everything it imports, independent of where they live on disk.
+            "source_hash": content_hash("".join(file_hash for _, file_hash in signature)),
+            "system_prompt": self._generate_system_prompt(prompt_dict),
+            "payload": prompt_dict.get("payload", ""),
+            "prompt": prompt_dict,
+            "assertions": assertions,
+        }
+        selector = self._example_selector(prompt_dict)
+        if selector is not None:
+            # Examples are picked per request by the runtime, within the same token budget.
+            budget = prompt_dict.get('config', {}).get('max_prompt_tokens')
+            artifact["examples"] = [{"user": user, "expected_output": output} for user, output in selector.pairs]
+            artifact["example_count"] = selector.count
+            artifact["example_tokens"] = (budget - estimate_tokens(artifact["system_prompt"] + "\n\n")
+                                          if budget is not None else None)
+        return artifact
+
+    def run(self, filepath: str, input_path: str = None, output_path: str = None, retry_errors: bool = False) -> dict:
+        """
+        Runs the prompt over every JSON object in the JSONL `input_path` (or, without
+        one, over the inputs of the file's tests), up to `self.jobs` at a time. Results
+        are appended to `output_path` (or printed) as they complete, tagged with their
+        input line index. Records that already have a result in `output_path` are
+        skipped, so an interrupted run picks up where it stopped.
+        """
+        prepared = self._prepare(filepath)
+        completed = scan_output(output_path, retry_errors) if output_path else CompletedRecords()
+        counts = {"completed": 0, "failed": 0, "skipped": completed.count}
+
+        def run_record(index, inputs):
+            with span("record", index=index):
+                try:
+                    system_prompt, user_message = self._render_prepared(prepared, inputs)
+                except Exception as e:
+                    return {"error": f"Could not render the payload: {e}"}
+                return self.llm.execute(system_prompt, user_message)
+
+        def write(index, response):
+            out.write(result_line(index, response))
+            out.flush()
+            counts["failed" if "error" in response else "completed"] += 1
+
+        if input_path is None:
+            tests = prepared[0].get('tests', [])
+            input_file = None
+            lines = (json.dumps(t.get('inputs', {})) for t in tests)
+        else:
+            input_file = open(input_path, encoding="utf-8")
+            lines = input_file
+        out = open(output_path, "a", encoding="utf-8") if output_path else click.get_text_stream('stdout')
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+                pending = {}
+                for index, inputs, error in iter_records(lines):
+                    if index in completed:
+                        continue
+                    if error is not None:
+                        write(index, {"error": error})
+                        continue
+                    # Keep at most `jobs` records in flight, so memory stays flat for any input size.
+                    while len(pending) >= self.jobs:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            write(pending.pop(future), future.result())
+                    pending[pool.submit(propagate_context(run_record), index, inputs)] = index
+                for future in as_completed(list(pending)):
+                    write(pending.pop(future), future.result())
+        finally:
+            if input_file is not None:
+                input_file.close()
+            if output_path:
+                out.close()
+        return counts
+
+    def test(self, filepath: str, changed_only: bool = False, samples: int = 1, confidence: float = 0.95,
+             threshold: float = 0.8) -> bool:
+        """
+        Runs every assertion test. With `changed_only`, tests whose system prompt, user
+        prompt and assertions are unchanged since a recent pass are skipped, and tests
+        that failed last time run first. With `samples` above 1, each test passes when
+        its pass rate over up to that many samples is above `threshold` at `confidence`.
+        """
         prompt_dict = self._parse_and_transform(Path(filepath))
-        system_prompt = self._generate_system_prompt(prompt_dict, use_examples=False)
-        user_payload_template = Template(prompt_dict.get("payload", ""))
+        if not self._check_assertions(prompt_dict):
+            return False
+        system_prompt = self._test_system_prompt(prompt_dict)
+        user_payload_template = _template(prompt_dict.get("payload", ""))
         all_passed = True
         tests_to_run = [t for t in prompt_dict.get('tests', []) if 'assert' in t]
         if not tests_to_run:
             print("No assertion tests found.")
             return True
-        for test in tests_to_run:
-            _, passed, _, _ = self._run_single_test(test, system_prompt, user_payload_template)
+        suite = self._suite(prompt_dict)
+        skipped = []
+        if changed_only and suite is None:
+            click.secho("⚠️  --changed needs a meta id to find past results. Running every test.", fg='yellow')
+        elif changed_only:
+            tests_to_run, skipped = self._select_changed_tests(suite, tests_to_run, system_prompt,
+                                                               user_payload_template)
+            for test_case in skipped:
+                click.secho(f"[SKIPPED] Test: \"{test_case['name']}\" (unchanged since a recent pass)", fg='blue')
+        if samples > 1:
+            return self._test_pass_rates(tests_to_run, system_prompt, user_payload_template,
+                                         samples, confidence, threshold)
+        for _, passed, _, _ in self._run_tests(tests_to_run, system_prompt, user_payload_template, suite=suite):
             if not passed: all_passed = False
         print("\n--- Test Summary ---")
+        if skipped:
+            print(f"Ran {len(tests_to_run)} test(s); skipped {len(skipped)} unchanged since a recent pass.")
         if all_passed:
             print("✅ All assertion tests passed!")
         else:
             print("❌ Some assertion tests failed.")
         return all_passed
 
+    def _test_pass_rates(self, tests: list, system_prompt: str, user_payload_template: "Template",
+                         samples: int, confidence: float, threshold: float) -> bool:
+        if not tests:
+            print("\n--- Test Summary ---")
+            print("No tests left to sample: every test is unchanged since a recent pass.")
+            return True
+        needed = SequentialPassRate(threshold, confidence, self.SAMPLE_MARGIN).min_runs_to_accept
+        if samples < needed:
+            click.secho(f"⚠️  {samples} samples can never show a pass rate above {threshold:.0%} at "
+                        f"{confidence:.0%} confidence; use --samples {needed} or more. Tests can still fail.",
+                        fg='yellow')
+        click.secho(f"Sampling each of {len(tests)} test(s) up to {samples} times "
+                    f"(pass rate threshold {threshold:.0%}, confidence {confidence:.0%})...", fg='cyan')
+        trackers = self._sample_tests(tests, system_prompt, user_payload_template, samples, confidence, threshold)
+        print("\n--- Test Summary ---")
+        for test_case, tracker in zip(tests, trackers):
+            self._echo_pass_rate(test_case['name'], tracker, confidence)
+        verdicts = [tracker.verdict for tracker in trackers]
+        runs = sum(tracker.runs for tracker in trackers)
+        print(f"{verdicts.count(True)} above, {verdicts.count(False)} below and {verdicts.count(None)} undecided "
+              f"after {runs} sample(s) ({runs / (samples * len(tests)):.0%} of a fixed {samples}-sample run).")
+        if all(verdicts):
+            print(f"✅ Every test passes at least {threshold:.0%} of the time!")
+            return True
+        print("❌ Some tests pass too rarely, or could not be decided.")
+        return False
+
     def compile_examples(self, filepath: str):
         print(f"\n--- Compiling Examples for: {filepath} ---")
         path_obj = Path(filepath)
         prompt_dict = self._parse_and_transform(path_obj)
-        system_prompt = self._generate_system_prompt(prompt_dict, use_examples=False)
-        user_payload_template = Template(prompt_dict.get("payload", ""))
+        if not self._check_assertions(prompt_dict):
+            return
+        system_prompt = self._test_system_prompt(prompt_dict)
+        user_payload_template = _template(prompt_dict.get("payload", ""))
         file_was_modified = False
-        for test_case_dict in prompt_dict.get('tests', []):
-            if 'assert' not in test_case_dict: continue
-            _, passed, _, llm_output = self._run_single_test(test_case_dict, system_prompt, user_payload_template)
+        tests_to_run = [t for t in prompt_dict.get('tests', []) if 'assert' in t]
+        results = self._run_tests(tests_to_run, system_prompt, user_payload_template, suite=self._suite(prompt_dict))
+        for test_case_dict, (_, passed, _, llm_output) in zip(tests_to_run, results):
             if passed:
                 print(f"  - ✅ Assertions PASSED. Promoting to example for \"{test_case_dict['name']}\".")
                 test_case_dict['expected_output'] = llm_output
@@ -533,26 +1258,89 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
     # --- DEFINITIVE FIX: Rewritten Validation Logic ---
 
     def _validate_test_cases(self, prompt_dict: dict) -> bool:
-        """Validates the test suite for contradictory assertions."""
+        """
+        Validates the test suite for contradictory assertions. Only pairs that survive
+        the local pre-filter are sent to the meta-LLM, several pairs per prompt.
+        """
         tests = [t for t in prompt_dict.get('tests', []) if 'assert' in t]
         if len(tests) < 2:
             print("  - ✅ No test conflicts found (fewer than 2 assertion tests).")
             return True
 
-        for i in range(len(tests)):
-            for j in range(i + 1, len(tests)):
-                test1, test2 = tests[i], tests[j]
-                meta_prompt = self._construct_test_conflict_meta_prompt(test1, test2)
-                response = self.llm.execute(meta_prompt, "Analyze.")
-                if response.get("is_conflicting"):
-                    click.secho(f"  - ❌ Test Conflict Found between \"{test1['name']}\" and \"{test2['name']}\"",
+        pairs = self._candidate_conflict_pairs(tests)
+        total_pairs = len(tests) * (len(tests) - 1) // 2
+        print(f"  - Checking {len(pairs)} of {total_pairs} test pairs "
+              f"({total_pairs - len(pairs)} pruned locally as unrelated).")
+
+        batch_size = self.TEST_CONFLICT_BATCH_SIZE
+        batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+        responses = self._execute_many([
+            (self._construct_test_conflict_batch_meta_prompt([(tests[i], tests[j]) for i, j in batch]), "Analyze.")
+            for batch in batches
+        ])
+        for batch, response in zip(batches, responses):
+            verdicts = self._parse_batch_conflicts(response, len(batch))
+            if verdicts is None:
+                # Malformed batch answer: judge this batch's pairs one at a time instead.
+                single_responses = self._execute_many(
+                    [(self._construct_test_conflict_meta_prompt(tests[i], tests[j]), "Analyze.") for i, j in batch])
+                verdicts = [(bool(r.get("is_conflicting")), r.get("reason")) for r in single_responses]
+            for (i, j), (is_conflicting, reason) in zip(batch, verdicts):
+                if is_conflicting:
+                    click.secho(f"  - ❌ Test Conflict Found between \"{tests[i]['name']}\" and \"{tests[j]['name']}\"",
                                 fg='red')
-                    click.echo(f"    Reason: {response.get('reason')}")
+                    click.echo(f"    Reason: {reason}")
                     return False
 
         print("  - ✅ No test conflicts found.")
         return True
 
+    def _candidate_conflict_pairs(self, tests: list) -> list[tuple[int, int]]:
+        """
+        Returns the index pairs of tests that could plausibly conflict: their inputs are
+        similar and their assertions read at least one common output field.
+        """
+        from .similarity import cosine_similarity_matrix, similar_pairs, tfidf_matrix, tokenize
+
+        documents = [tokenize(" ".join(str(v) for v in t.get('inputs', {}).values())) for t in tests]
+        similarities = cosine_similarity_matrix(tfidf_matrix(documents))
+        fields = [self._assertion_fields(t) for t in tests]
+        return [
+            (i, j) for i, j in similar_pairs(similarities, self.TEST_CONFLICT_MIN_SIMILARITY)
+            if fields[i] is None or fields[j] is None or fields[i] & fields[j]
+        ]
+
+    @staticmethod
+    def _assertion_fields(test_case: dict) -> frozenset | None:
+        """The output fields a test's assertions read, or None if any assertion reads the whole output."""
+        fields = frozenset()
+        for assertion in test_case.get('assert', []):
+            try:
+                assertion_fields = referenced_fields(assertion['expression'])
+            except SyntaxError:
+                return None
+            if assertion_fields is None:
+                return None
+            fields |= assertion_fields
+        return fields
+
+    @staticmethod
+    def _parse_batch_conflicts(response: dict, expected_count: int) -> list[tuple[bool, str]] | None:
+        """Returns (is_conflicting, reason) per pair in order, or None if the response is malformed."""
+        results = response.get("results")
+        if not isinstance(results, list) or len(results) != expected_count:
+            return None
+        verdicts = {}
+        for position, item in enumerate(results, start=1):
+            if not isinstance(item, dict) or not isinstance(item.get("is_conflicting"), bool):
+                return None
+            pair_id = item.get("pair", position)
+            if (not isinstance(pair_id, int) or isinstance(pair_id, bool) or pair_id in verdicts
+                    or not 1 <= pair_id <= expected_count):
+                return None
+            verdicts[pair_id] = (item["is_conflicting"], item.get("reason"))
+        return [verdicts[i] for i in range(1, expected_count + 1)]
+
     def improve(self, filepath: str, test_name: str = None):
         """
         Intelligently improves a prompt. If a test_name is provided, it focuses
@@ -561,7 +1349,9 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
         path_obj = Path(filepath)
         print(f"\n--- Improving Prompt for: {filepath} ---")
         prompt_dict = self._parse_and_transform(path_obj)
-        user_payload_template = Template(prompt_dict.get("payload", ""))
+        if not self._check_assertions(prompt_dict):
+            return
+        user_payload_template = _template(prompt_dict.get("payload", ""))
 
         failing_test_details = None
 
@@ -574,7 +1364,7 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
                 click.secho(f"❌ ERROR: Test named '{test_name}' with an 'assert' block not found.", fg='red')
                 return
 
-            system_prompt = self._generate_system_prompt(prompt_dict, use_examples=False)
+            system_prompt = self._test_system_prompt(prompt_dict)
             _, passed, failed_assertion, bad_output = self._run_single_test(target_test, system_prompt,
                                                                             user_payload_template)
 
@@ -613,16 +1403,67 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
         )
         suggestion_response = self.llm.execute(meta_prompt, "Provide your suggestions.")
 
-        if "error" in suggestion_response or "strategies" not in suggestion_response:
+        if "error" in suggestion_response or not suggestion_response.get("strategies"):
             click.secho("❌ Meta-LLM failed to generate valid strategies. Please try again.", fg='red')
             return
 
         strategies = suggestion_response['strategies']
+        test_to_rerun = next((t for t in prompt_dict.get('tests', []) if t['name'] == failing_test_details['name']),
+                             None)
+
+        # Every strategy is sandbox-tested in the background while the user reads the diffs.
+        pool = ThreadPoolExecutor(max_workers=min(len(strategies), self.jobs), thread_name_prefix="axiom-sandbox")
+        sandbox = propagate_context(self._sandbox_strategy)
+        sandboxes = [pool.submit(sandbox, prompt_dict, strategy, test_to_rerun, user_payload_template)
+                     for strategy in strategies]
+        try:
+            self._choose_strategy(path_obj, prompt_dict, strategies, sandboxes)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
+    def _sandbox_strategy(self, prompt_dict: dict, strategy: dict, test_case: dict,
+                          user_payload_template: "Template") -> tuple[bool, str | None, int, list]:
+        """
+        Runs the failing test against the strategy's rules and, if it now passes, the rest
+        of the suite, most failure-prone tests first, stopping at the first regression.
+        Returns (fixed, name of the first test it breaks or None, tests run, buffered output lines).
+        Outcomes are not recorded in the test history, since the rules are only a trial.
+        """
+        lines = []
+        echo = lambda message='', **style: lines.append((message, style))
+        temp_prompt_dict = prompt_dict.copy()
+        temp_prompt_dict['rules'] = strategy['proposed_rules']
+        temp_system_prompt = self._test_system_prompt(temp_prompt_dict)
+
+        ran, failure = self._run_until_failure([test_case], temp_system_prompt, user_payload_template, echo)
+        if failure is not None:
+            return False, None, ran, lines
+        others = [t for t in self._by_failure_risk(prompt_dict, prompt_dict.get('tests', []))
+                  if 'assert' in t and t['name'] != test_case['name']]
+        more, failure = self._run_until_failure(others, temp_system_prompt, user_payload_template, echo)
+        return True, failure[0] if failure else None, ran + more, lines
+
+    @staticmethod
+    def _sandbox_status(sandbox) -> tuple[str, str]:
+        if not sandbox.done():
+            return "pending", 'yellow'
+        if sandbox.exception() is not None:
+            return f"sandbox error: {sandbox.exception()}", 'red'
+        fixed, regression, ran, _ = sandbox.result()
+        if not fixed:
+            return "❌ still fails", 'red'
+        if regression:
+            return f"❌ breaks \"{regression}\"", 'red'
+        return f"✅ passes all {ran} tests", 'green'
+
+    def _choose_strategy(self, path_obj: Path, prompt_dict: dict, strategies: list, sandboxes: list):
+        first_round = True
         while True:
             print("\n--- AI Co-pilot suggests the following strategies: ---")
-            for i, strategy in enumerate(strategies):
-                click.secho(f"[{i + 1}] Strategy: {strategy['reason']}", bold=True)
+            for i, (strategy, sandbox) in enumerate(zip(strategies, sandboxes)):
+                status, color = self._sandbox_status(sandbox)
+                click.secho(f"[{i + 1}] Strategy: {strategy['reason']} ", bold=True, nl=False)
+                click.secho(f"[{status}]", fg=color)
                 original_rule_texts = [r['text'] for r in self._normalize_rules(prompt_dict.get('rules', [])) if
                                        r.get('status') != 'deleted']
                 matcher = difflib.SequenceMatcher(None, original_rule_texts, strategy['proposed_rules'])
@@ -632,33 +1473,48 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
                     if tag == 'insert' or tag == 'replace':
                         for text in strategy['proposed_rules'][j1:j2]: click.secho(f"    + {text}", fg='green')
 
+            if first_round:
+                first_round = False
+                # Choosing does not wait for the other sandboxes; their status is refreshed on every listing.
+                print("\n[Step 3/3] Sandbox testing all strategies in the background...")
+
             try:
-                choice = int(input("\nChoose a strategy to sandbox test (1, 2, 3) or 0 to exit: "))
+                numbers = ", ".join(str(i + 1) for i in range(len(strategies)))
+                choice = int(input(f"\nChoose a strategy ({numbers}) or 0 to exit: "))
                 if choice == 0:
                     print("Exiting.")
                     return
+                if choice < 0:
+                    raise IndexError
                 chosen_strategy = strategies[choice - 1]
             except (ValueError, IndexError):
                 print("Invalid choice. Please try again.")
                 continue
 
-            print(f"\n[Step 3/3] Sandbox testing Strategy #{choice}...")
-            temp_prompt_dict = prompt_dict.copy()
-            temp_prompt_dict['rules'] = chosen_strategy['proposed_rules']
-            temp_system_prompt = self._generate_system_prompt(temp_prompt_dict, use_examples=False)
-
-            # The test to run is the one we identified at the start
-            test_to_rerun = next((t for t in prompt_dict.get('tests', []) if t['name'] == failing_test_details['name']),
-                                 None)
-            _, test_passed, _, _ = self._run_single_test(test_to_rerun, temp_system_prompt, user_payload_template)
+            print(f"\nSandbox run of Strategy #{choice}:")
+            if not sandboxes[choice - 1].done():
+                click.secho("  Waiting for its sandbox run to finish...", fg='yellow')
+            try:
+                test_passed, regression, ran, lines = sandboxes[choice - 1].result()
+            except Exception as e:
+                click.secho(f"❌ The sandbox run failed: {e}", fg='red')
+                continue
+            for message, style in lines:
+                click.secho(message, **style)
 
-            if test_passed:
-                click.secho("\n✅ This strategy worked! The test now passes.", fg='green', bold=True)
+            if test_passed and regression:
+                click.secho(f"\n❌ This strategy fixes the test but breaks \"{regression}\".", fg='red', bold=True)
+                if input("Try another strategy? (y/n): ").lower() != 'y':
+                    print("Exiting.")
+                    return
+            elif test_passed:
+                click.secho(f"\n✅ This strategy worked! The test now passes, and so do the other {ran - 1}.",
+                            fg='green', bold=True)
                 if input("Apply these changes to the file? (y/n): ").lower() == 'y':
                     prompt_dict['rules'] = chosen_strategy['proposed_rules']
                     new_content = self._serialize_to_axiom_string(prompt_dict)
                     path_obj.write_text(new_content, encoding="utf-8")
-                    print(f"✅ Successfully updated rules in {filepath}")
+                    print(f"✅ Successfully updated rules in {path_obj}")
                 else:
                     print("Changes discarded.")
                 return
@@ -668,6 +1524,135 @@ Your response MUST be a single, valid JSON object that conforms to the schema. I
                     print("Exiting.")
                     return
 
+    def improve_auto(self, filepath: str, beam_width: int = 3, max_rounds: int = 5, max_llm_calls: int = None,
+                     max_seconds: float = None, dry_run: bool = False) -> bool:
+        """
+        Improves the rules without interaction by beam search. Each round brainstorms
+        strategies for a failing test of every rule set in the beam, evaluates all new
+        candidates against the whole suite in parallel, and keeps the `beam_width` rule
+        sets that pass the most tests. Stops when every test passes or a budget (rounds,
+        LLM calls or seconds) is spent, then writes the best rule set found unless
+        `dry_run`. Returns True if every test passes with it.
+        """
+        path_obj = Path(filepath)
+        print(f"\n--- Automatically improving rules for: {filepath} ---")
+        prompt_dict = self._parse_and_transform(path_obj)
+        if not self._check_assertions(prompt_dict):
+            return False
+        test_count = len([t for t in prompt_dict.get('tests', []) if 'assert' in t])
+        original_rules = [r['text'] for r in self._normalize_rules(prompt_dict.get('rules', []))
+                          if r.get('status') != 'deleted']
+
+        budget = SearchBudget(max_calls=max_llm_calls, max_seconds=max_seconds, max_rounds=max_rounds)
+        llm, self.llm = self.llm, BudgetedLLM(self.llm, budget)
+        try:
+            beam, baseline_failures, stop_reason = self._beam_search(prompt_dict, original_rules, budget, beam_width,
+                                                                     test_count)
+        finally:
+            self.llm = llm
+
+        if not beam:
+            click.secho(f"❌ Could not evaluate the current rules: {stop_reason}.", fg='red')
+            return False
+        best_rules, best_failures = beam[0]
+        click.secho(f"\nSearch stopped: {stop_reason} ({budget.calls} LLM calls, {budget.elapsed:.0f}s, "
+                    f"{budget.rounds} round(s)).", fg='blue')
+        click.secho(f"Best rule set passes {test_count - len(best_failures)}/{test_count} tests.",
+                    fg='green' if not best_failures else 'yellow', bold=True)
+
+        if len(best_failures) >= baseline_failures:
+            print("No rule set did better than the current rules. The file is unchanged.")
+            return not best_failures
+        matcher = difflib.SequenceMatcher(None, original_rules, best_rules)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag in ('delete', 'replace'):
+                for text in original_rules[i1:i2]: click.secho(f"    - {text}", fg='red')
+            if tag in ('insert', 'replace'):
+                for text in best_rules[j1:j2]: click.secho(f"    + {text}", fg='green')
+        if dry_run:
+            print("Dry run: the file is unchanged.")
+        else:
+            prompt_dict['rules'] = best_rules
+            path_obj.write_text(self._serialize_to_axiom_string(prompt_dict), encoding="utf-8")
+            print(f"✅ Successfully updated rules in {filepath}")
+        return not best_failures
+
+    def _beam_search(self, prompt_dict: dict, original_rules: list, budget: SearchBudget, beam_width: int,
+                     test_count: int) -> tuple[list, int | None, str]:
+        """
+        Returns the final beam as (rules, failures) pairs, best first, the number of tests
+        the original rules fail, and why the search stopped.
+        """
+        def quiet(*args, **kwargs):
+            pass
+
+        def evaluate(rules, record=False):
+            # Only the current rules are recorded in the history; candidates are trials.
+            candidate = prompt_dict.copy()
+            candidate['rules'] = rules
+            return self._run_all_tests_and_get_failures(candidate, echo=quiet, record=record)
+
+        def rank(state):
+            rules, failures = state
+            # Fewer failures first, then the shorter rule set.
+            return len(failures), len(rules)
+
+        print("\n[Round 0] Evaluating the current rules...")
+        try:
+            beam = [(original_rules, evaluate(original_rules, record=True))]
+        except BudgetExhausted as e:
+            return [], None, str(e)
+        baseline_failures = len(beam[0][1])
+        seen = {tuple(original_rules)}
+        click.secho(f"  Current rules pass {test_count - len(beam[0][1])}/{test_count} tests.", fg='cyan')
+
+        while True:
+            if not beam[0][1]:
+                return beam, baseline_failures, "every test passes"
+            stop_reason = budget.exhausted()
+            if stop_reason:
+                return beam, baseline_failures, stop_reason
+            budget.rounds += 1
+            print(f"\n[Round {budget.rounds}] Brainstorming from {len(beam)} rule set(s)...")
+
+            try:
+                candidates = []
+                for position, (rules, failures) in enumerate(beam):
+                    # Different beam entries target different failures, to keep the candidates diverse.
+                    target = failures[position % len(failures)]
+                    state = prompt_dict.copy()
+                    state['rules'] = rules
+                    meta_prompt = self._construct_brainstorm_meta_prompt(state, target, target['output'],
+                                                                         target['failed_assertion'])
+                    response = self.llm.execute(meta_prompt, "Provide your suggestions.")
+                    for strategy in response.get('strategies') or []:
+                        proposed = strategy.get('proposed_rules') if isinstance(strategy, dict) else None
+                        if (isinstance(proposed, list) and all(isinstance(r, str) for r in proposed)
+                                and tuple(proposed) not in seen):
+                            seen.add(tuple(proposed))
+                            candidates.append(proposed)
+            except BudgetExhausted as e:
+                return beam, baseline_failures, str(e)
+            if not candidates:
+                return beam, baseline_failures, "the meta-LLM proposed no new rule sets"
+
+            print(f"  Evaluating {len(candidates)} candidate rule set(s) against {test_count} tests...")
+            evaluated = []
+            exhausted = None
+            with ThreadPoolExecutor(max_workers=min(len(candidates), self.jobs)) as pool:
+                futures = {pool.submit(propagate_context(evaluate), rules): rules for rules in candidates}
+                for future in as_completed(futures):
+                    try:
+                        evaluated.append((futures[future], future.result()))
+                    except BudgetExhausted as e:
+                        # A candidate cut short by the budget has no score; the others still count.
+                        exhausted = str(e)
+            beam = sorted(beam + evaluated, key=rank)[:beam_width]
+            best = test_count - len(beam[0][1])
+            click.secho(f"  Best so far: {best}/{test_count} tests pass ({budget.calls} LLM calls used).", fg='cyan')
+            if exhausted:
+                return beam, baseline_failures, exhausted
+
     def validate(self, filepath: str) -> bool:
         """
         Analyzes prompt rules and tests for contradictions and redundancies.
@@ -0,0 +1,74 @@
+"""
+Budgets for unattended rule search (`main.py improve --auto`).
+
+`BudgetedLLM` wraps an `LLMInterface` and counts every completion it requests,
+including test runs and semantic checks. Once the call or wall-clock budget is
+spent, further calls raise `BudgetExhausted`, so no round can overrun it.
+"""
+import threading
+import time
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+class SearchBudget:
+    def __init__(self, max_calls: int = None, max_seconds: float = None, max_rounds: int = None):
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.max_rounds = max_rounds
+        self.calls = 0
+        self.rounds = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def exhausted(self) -> str | None:
+        """The reason the search must stop, or None while there is budget left."""
+        if self.max_calls is not None and self.calls >= self.max_calls:
+            return f"LLM call budget of {self.max_calls} spent"
+        if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+            return f"time budget of {self.max_seconds:.0f}s spent"
+        if self.max_rounds is not None and self.rounds >= self.max_rounds:
+            return f"{self.max_rounds} round(s) done"
+        return None
+
+    def charge(self, calls: int = 1):
+        with self._lock:
+            if self.max_calls is not None and self.calls + calls > self.max_calls:
+                raise BudgetExhausted(f"LLM call budget of {self.max_calls} spent")
+            if self.max_seconds is not None and self.elapsed >= self.max_seconds:
+                raise BudgetExhausted(f"time budget of {self.max_seconds:.0f}s spent")
+            self.calls += calls
+
+
+class BudgetedLLM:
+    """Charges `budget` for every completion before delegating to `llm`."""
+
+    def __init__(self, llm, budget: SearchBudget):
+        self._llm = llm
+        self.budget = budget
+        # Only offer the optional methods the wrapped interface has, since the SDK checks for them.
+        if hasattr(llm, "execute_streaming"):
+            self.execute_streaming = self._execute_streaming
+        if hasattr(llm, "execute_many"):
+            self.execute_many = self._execute_many
+
+    def execute(self, system_prompt: str, user_prompt: str) -> dict:
+        self.budget.charge()
+        return self._llm.execute(system_prompt, user_prompt)
+
+    def _execute_streaming(self, system_prompt: str, user_prompt: str, on_field) -> dict:
+        self.budget.charge()
+        return self._llm.execute_streaming(system_prompt, user_prompt, on_field)
+
+    def _execute_many(self, requests: list[tuple[str, str]]) -> list[dict]:
+        self.budget.charge(len(requests))
+        return self._llm.execute_many(requests)
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
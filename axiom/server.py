@@ -0,0 +1,307 @@
+"""
+HTTP inference server for compiled prompts (`main.py serve`).
+
+Every loaded prompt is exposed as `POST /prompts/{meta.id}`. The JSON body holds the
+inputs declared in the prompt's `interface`, and the response holds the model's
+output once it has been checked against the declared outputs.
+
+Requests are rendered on the event loop and put on a bounded queue; a full queue
+is answered with 503 and `Retry-After` instead of piling up latency. A fixed pool
+of workers takes requests off the queue. With `batch_size > 1` a worker waits up to
+`batch_window_ms` for more requests and sends the whole batch to the backend at
+once: identical prompts in a batch share a single completion, and the rest arrive
+together, so servers with continuous batching (llama.cpp, vLLM, LM Studio) can
+schedule them in the same forward passes. `GET /metrics` exposes latency histograms,
+queue depth and request counts in the Prometheus text format.
+"""
+import asyncio
+import copy
+import logging
+import time
+from pathlib import Path
+
+from llm.httpd import Response, Service, serve
+from .runtime import CompiledPrompt
+from .schema import check_fields, struct_types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8080
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class Histogram:
+    """A Prometheus-style histogram: cumulative bucket counts, a sum and a count."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def exposition(self, name: str, labels: str = "") -> list[str]:
+        sep = "," if labels else ""
+        lines = [f'{name}_bucket{{{labels}{sep}le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class ServedPrompt:
+    """A compiled prompt together with what is needed to validate its requests and outputs."""
+
+    def __init__(self, compiled: CompiledPrompt):
+        self.compiled = compiled
+        interface = compiled.prompt_dict.get('interface', {})
+        self.id = compiled.id
+        self.inputs = interface.get('inputs')
+        self.outputs = interface.get('outputs', [])
+        self.types = struct_types(compiled.prompt_dict)
+
+    def check_inputs(self, inputs) -> list[str]:
+        if not isinstance(inputs, dict):
+            return ["The request body must be a JSON object of inputs."]
+        if self.inputs is None:
+            # Without declared inputs, anything the payload template uses is accepted.
+            return []
+        return check_fields(self.inputs, inputs, self.types, allow_extra=False)
+
+    def render(self, inputs: dict) -> tuple[str, str]:
+        user_message = self.compiled.render(**inputs)
+        return self.compiled.system_prompt_for(user_message), user_message
+
+    def check_output(self, output: dict) -> list[str]:
+        return check_fields(self.outputs, output, self.types)
+
+
+def load_prompts(filepaths: list[str], sdk=None) -> dict[str, ServedPrompt]:
+    """
+    Loads `.axiomc` artifacts with the lightweight runtime and compiles `.axiom` files
+    with `sdk`. Returns the prompts keyed by their `meta.id`, which must be unique.
+    """
+    from .runtime import load_compiled
+
+    prompts = {}
+    for filepath in filepaths:
+        if Path(filepath).suffix == ".axiomc":
+            compiled = load_compiled(filepath)
+        else:
+            if sdk is None:
+                raise ValueError(f"'{filepath}' must be compiled first: only .axiomc files can be served without the SDK.")
+            compiled = sdk.compile(filepath)
+        prompt = ServedPrompt(compiled)
+        if not prompt.id:
+            raise ValueError(f"'{filepath}' has no meta id to serve it under.")
+        if prompt.id in prompts:
+            raise ValueError(f"Prompt id '{prompt.id}' is declared by more than one file.")
+        prompts[prompt.id] = prompt
+    return prompts
+
+
+class _Job:
+    __slots__ = ("prompt", "system_prompt", "user_message", "future", "enqueued")
+
+    def __init__(self, prompt: ServedPrompt, system_prompt: str, user_message: str, future: asyncio.Future):
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.user_message = user_message
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+
+class InferenceServer(Service):
+    DEFAULT_HOST = DEFAULT_SERVE_HOST
+    DEFAULT_PORT = DEFAULT_SERVE_PORT
+    THREAD_NAME = "axiom-inference-server"
+
+    def __init__(self, prompts: dict[str, ServedPrompt], llm, workers: int = 4, queue_size: int = 64,
+                 batch_size: int = 1, batch_window_ms: float = 5.0):
+        """
+        Serves `prompts` through `llm.aexecute`. At most `queue_size` requests wait for
+        one of the `workers`; each worker sends up to `batch_size` requests at a time.
+        The LLM interface's own `max_concurrency` still bounds the calls in flight.
+        """
+        if workers < 1 or queue_size < 1 or batch_size < 1:
+            raise ValueError("workers, queue_size and batch_size must be at least 1.")
+        self.prompts = prompts
+        self.llm = llm
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.stats = {"in_flight": 0, "rejected": 0, "deduplicated": 0}
+        self.request_counts = {}
+        self.request_latency = {prompt_id: Histogram(LATENCY_BUCKETS) for prompt_id in prompts}
+        self.queue_wait = Histogram(LATENCY_BUCKETS)
+        self.backend_latency = Histogram(LATENCY_BUCKETS)
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue = None
+        self._tasks = []
+        super().__init__()
+
+    async def handle(self, request) -> Response:
+        if request.path == "/metrics" and request.method == "GET":
+            return Response(200, self.metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+        if request.path == "/prompts" and request.method == "GET":
+            return Response.json({"prompts": [{"id": p.id, "inputs": p.inputs, "outputs": p.outputs}
+                                              for p in self.prompts.values()]})
+        if request.path == "/health":
+            return Response.json({"status": "ok", "queue_depth": self._queue.qsize() if self._queue else 0})
+        if not request.path.startswith("/prompts/"):
+            return _error(404, f"Unknown path {request.path}")
+        prompt = self.prompts.get(request.path[len("/prompts/"):])
+        if prompt is None:
+            return _error(404, f"Unknown prompt {request.path[len('/prompts/'):]!r}")
+        if request.method != "POST":
+            return _error(405, "Use POST to run a prompt.")
+
+        start = time.perf_counter()
+        response = await self._run(prompt, request)
+        self.request_latency[prompt.id].observe(time.perf_counter() - start)
+        key = (prompt.id, response.status)
+        self.request_counts[key] = self.request_counts.get(key, 0) + 1
+        return response
+
+    async def _run(self, prompt: ServedPrompt, request) -> Response:
+        try:
+            inputs = request.json()
+        except ValueError:
+            return _error(400, "The request body is not valid JSON.")
+        errors = prompt.check_inputs(inputs)
+        if errors:
+            return _error(400, "Invalid inputs.", details=errors)
+        try:
+            system_prompt, user_message = prompt.render(inputs)
+        except Exception as e:
+            return _error(400, f"Could not render the payload: {e}")
+
+        job = _Job(prompt, system_prompt, user_message, asyncio.get_running_loop().create_future())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return _error(503, "The server is at capacity, retry later.", headers={"Retry-After": "1"})
+
+        output = await job.future
+        if "error" in output:
+            return _error(502, output["error"], details=[output.get("details", "")])
+        errors = prompt.check_output(output)
+        if errors:
+            return Response.json({"error": {"message": "The output does not match the interface.", "details": errors},
+                                  "output": output}, 502)
+        return Response.json({"id": prompt.id, "output": output})
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._dispatch(batch)
+            except Exception as e:
+                logger.exception("Batch dispatch failed")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_result({"error": "Internal server error", "details": str(e)})
+
+    async def _dispatch(self, batch: list[_Job]):
+        dispatched = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        groups = {}
+        for job in batch:
+            self.queue_wait.observe(dispatched - job.enqueued)
+            groups.setdefault((job.system_prompt, job.user_message), []).append(job)
+        self.stats["deduplicated"] += len(batch) - len(groups)
+
+        async def complete(key, jobs):
+            start = time.perf_counter()
+            output = await self.llm.aexecute(*key)
+            self.backend_latency.observe(time.perf_counter() - start)
+            for job in jobs:
+                if not job.future.done():
+                    # Each waiter gets its own copy, in case a caller mutates it.
+                    job.future.set_result(copy.deepcopy(output) if len(jobs) > 1 else output)
+
+        self.stats["in_flight"] += len(groups)
+        try:
+            await asyncio.gather(*(complete(key, jobs) for key, jobs in groups.items()))
+        finally:
+            self.stats["in_flight"] -= len(groups)
+
+    def metrics(self) -> str:
+        lines = [
+            "# HELP axiom_queue_depth Requests waiting for a worker.",
+            "# TYPE axiom_queue_depth gauge",
+            f"axiom_queue_depth {self._queue.qsize() if self._queue else 0}",
+            "# HELP axiom_queue_capacity Requests that can wait before new ones are rejected.",
+            "# TYPE axiom_queue_capacity gauge",
+            f"axiom_queue_capacity {self.queue_size}",
+            "# HELP axiom_backend_in_flight Completions currently requested from the backend.",
+            "# TYPE axiom_backend_in_flight gauge",
+            f"axiom_backend_in_flight {self.stats['in_flight']}",
+            "# HELP axiom_rejected_total Requests rejected with 503 because the queue was full.",
+            "# TYPE axiom_rejected_total counter",
+            f"axiom_rejected_total {self.stats['rejected']}",
+            "# HELP axiom_deduplicated_total Requests answered by an identical request in the same batch.",
+            "# TYPE axiom_deduplicated_total counter",
+            f"axiom_deduplicated_total {self.stats['deduplicated']}",
+            "# HELP axiom_requests_total Prompt requests by prompt and HTTP status.",
+            "# TYPE axiom_requests_total counter",
+        ]
+        for (prompt_id, status), count in sorted(self.request_counts.items()):
+            lines.append(f'axiom_requests_total{{prompt="{prompt_id}",status="{status}"}} {count}')
+        lines += ["# HELP axiom_request_duration_seconds Time from receiving a prompt request to answering it.",
+                  "# TYPE axiom_request_duration_seconds histogram"]
+        for prompt_id, histogram in self.request_latency.items():
+            lines += histogram.exposition("axiom_request_duration_seconds", f'prompt="{prompt_id}"')
+        lines += ["# HELP axiom_queue_wait_seconds Time requests spent queued before being dispatched.",
+                  "# TYPE axiom_queue_wait_seconds histogram",
+                  *self.queue_wait.exposition("axiom_queue_wait_seconds"),
+                  "# HELP axiom_backend_duration_seconds Time the backend took per completion.",
+                  "# TYPE axiom_backend_duration_seconds histogram",
+                  *self.backend_latency.exposition("axiom_backend_duration_seconds"),
+                  "# HELP axiom_batch_size Requests dispatched together by a worker.",
+                  "# TYPE axiom_batch_size histogram",
+                  *self.batch_sizes.exposition("axiom_batch_size")]
+        return "\n".join(lines) + "\n"
+
+    async def start(self, host: str = DEFAULT_SERVE_HOST, port: int = DEFAULT_SERVE_PORT) -> str:
+        """Starts the workers and the listener on the running event loop and returns the base URL."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"axiom-worker-{i}") for i in range(self.workers)]
+        self._server = await serve(self.handle, host, port)
+        bound_port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def _shutdown(self):
+        await super()._shutdown()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.llm.aclose()
+
+
+def _error(status: int, message: str, details: list = None, headers: dict = None) -> Response:
+    error = {"message": message}
+    if details:
+        error["details"] = details
+    return Response.json({"error": error}, status, headers)
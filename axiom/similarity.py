@@ -0,0 +1,97 @@
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cases the text and splits it into alphanumeric tokens."""
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+def tfidf_matrix(documents: list[list[str]]) -> np.ndarray:
+    """
+    Builds an L2-normalised TF-IDF matrix with one row per tokenized document.
+    Documents without any tokens get an all-zero row.
+    """
+    return TfidfIndex(documents).matrix
+
+
+class TfidfIndex:
+    """
+    TF-IDF vectors of a fixed set of tokenized documents. New queries are vectorized
+    against the same vocabulary and IDF weights, so they can be ranked by similarity.
+    """
+
+    def __init__(self, documents: list[list[str]]):
+        counts = [Counter(tokens) for tokens in documents]
+        self.vocabulary = {}
+        for doc_counts in counts:
+            for token in doc_counts:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        matrix = np.zeros((len(documents), max(len(self.vocabulary), 1)), dtype=np.float32)
+        for row, doc_counts in enumerate(counts):
+            for token, count in doc_counts.items():
+                matrix[row, self.vocabulary[token]] = count
+
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = normalize_rows(matrix * self.idf)
+
+    def vectorize(self, tokens: list[str]) -> np.ndarray:
+        """L2-normalised TF-IDF vector of a query; tokens outside the vocabulary are ignored."""
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        for token, count in Counter(tokens).items():
+            column = self.vocabulary.get(token)
+            if column is not None:
+                vector[column] = count
+        return normalize_rows((vector * self.idf)[np.newaxis, :])[0]
+
+    def most_similar(self, tokens: list[str], k: int) -> list[int]:
+        """Indices of the `k` documents most similar to the query, best first (ties keep document order)."""
+        k = min(k, self.matrix.shape[0])
+        if k <= 0:
+            return []
+        scores = self.matrix @ self.vectorize(tokens)
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return ranked.tolist()
+
+
+def normalize_text(text: str) -> str:
+    """Lower-cases the text and reduces it to single-spaced alphanumeric tokens."""
+    return " ".join(tokenize(text))
+
+
+def shingle_matrix(texts: list[str], size: int = 4, dimensions: int = 4096) -> np.ndarray:
+    """
+    Builds an L2-normalised matrix of hashed character shingles, one row per text.
+    Hashing into a fixed number of columns keeps memory flat for large rule sets.
+    """
+    matrix = np.zeros((len(texts), dimensions), dtype=np.float32)
+    for row, text in enumerate(texts):
+        normalized = normalize_text(text)
+        for start in range(max(len(normalized) - size + 1, 1)):
+            shingle = normalized[start:start + size].encode("utf-8")
+            matrix[row, zlib.crc32(shingle) % dimensions] += 1
+    return normalize_rows(matrix)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def cosine_similarity_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarities of the rows of an L2-normalised matrix."""
+    return matrix @ matrix.T
+
+
+def similar_pairs(similarities: np.ndarray, threshold: float) -> list[tuple[int, int]]:
+    """Returns every (i, j) with i < j whose similarity is at least `threshold`."""
+    rows, cols = np.nonzero(np.triu(similarities >= threshold - 1e-6, k=1))
+    return list(zip(rows.tolist(), cols.tolist()))
@@ -0,0 +1,76 @@
+"""
+Pass-rate statistics for `main.py test --samples`.
+
+A test sampled several times is a Bernoulli trial. `SequentialPassRate` runs
+Wald's sequential probability ratio test on its outcomes, so sampling can stop
+as soon as the pass rate is clearly above or below the threshold: a test that
+always fails is settled in a few samples, a test that always passes in a dozen.
+`wilson_interval` gives the confidence interval that is reported alongside.
+"""
+import math
+from statistics import NormalDist
+
+
+def wilson_interval(passes: int, runs: int, confidence: float = 0.95) -> tuple[float, float]:
+    """The Wilson score interval of a pass rate; (0, 1) before any run."""
+    if runs == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    rate = passes / runs
+    center = (rate + z * z / (2 * runs)) / (1 + z * z / runs)
+    spread = z / (1 + z * z / runs) * math.sqrt(rate * (1 - rate) / runs + z * z / (4 * runs * runs))
+    return max(0.0, center - spread), min(1.0, center + spread)
+
+
+class SequentialPassRate:
+    """
+    Wald's SPRT of "the pass rate is at most threshold - margin" against "at least
+    threshold + margin", with both error rates at 1 - confidence. Rates inside the
+    margin are too close to the threshold to tell apart; such tests stay undecided.
+    """
+
+    def __init__(self, threshold: float, confidence: float = 0.95, margin: float = 0.1):
+        low, high = max(threshold - margin, 0.001), min(threshold + margin, 0.999)
+        if not 0 < confidence < 1 or low >= high:
+            raise ValueError(f"Cannot test a pass rate of {threshold} with margin {margin} at confidence {confidence}.")
+        error = 1 - confidence
+        self._accept_above = math.log((1 - error) / error)
+        self._accept_below = math.log(error / (1 - error))
+        self._pass_step = math.log(high / low)
+        self._fail_step = math.log((1 - high) / (1 - low))
+        self._log_ratio = 0.0
+        self.passes = 0
+        self.runs = 0
+        # True once the rate is decided above the threshold, False once below, None until then.
+        self.verdict = None
+
+    @property
+    def min_runs_to_accept(self) -> int:
+        """The fewest runs (all passes) that can decide the rate above the threshold."""
+        return self._min_runs(self._pass_step, self._accept_above)
+
+    @property
+    def min_runs_to_reject(self) -> int:
+        """The fewest runs (all failures) that can decide the rate below the threshold."""
+        return self._min_runs(self._fail_step, self._accept_below)
+
+    @staticmethod
+    def _min_runs(step: float, bound: float) -> int:
+        # Summed the same way as in `add`, so rounding cannot make it disagree by one.
+        runs, log_ratio = 0, 0.0
+        while (log_ratio < bound) if step > 0 else (log_ratio > bound):
+            log_ratio += step
+            runs += 1
+        return runs
+
+    def add(self, passed: bool) -> bool | None:
+        """Counts one outcome and returns the verdict. Outcomes after the verdict are counted but do not change it."""
+        self.runs += 1
+        self.passes += bool(passed)
+        if self.verdict is None:
+            self._log_ratio += self._pass_step if passed else self._fail_step
+            if self._log_ratio >= self._accept_above:
+                self.verdict = True
+            elif self._log_ratio <= self._accept_below:
+                self.verdict = False
+        return self.verdict
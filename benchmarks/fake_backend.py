@@ -0,0 +1,36 @@
+"""A deterministic, in-process stand-in for `LLMInterface` used by the benchmarks."""
+import re
+import time
+
+_CHECK_RE = re.compile(r"\*\*Check (\d+):\*\*")
+_PAIR_RE = re.compile(r"\*\*Pair (\d+):\*\*")
+_VALIDATOR_PREFIX = "You are a precise and strict validation AI"
+
+
+class FakeLLM:
+    """
+    Answers every prompt instantly (or after `latency` seconds) without a server.
+    Test prompts get `output`; semantic validators and conflict checks get passing
+    verdicts in the shape the SDK expects. Calls are counted in `calls`.
+    """
+
+    def __init__(self, output: dict, latency: float = 0.0):
+        self.output = output
+        self.latency = latency
+        self.calls = 0
+
+    def execute(self, system_prompt: str, user_prompt: str) -> dict:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if system_prompt.startswith(_VALIDATOR_PREFIX):
+            checks = _CHECK_RE.findall(user_prompt)
+            if checks:
+                return {"results": [{"id": int(n), "isValid": True} for n in checks]}
+            return {"isValid": True}
+        if user_prompt == "Analyze.":
+            pairs = _PAIR_RE.findall(system_prompt)
+            if pairs:
+                return {"results": [{"pair": int(n), "is_conflicting": False} for n in pairs]}
+            return {"is_conflicting": False, "is_redundant": False}
+        return dict(self.output)
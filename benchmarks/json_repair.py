@@ -0,0 +1,139 @@
+"""
+Micro-benchmark and correctness check for the JSON repair path.
+
+Runs every case of `benchmarks/data/malformed_json.jsonl` through the current
+`LLMInterface._parse_response` path (C decoder, then `repair_json`) and through the
+previous line-based repair (reproduced below), and reports how many outputs each
+recovers correctly and how long each takes per call.
+
+    python -m benchmarks.json_repair --output results/json_repair.json
+"""
+import json
+import re
+import timeit
+from pathlib import Path
+
+import click
+
+from llm.json_repair import JSONRepairError, repair_json
+
+CORPUS = Path(__file__).parent / "data" / "malformed_json.jsonl"
+
+
+def current_parse(text: str):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return repair_json(text)
+
+
+# --- The repair path used before `repair_json`, kept only as a baseline. ---
+
+def _legacy_clean_json_string(s):
+    match = re.search(r"```json\s*(.*?)\s*```", s, re.DOTALL)
+    if match:
+        return match.group(1).strip()
+    return s
+
+
+def _legacy_fix_and_load_json(json_str: str):
+    lines = json_str.splitlines()
+    fixed_lines = []
+    stack = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped.endswith('{') or stripped.endswith('['):
+            stack.append(stripped[-1])
+            fixed_lines.append(line)
+            continue
+        if stripped.endswith(']') or stripped.endswith('}'):
+            if stack:
+                expected = stack[-1]
+                actual = stripped[-1]
+                if expected == '{' and actual == ']':
+                    line = line.rstrip()[:-1] + '}'
+                    stack.pop()
+                elif expected == '[' and actual == '}':
+                    line = line.rstrip()[:-1] + ']'
+                    stack.pop()
+                elif expected == actual:
+                    stack.pop()
+            fixed_lines.append(line)
+        else:
+            fixed_lines.append(line)
+    if fixed_lines:
+        last = fixed_lines[-1].strip()
+        if last == ']':
+            fixed_lines[-1] = '}'
+        elif last == '}':
+            if stack and stack[-1] == '[':
+                fixed_lines[-1] = ']'
+    return json.loads("\n".join(fixed_lines))
+
+
+def legacy_parse(text: str):
+    clean_json = _legacy_clean_json_string(text.strip()).strip()
+    try:
+        return json.loads(clean_json)
+    except json.JSONDecodeError:
+        return _legacy_fix_and_load_json(clean_json)
+
+
+PARSERS = {"legacy": legacy_parse, "current": current_parse}
+
+
+def load_corpus() -> list[dict]:
+    return [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def run(repeat: int) -> dict:
+    results = {}
+    for label, parse in PARSERS.items():
+        cases = {}
+        for case in load_corpus():
+            try:
+                recovered = parse(case["raw"]) == case["expected"]
+            except (json.JSONDecodeError, JSONRepairError):
+                recovered = False
+            seconds = timeit.timeit(lambda: _swallow(parse, case["raw"]), number=repeat) / repeat
+            cases[case["name"]] = {"recovered": recovered, "us_per_call": seconds * 1e6}
+        results[label] = {
+            "recovered": sum(c["recovered"] for c in cases.values()),
+            "total": len(cases),
+            "mean_us_per_call": sum(c["us_per_call"] for c in cases.values()) / len(cases),
+            "cases": cases,
+        }
+    return results
+
+
+def _swallow(parse, text):
+    try:
+        parse(text)
+    except ValueError:
+        pass
+
+
+@click.command()
+@click.option('--repeat', default=2000, show_default=True, help="Calls per case when timing.")
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help="Write the results as JSON.")
+def main(repeat: int, output: str):
+    results = run(repeat)
+    names = list(results["current"]["cases"])
+    click.secho(f"{'case':<30} {'legacy':>16} {'current':>16}", bold=True)
+    for name in names:
+        row = [name]
+        for label in PARSERS:
+            case = results[label]["cases"][name]
+            row.append(f"{'ok ' if case['recovered'] else 'FAIL'} {case['us_per_call']:8.1f} us")
+        click.echo(f"{row[0]:<30} {row[1]:>16} {row[2]:>16}")
+    for label in PARSERS:
+        summary = results[label]
+        click.secho(f"{label}: recovered {summary['recovered']}/{summary['total']}, "
+                    f"mean {summary['mean_us_per_call']:.1f} us per call", bold=True)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
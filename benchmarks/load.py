@@ -0,0 +1,124 @@
+"""
+Throughput and tail-latency benchmark of `LLMInterface` against the local stub server.
+
+Starts `llm.stub_server.StubServer` in-process and sends a fixed number of requests
+through the pooled async path (`aexecute`, as used by batched semantic checks) and
+through blocking `execute()` calls on a thread pool (as used by `test --jobs`).
+The stub is seeded, so runs with the same options are reproducible. Latencies are
+measured from the moment a request is issued, so in async mode they include the time
+spent queued behind `max_concurrency`.
+
+    python -m benchmarks.load --requests 500 --concurrency 16 --latency lognormal:200:0.6
+"""
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import click
+
+from llm.llm_interface import LLMInterface
+from llm.stub_server import StubServer
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summarise(latencies: list[float], responses: list[dict], elapsed: float) -> dict:
+    ms = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(responses),
+        "failed": sum(1 for r in responses if "error" in r),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(responses) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.fmean(ms), 2),
+            "p50": round(_percentile(ms, 50), 2),
+            "p95": round(_percentile(ms, 95), 2),
+            "p99": round(_percentile(ms, 99), 2),
+            "max": round(max(ms), 2),
+        },
+    }
+
+
+def run_async(llm: LLMInterface, prompts: list[tuple[str, str]]) -> dict:
+    async def timed(system_prompt, user_prompt):
+        start = time.perf_counter()
+        response = await llm.aexecute(system_prompt, user_prompt)
+        return time.perf_counter() - start, response
+
+    async def run_all():
+        try:
+            return await asyncio.gather(*(timed(s, u) for s, u in prompts))
+        finally:
+            await llm.aclose()
+
+    start = time.perf_counter()
+    results = asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+    return _summarise([r[0] for r in results], [r[1] for r in results], elapsed)
+
+
+def run_threads(llm: LLMInterface, prompts: list[tuple[str, str]], workers: int) -> dict:
+    def timed(prompt):
+        start = time.perf_counter()
+        response = llm.execute(*prompt)
+        return time.perf_counter() - start, response
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(timed, prompts))
+    elapsed = time.perf_counter() - start
+    return _summarise([r[0] for r in results], [r[1] for r in results], elapsed)
+
+
+@click.command()
+@click.option('--requests', 'request_count', default=200, show_default=True, help="Requests per mode.")
+@click.option('--concurrency', default=8, show_default=True, help="Client-side concurrency for both modes.")
+@click.option('--latency', default="lognormal:100:0.5", show_default=True, help="Stub time-to-first-token distribution.")
+@click.option('--tokens-per-second', default=0.0, show_default=True)
+@click.option('--error-rate', default=0.0, show_default=True)
+@click.option('--malformed-rate', default=0.0, show_default=True)
+@click.option('--slots', default=0, show_default=True, help="Stub generation slots (0 means unlimited).")
+@click.option('--timeout', default=30.0, show_default=True, help="Client request timeout in seconds.")
+@click.option('--seed', default=0, show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the results as JSON.")
+def main(request_count, concurrency, latency, tokens_per_second, error_rate, malformed_rate, slots, timeout, seed,
+         output):
+    stub_options = {"latency": latency, "tokens_per_second": tokens_per_second, "error_rate": error_rate,
+                    "malformed_rate": malformed_rate, "slots": slots, "seed": seed,
+                    "default_response": {"sentiment": "Positive", "confidence": 0.9, "isValid": True}}
+    # Distinct prompts, so the response cache (if one were configured) could never short-circuit a request.
+    prompts = [(f"System prompt {i}", "Analyze.") for i in range(request_count)]
+
+    results = {}
+    for mode in ("async", "threads"):
+        stub = StubServer(**stub_options)
+        base_url = stub.start_in_thread()
+        llm = LLMInterface(base_url=base_url, model="stub", backend="openai", max_concurrency=concurrency,
+                           timeout=timeout)
+        try:
+            click.echo(f"Running {mode} mode...")
+            summary = run_async(llm, prompts) if mode == "async" else run_threads(llm, prompts, concurrency)
+        finally:
+            stub.stop()
+        summary["server"] = dict(stub.stats)
+        results[mode] = summary
+
+    report = {"options": {"requests": request_count, "concurrency": concurrency, **stub_options}, "results": results}
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(text, encoding="utf-8")
+        click.echo(f"Results written to {output}")
+    else:
+        click.echo(text)
+
+
+if __name__ == '__main__':
+    main()
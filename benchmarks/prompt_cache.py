@@ -0,0 +1,98 @@
+"""
+Time-to-first-token benchmark of `--prompt-cache` against the local stub server.
+
+Runs the same synthetic suite (a long rule list, one semantic assertion per test)
+twice through `LLMInterface` and the stub: once as before, and once with the SDK
+pinning a canonical system prompt and asking the server to reuse its cached prefix.
+The stub charges `--prefill-tokens-per-second` for every prompt token it has not
+cached, so the difference between the runs is the prefill time the cache saves.
+Generation is instant, so each request's latency is its time to first token.
+
+    python -m benchmarks.prompt_cache --tests 50 --rules 150 --prefill-tokens-per-second 20000
+"""
+import contextlib
+import io
+import json
+import statistics
+from pathlib import Path
+
+import click
+
+from llm import profiling
+from axiom.sdk import AxiomSDK, _template
+from benchmarks.load import _percentile
+from benchmarks.synthetic import OUTPUT, synthetic_prompt_dict
+from llm.llm_interface import LLMInterface
+from llm.stub_server import StubServer
+
+
+def _suite(test_count: int, rule_count: int) -> dict:
+    prompt_dict = synthetic_prompt_dict(test_count)
+    prompt_dict["rules"] = [f"Rule number {i}: keep the analysis grounded in the review text and never speculate "
+                            f"about facts the reviewer did not state." for i in range(rule_count)]
+    for test in prompt_dict["tests"]:
+        test["assert"].append({"expression": "output['reasons']",
+                               "semantic_check": "The reasons are specific to the product."})
+    return prompt_dict
+
+
+def run_suite(prompt_dict: dict, stub_options: dict, prompt_cache: bool, jobs: int) -> dict:
+    stub = StubServer(**stub_options)
+    base_url = stub.start_in_thread()
+    llm = LLMInterface(base_url=base_url, model="stub", backend="openai", prompt_cache=prompt_cache)
+    sdk = AxiomSDK(llm, jobs=jobs, prompt_cache=prompt_cache)
+    tracer = profiling.enable()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = sdk._run_tests(prompt_dict["tests"], sdk._test_system_prompt(prompt_dict),
+                                     _template(prompt_dict["payload"]))
+    finally:
+        profiling.disable()
+        stub.stop()
+
+    ttft = [s.duration * 1000 for s in tracer.spans if s.name == "execute"]
+    return {
+        "passed": sum(1 for r in results if r[0]),
+        "requests": len(ttft),
+        "ttft_ms": {
+            "mean": round(statistics.fmean(ttft), 2),
+            "p50": round(_percentile(ttft, 50), 2),
+            "p95": round(_percentile(ttft, 95), 2),
+        },
+        "prompt_tokens": stub.stats["prompt_tokens"],
+        "cached_prompt_tokens": stub.stats["cached_prompt_tokens"],
+    }
+
+
+@click.command()
+@click.option('--tests', 'test_count', default=30, show_default=True)
+@click.option('--rules', 'rule_count', default=150, show_default=True, help="Rules in the system prompt.")
+@click.option('--latency', default="fixed:10", show_default=True, help="Stub latency before prefill starts.")
+@click.option('--prefill-tokens-per-second', default=20000.0, show_default=True)
+@click.option('--prefix-cache', 'prefix_cache_size', default=8, show_default=True,
+              help="Prompts the stub keeps cached.")
+@click.option('--jobs', default=1, show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the results as JSON.")
+def main(test_count, rule_count, latency, prefill_tokens_per_second, prefix_cache_size, jobs, output):
+    prompt_dict = _suite(test_count, rule_count)
+    stub_options = {"latency": latency, "prefill_tokens_per_second": prefill_tokens_per_second,
+                    "prefix_cache_size": prefix_cache_size, "default_response": {**OUTPUT, "isValid": True}}
+
+    results = {}
+    for mode, prompt_cache in (("uncached", False), ("prompt_cache", True)):
+        click.echo(f"Running {mode}...")
+        results[mode] = run_suite(prompt_dict, stub_options, prompt_cache, jobs)
+    results["ttft_speedup"] = round(results["uncached"]["ttft_ms"]["mean"] / results["prompt_cache"]["ttft_ms"]["mean"], 2)
+
+    report = {"options": {"tests": test_count, "rules": rule_count, "jobs": jobs, **stub_options}, "results": results}
+    text = json.dumps(report, indent=2)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(text, encoding="utf-8")
+        click.echo(f"Results written to {output}")
+    else:
+        click.echo(text)
+
+
+if __name__ == '__main__':
+    main()
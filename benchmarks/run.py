@@ -0,0 +1,254 @@
+"""
+Overhead benchmarks for the SDK, independent of LLM latency.
+
+Every LLM call goes to `FakeLLM`, a deterministic in-process backend, so the timings
+cover only parsing, prompt generation, rendering, assertion evaluation, serialization
+and the test loop itself. Results are written as JSON and can be compared against a
+previous run to spot regressions across commits:
+
+    python -m benchmarks.run --output results/baseline.json
+    python -m benchmarks.run --compare results/baseline.json
+"""
+import contextlib
+import io
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from axiom.assertions import evaluate_assertion
+from axiom.parse_cache import ParseCache
+from axiom.sdk import AxiomSDK, _template
+from benchmarks.fake_backend import FakeLLM
+from benchmarks.synthetic import OUTPUT, synthetic_axiom_source, synthetic_prompt_dict
+
+ROOT = Path(__file__).resolve().parent.parent
+# Differences smaller than this are never reported as a regression.
+MIN_SIGNIFICANT_MS = 0.05
+SAMPLE_FILES = sorted(p.name for p in ROOT.glob("*.axiom"))
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark that cannot run in the current environment."""
+
+
+def _time(func, repeat: int) -> dict:
+    """Runs `func` `repeat` times and summarises the wall-clock timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+    }
+
+
+def _require_parser():
+    try:
+        import antlr4  # noqa: F401
+        import gen.axiom.parser.AxiomParser  # noqa: F401
+    except ImportError as e:
+        raise SkipBenchmark(f"parser unavailable ({e}); run 'make build' first")
+
+
+# --- Benchmarks. Each returns a dict of measurements or raises SkipBenchmark. ---
+
+def bench_parse(sizes: list[int], repeat: int, workdir: Path) -> dict:
+    """Cold (no cache) and warm (cached) `_parse_and_transform` over sample and synthetic files."""
+    _require_parser()
+    files = [ROOT / name for name in SAMPLE_FILES]
+    for size in sizes:
+        path = workdir / f"synthetic_{size}.axiom"
+        path.write_text(synthetic_axiom_source(size), encoding="utf-8")
+        files.append(path)
+
+    results = {}
+    for path in files:
+        cold = _time(lambda: AxiomSDK(None, parse_cache=ParseCache(directory=None))._parse_and_transform(path), repeat)
+        warm_sdk = AxiomSDK(None, parse_cache=ParseCache(directory=None))
+        warm_sdk._parse_and_transform(path)
+        warm = _time(lambda: warm_sdk._parse_and_transform(path), repeat)
+        results[path.name] = {"cold": cold, "warm": warm}
+    return results
+
+
+def bench_system_prompt(sizes: list[int], repeat: int) -> dict:
+    sdk = AxiomSDK(None)
+    results = {}
+    for size in sizes:
+        prompt_dict = synthetic_prompt_dict(size, with_examples=True)
+        results[f"{size}_tests"] = {
+            "without_examples": _time(lambda: sdk._generate_system_prompt(prompt_dict, use_examples=False), repeat),
+            "with_examples": _time(lambda: sdk._generate_system_prompt(prompt_dict), repeat),
+        }
+    return results
+
+
+def bench_render(sizes: list[int], repeat: int) -> dict:
+    """Renders the user payload of every synthetic test with one compiled template."""
+    results = {}
+    for size in sizes:
+        prompt_dict = synthetic_prompt_dict(size)
+        template = _template(prompt_dict["payload"])
+        inputs = [t["inputs"] for t in prompt_dict["tests"]]
+        results[f"{size}_payloads"] = _time(lambda: [template.render(**i) for i in inputs], repeat)
+    return results
+
+
+def bench_assertions(sizes: list[int], repeat: int) -> dict:
+    results = {}
+    for size in sizes:
+        expressions = [a["expression"] for t in synthetic_prompt_dict(size)["tests"] for a in t["assert"]]
+        results[f"{len(expressions)}_assertions"] = _time(
+            lambda: [evaluate_assertion(e, OUTPUT) for e in expressions], repeat)
+    return results
+
+
+def bench_serialize(sizes: list[int], repeat: int) -> dict:
+    """Serializes the prompt dict and, when the parser is available, parses it back."""
+    sdk = AxiomSDK(None, parse_cache=ParseCache(directory=None))
+    results = {}
+    for size in sizes:
+        prompt_dict = synthetic_prompt_dict(size, with_examples=True)
+        results[f"{size}_tests"] = {"serialize": _time(lambda: sdk._serialize_to_axiom_string(prompt_dict), repeat)}
+    try:
+        _require_parser()
+    except SkipBenchmark as e:
+        results["round_trip"] = {"skipped": str(e)}
+        return results
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = Path(tmp) / f"round_trip_{size}.axiom"
+
+            def round_trip():
+                path.write_text(sdk._serialize_to_axiom_string(synthetic_prompt_dict(size, True)), encoding="utf-8")
+                AxiomSDK(None, parse_cache=ParseCache(directory=None))._parse_and_transform(path)
+
+            results[f"{size}_tests"]["round_trip"] = _time(round_trip, repeat)
+    return results
+
+
+def bench_test_loop(sizes: list[int], repeat: int, jobs: int) -> dict:
+    """End-to-end `_run_tests` throughput against the fake backend, output suppressed."""
+    results = {}
+    for size in sizes:
+        prompt_dict = synthetic_prompt_dict(size)
+        llm = FakeLLM(OUTPUT)
+        sdk = AxiomSDK(llm, jobs=jobs)
+        system_prompt = sdk._generate_system_prompt(prompt_dict, use_examples=False)
+        template = _template(prompt_dict["payload"])
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                sdk._run_tests(prompt_dict["tests"], system_prompt, template)
+
+        timing = _time(run, repeat)
+        timing["tests_per_second"] = round(size / (timing["median_ms"] / 1000), 1)
+        timing["llm_calls_per_run"] = llm.calls // repeat
+        results[f"{size}_tests"] = timing
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = "") -> dict:
+    """Maps "benchmark/case/variant" paths to their median timing."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict) and "median_ms" in value:
+            flat[path] = value["median_ms"]
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, path))
+    return flat
+
+
+def _compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Prints the change of every median timing and returns False if any regressed past `tolerance`."""
+    regressed = False
+    baseline_flat = _flatten(baseline)
+    for path, median in _flatten(current).items():
+        before = baseline_flat.get(path)
+        if not before:
+            continue
+        change = (median - before) / before
+        if abs(median - before) < MIN_SIGNIFICANT_MS:
+            change = 0.0  # sub-resolution noise on very fast cases
+        color = "red" if change > tolerance else "green" if change < -tolerance else None
+        click.secho(f"  {path:<60} {before:>10.3f} -> {median:>10.3f} ms  ({change:+.0%})", fg=color)
+        regressed = regressed or change > tolerance
+    return not regressed
+
+
+@click.command()
+@click.option('--sizes', default="1000,10000", show_default=True, help="Comma-separated synthetic test counts.")
+@click.option('--repeat', default=5, show_default=True, help="Timed runs per benchmark.")
+@click.option('--jobs', default=1, show_default=True, help="Worker threads for the test-loop benchmark.")
+@click.option('--output', type=click.Path(dir_okay=False), help="Write the results as JSON.")
+@click.option('--compare', 'baseline', type=click.Path(exists=True, dir_okay=False),
+              help="A previous results file to compare against.")
+@click.option('--tolerance', default=0.10, show_default=True, help="Relative slowdown reported as a regression.")
+def main(sizes, repeat, jobs, output, baseline, tolerance):
+    sizes = [int(s) for s in sizes.split(",") if s.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        benchmarks = {
+            "parse": lambda: bench_parse(sizes, repeat, Path(tmp)),
+            "system_prompt": lambda: bench_system_prompt(sizes, repeat),
+            "render": lambda: bench_render(sizes, repeat),
+            "assertions": lambda: bench_assertions(sizes, repeat),
+            "serialize": lambda: bench_serialize(sizes, repeat),
+            "test_loop": lambda: bench_test_loop(sizes, repeat, jobs),
+        }
+        results = {}
+        for name, bench in benchmarks.items():
+            click.echo(f"Running {name}...")
+            try:
+                results[name] = bench()
+            except SkipBenchmark as e:
+                click.secho(f"  skipped: {e}", fg="yellow")
+                results[name] = {"skipped": str(e)}
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sizes": sizes,
+            "repeat": repeat,
+            "jobs": jobs,
+        },
+        "results": results,
+    }
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        click.echo(f"Results written to {output}")
+    else:
+        click.echo(json.dumps(report, indent=2))
+
+    if baseline:
+        previous = json.loads(Path(baseline).read_text(encoding="utf-8"))
+        click.echo(f"\nCompared with {baseline} (commit {previous.get('meta', {}).get('commit')}):")
+        if not _compare(results, previous.get("results", {}), tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
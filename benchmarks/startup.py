@@ -0,0 +1,75 @@
+"""
+Startup benchmark for the CLI.
+
+Runs `main.py --help` and `main.py generate` in fresh interpreters, reports the wall
+time of each and the slowest imports from `python -X importtime`, and exits non-zero
+if any command is over budget. No LLM server is needed.
+
+    python -m benchmarks.startup --budget-ms 100
+"""
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import click
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MAIN = PROJECT_ROOT / "main.py"
+
+
+def _time_command(args: list[str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, str(MAIN), *args], cwd=PROJECT_ROOT, capture_output=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            raise click.ClickException(f"'main.py {' '.join(args)}' failed:\n{result.stderr.decode()}")
+    return timings
+
+
+def _slowest_imports(args: list[str], top: int) -> list[tuple[str, int]]:
+    """Returns (module, cumulative microseconds) for the slowest top-level imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", str(MAIN), *args],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only direct imports of the script; nested ones are included in their parent's time.
+        if len(name) - len(name.lstrip()) == 1:
+            imports.append((name.strip(), int(cumulative)))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+
+@click.command()
+@click.option('--file', 'axiom_file', default="sentiment_analyzer.axiom", show_default=True,
+              help="Axiom file passed to 'generate'.")
+@click.option('--runs', default=10, show_default=True, help="Timed runs per command.")
+@click.option('--budget-ms', default=100.0, show_default=True, help="Maximum allowed median wall time.")
+@click.option('--top', default=8, show_default=True, help="Number of slowest imports to list.")
+def main(axiom_file: str, runs: int, budget_ms: float, top: int):
+    commands = {"--help": ["--help"], "generate": ["generate", axiom_file]}
+    # One untimed run writes the .pyc files and warms the parse cache.
+    for args in commands.values():
+        _time_command(args, 1)
+
+    over_budget = False
+    for label, args in commands.items():
+        timings = _time_command(args, runs)
+        median = statistics.median(timings)
+        ok = median <= budget_ms
+        over_budget |= not ok
+        click.secho(f"{label:<10} median {median:6.1f} ms   min {min(timings):6.1f} ms   budget {budget_ms:.0f} ms",
+                    fg='green' if ok else 'red', bold=True)
+        for module, micros in _slowest_imports(args, top):
+            click.echo(f"    {micros / 1000:6.1f} ms  {module}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Generates synthetic .axiom files (and their expected prompt dicts) of any size."""
+
+OUTPUT = {"sentiment": "Positive", "confidence": 0.95, "reasons": ["great build quality", "fast shipping"]}
+
+_WORDS = ("product shipping quality price support battery screen delivery refund design "
+          "great slow broken excellent cheap sturdy noisy flawless late helpful").split()
+
+
+def _review(i: int) -> str:
+    return " ".join(_WORDS[(i * 7 + k * 3) % len(_WORDS)] for k in range(12))
+
+
+def synthetic_prompt_dict(test_count: int, with_examples: bool = False) -> dict:
+    """Builds the prompt dict the visitor would produce for `synthetic_axiom_source(test_count)`."""
+    tests = []
+    for i in range(test_count):
+        test = {
+            "name": f"Synthetic review {i}",
+            "inputs": {"review_text": _review(i)},
+            "assert": [
+                {"expression": "output['sentiment'] == 'Positive'", "semantic_check": None},
+                {"expression": "output['confidence'] > 0.9", "semantic_check": None},
+                {"expression": "contains_substring(output['reasons'], 'quality')", "semantic_check": None},
+            ],
+        }
+        if with_examples:
+            test["expected_output"] = OUTPUT
+        tests.append(test)
+    return {
+        "imports": [],
+        "meta": {"id": f"synthetic-{test_count}"},
+        "persona": "A neutral and precise data analysis AI.",
+        "rules": [f"Rule number {i}: keep the analysis grounded in the review text." for i in range(10)],
+        "interface": {"outputs": [
+            {"name": "sentiment", "type": 'Enum("Positive","Negative","Mixed")'},
+            {"name": "confidence", "type": "Float"},
+            {"name": "reasons", "type": "List<String>"},
+        ]},
+        "config": {"use_tests_as_examples": with_examples},
+        "payload": "Review: {{ review_text }}",
+        "tests": tests,
+    }
+
+
+def synthetic_axiom_source(test_count: int, with_examples: bool = False) -> str:
+    """Renders the synthetic prompt as .axiom source using the SDK's own serializer."""
+    from axiom.sdk import AxiomSDK
+    return AxiomSDK(llm_interface=None)._serialize_to_axiom_string(synthetic_prompt_dict(test_count, with_examples))
@@ -0,0 +1,96 @@
+# cache.py
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(".axiom_cache")
+
+
+class ResponseCache:
+    """
+    A persistent, content-addressed store of parsed LLM responses backed by SQLite.
+
+    Entries are keyed on a hash of everything that determines a completion (model,
+    prompts and sampling config). Entries older than `max_age_seconds` are treated
+    as misses, and the least recently used entries are evicted once the store holds
+    more than `max_entries`.
+    """
+
+    def __init__(self, path: Path | str = DEFAULT_CACHE_DIR / "responses.sqlite3",
+                 max_entries: int = 10_000, max_age_seconds: float = 7 * 24 * 3600):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._purge_expired()
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, sampling: dict) -> str:
+        """Returns the content address of a request."""
+        material = json.dumps([model, system_prompt, user_prompt, sampling], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        logger.debug(f"Response cache hit for {key[:12]}")
+        return json.loads(row[0])
+
+    def put(self, key: str, response: dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response), now, now),
+            )
+            # LRU eviction: keep only the `max_entries` most recently used rows.
+            self._conn.execute(
+                "DELETE FROM responses WHERE key NOT IN"
+                " (SELECT key FROM responses ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+            self._conn.commit()
@@ -0,0 +1,266 @@
+# httpd.py
+"""
+Minimal asyncio HTTP/1.1 server used by the bundled local services.
+
+Only what those services need is implemented: keep-alive connections, requests with
+a `Content-Length` body, plain responses and chunked streaming responses. Using the
+standard library keeps the servers free of extra dependencies. Idle keep-alive
+connections are closed after `idle_timeout`, and a request that is not fully read
+within `read_timeout` is answered with 408.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import suppress
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 32 * 1024 * 1024
+IDLE_TIMEOUT = 60.0
+READ_TIMEOUT = 30.0
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """Decodes the body as JSON; raises ValueError if it is not valid JSON."""
+        return json.loads(self.body or b"null")
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class Response:
+    def __init__(self, status: int = 200, body: bytes | str = b"", content_type: str = "text/plain; charset=utf-8",
+                 headers: dict = None):
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+
+    @classmethod
+    def json(cls, data, status: int = 200, headers: dict = None) -> "Response":
+        return cls(status, json.dumps(data), "application/json", headers)
+
+
+class StreamingResponse:
+    """A response whose body is produced by an async iterator of byte chunks."""
+
+    def __init__(self, chunks, status: int = 200, content_type: str = "text/event-stream", headers: dict = None):
+        self.status = status
+        self.chunks = chunks
+        self.headers = {"Content-Type": content_type, "Cache-Control": "no-cache", **(headers or {})}
+
+
+class BadRequest(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class Service:
+    """
+    The lifecycle shared by the bundled servers. Subclasses implement `start()`, which
+    listens on the running event loop, keeps the `asyncio.Server` in `self._server` and
+    returns the base URL, and extend `_shutdown()` if they hold more than the listener.
+    """
+
+    DEFAULT_HOST = "127.0.0.1"
+    DEFAULT_PORT = 0
+    THREAD_NAME = "axiom-service"
+
+    def __init__(self):
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self, host: str, port: int) -> str:
+        raise NotImplementedError
+
+    async def _shutdown(self):
+        """Closes the listener. Connections still open are cancelled with the event loop's other tasks."""
+        self._server.close()
+
+    def run(self, host: str = None, port: int = None, on_ready=None):
+        """Serves until interrupted."""
+        async def main():
+            base_url = await self.start(host or self.DEFAULT_HOST, self.DEFAULT_PORT if port is None else port)
+            if on_ready is not None:
+                on_ready(base_url)
+            try:
+                async with self._server:
+                    await self._server.serve_forever()
+            finally:
+                await self._shutdown()
+
+        asyncio.run(main())
+
+    def start_in_thread(self, host: str = None, port: int = 0) -> str:
+        """
+        Serves from a daemon thread with its own event loop, for tests and benchmarks that
+        drive the server from the same process. Returns the base URL; call `stop()` when done.
+        """
+        ready = threading.Event()
+        result = {}
+
+        def target():
+            loop = asyncio.new_event_loop()
+            self._loop = loop
+            result["base_url"] = loop.run_until_complete(self.start(host or self.DEFAULT_HOST, port))
+            ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self._shutdown())
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        self._thread = threading.Thread(target=target, name=self.THREAD_NAME, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return result["base_url"]
+
+    def stop(self):
+        """Stops a server started with `start_in_thread()`."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+
+
+async def serve(handler, host: str, port: int, idle_timeout: float = IDLE_TIMEOUT,
+                read_timeout: float = READ_TIMEOUT) -> asyncio.Server:
+    """
+    Starts serving on (host, port). `handler` is a coroutine taking a `Request` and
+    returning a `Response` or `StreamingResponse`. Port 0 picks a free port.
+    """
+    async def on_connection(reader, writer):
+        await _handle_connection(handler, reader, writer, idle_timeout, read_timeout)
+
+    return await asyncio.start_server(on_connection, host, port)
+
+
+async def _handle_connection(handler, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                             idle_timeout: float = IDLE_TIMEOUT, read_timeout: float = READ_TIMEOUT):
+    try:
+        while True:
+            try:
+                request = await _read_request(reader, idle_timeout, read_timeout)
+            except BadRequest as e:
+                await _write_response(writer, Response.json({"error": {"message": str(e)}}, e.status),
+                                      keep_alive=False)
+                break
+            if request is None:
+                break
+            try:
+                response = await handler(request)
+            except Exception:
+                logger.exception(f"Unhandled error while serving {request.method} {request.path}")
+                response = Response.json({"error": {"message": "Internal server error"}}, 500)
+            await _write_response(writer, response, request.keep_alive)
+            if not request.keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        # The client went away, possibly in the middle of a streamed response.
+        pass
+    finally:
+        writer.close()
+        with suppress(Exception):
+            await writer.wait_closed()
+
+
+async def _read_request(reader: asyncio.StreamReader, idle_timeout: float = IDLE_TIMEOUT,
+                        read_timeout: float = READ_TIMEOUT) -> Request | None:
+    """Returns the next request, or None once the client closes or idles out the connection."""
+    try:
+        request_line = await asyncio.wait_for(_read_line(reader, 414, "Request line"), idle_timeout)
+    except asyncio.TimeoutError:
+        return None
+    if not request_line.strip():
+        return None
+    try:
+        return await asyncio.wait_for(_read_rest(reader, request_line), read_timeout)
+    except asyncio.TimeoutError:
+        raise BadRequest("Timed out reading the request.", 408)
+
+
+async def _read_line(reader: asyncio.StreamReader, status: int, what: str) -> bytes:
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        # The line does not fit in the reader's buffer limit.
+        raise BadRequest(f"{what} too long.", status)
+
+
+async def _read_rest(reader: asyncio.StreamReader, request_line: bytes) -> Request:
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise BadRequest("Malformed request line.")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await _read_line(reader, 431, "Header line")
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise BadRequest("Too many header lines.", 431)
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        raise BadRequest("Chunked request bodies are not supported.")
+    # Plain ASCII digits only: int() would also take signs, underscores and surrounding spaces.
+    content_length = headers.get("content-length", "0")
+    if not (content_length.isascii() and content_length.isdigit()):
+        raise BadRequest("Invalid Content-Length.")
+    length = int(content_length)
+    if length > MAX_BODY_BYTES:
+        raise BadRequest("Request body too large.")
+    body = await reader.readexactly(length) if length else b""
+    return Request(method.upper(), target, headers, body)
+
+
+def _status_line(status: int) -> str:
+    try:
+        phrase = HTTPStatus(status).phrase
+    except ValueError:
+        phrase = ""
+    return f"HTTP/1.1 {status} {phrase}\r\n"
+
+
+async def _write_response(writer: asyncio.StreamWriter, response, keep_alive: bool):
+    headers = dict(response.headers)
+    headers["Connection"] = "keep-alive" if keep_alive else "close"
+    streaming = isinstance(response, StreamingResponse)
+    if streaming:
+        headers["Transfer-Encoding"] = "chunked"
+    else:
+        headers["Content-Length"] = str(len(response.body))
+
+    head = _status_line(response.status) + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+    writer.write(head.encode("latin-1"))
+    if not streaming:
+        writer.write(response.body)
+        await writer.drain()
+        return
+
+    async for chunk in response.chunks:
+        if chunk:
+            writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+            # `drain` raises once the client has disconnected, which stops the generator.
+            await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
@@ -0,0 +1,81 @@
+# incremental_json.py
+import json
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class IncrementalObjectParser:
+    """
+    Consumes a streamed completion chunk by chunk and reports each top-level field of
+    the JSON object as soon as its value is complete. Anything before the first `{`
+    (prose, a code fence) is skipped. Fields whose text does not decode are left for
+    the final, tolerant parse of the full completion.
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.done = False
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._segment_start = 0
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        """Adds a chunk and returns the (key, value) pairs it completed, in order."""
+        self._text += chunk
+        completed = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self.done:
+                break
+            char = text[i]
+            if not self._started:
+                if char == '{':
+                    self._started, self._depth, self._segment_start = True, 1, i + 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._complete(text[self._segment_start:i], completed)
+                    self.done = True
+            elif char == ',' and self._depth == 1:
+                self._complete(text[self._segment_start:i], completed)
+                self._segment_start = i + 1
+        self._pos = len(text)
+        return completed
+
+    def _complete(self, segment: str, completed: list):
+        try:
+            index = _skip_whitespace(segment, 0)
+            key, index = _decoder.raw_decode(segment, index)
+            index = _skip_whitespace(segment, index)
+            if not isinstance(key, str) or segment[index:index + 1] != ':':
+                return
+            value, index = _decoder.raw_decode(segment, _skip_whitespace(segment, index + 1))
+            if segment[index:].strip():
+                return
+        except ValueError:
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in _WHITESPACE:
+        index += 1
+    return index
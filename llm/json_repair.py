@@ -0,0 +1,210 @@
+# json_repair.py
+"""
+Single-pass, tolerant JSON parser for LLM output.
+
+`repair_json` reads the first JSON object (or array) out of a completion in one
+linear scan and recovers from the mistakes models commonly make: code fences and
+prose around the JSON, trailing or missing commas, single-quoted or bare keys,
+Python literals, raw newlines in strings, mismatched closers and output that was
+truncated mid-string or mid-object. A ```json fenced block is preferred over
+anything around it, and braces in prose that only parse by dropping content are
+not mistaken for the answer.
+"""
+import json
+import re
+
+_NUMBER_RE = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_BARE_WORD_RE = re.compile(r"[A-Za-z_$][\w$-]*")
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_WHITESPACE = " \t\n\r"
+_STRING_STOP = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_MISSING = object()
+_FENCE_RE = re.compile(r"```(json)?[^\S\n]*\n?(.*?)(?:```|\Z)", re.DOTALL | re.IGNORECASE)
+# Opening brackets tried per kind before giving up on text whose braces are all prose.
+MAX_CANDIDATES = 8
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON object or array can be recovered from the text."""
+
+
+def repair_json(text: str):
+    """
+    Returns the first JSON object (or, failing that, array) found in `text`, repairing it
+    as needed. Only the ```json fenced block is read when there is one. A candidate that
+    comes out empty, or only parses by dropping stray words or keys without values, is
+    rejected and the next opening bracket is tried.
+    """
+    block = _fenced_block(text)
+    if block is not None:
+        try:
+            return json.loads(block)
+        except json.JSONDecodeError:
+            text = block
+    for opener in '{[':
+        start = text.find(opener)
+        for _ in range(MAX_CANDIDATES):
+            if start == -1:
+                break
+            parser = _Parser(text)
+            value, _ = parser.parse_value(start)
+            if value is not _MISSING and value and not parser.dropped:
+                return value
+            start = text.find(opener, start + 1)
+    raise JSONRepairError("No JSON object or array could be recovered from the text.")
+
+
+def _fenced_block(text: str) -> str | None:
+    """The body of the first ```json fence, else of the first bare fence holding JSON."""
+    if '```' not in text:
+        return None
+    blocks = _FENCE_RE.findall(text)
+    for language, body in blocks:
+        if language:
+            return body.strip()
+    for _, body in blocks:
+        if body.lstrip()[:1] in ('{', '['):
+            return body.strip()
+    return None
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        # Stray characters and values skipped outside of a truncated tail.
+        self.dropped = 0
+
+    def skip(self, index: int) -> int:
+        """Skips whitespace and `//` comments."""
+        text = self.text
+        while index < self.length:
+            if text[index] in _WHITESPACE:
+                index += 1
+            elif text.startswith('//', index):
+                newline = text.find('\n', index)
+                index = self.length if newline == -1 else newline + 1
+            else:
+                break
+        return index
+
+    def parse_value(self, index: int):
+        index = self.skip(index)
+        if index >= self.length:
+            return _MISSING, index
+        char = self.text[index]
+        if char == '{':
+            return self.parse_object(index + 1)
+        if char == '[':
+            return self.parse_array(index + 1)
+        if char in '"\'':
+            return self.parse_string(index + 1, char)
+        match = _NUMBER_RE.match(self.text, index)
+        if match:
+            number = match.group()
+            is_float = any(c in number for c in '.eE')
+            return (float(number) if is_float else int(number)), match.end()
+        match = _BARE_WORD_RE.match(self.text, index)
+        if match:
+            word = match.group()
+            return _LITERALS.get(word, word), match.end()
+        return _MISSING, index
+
+    def parse_object(self, index: int):
+        result = {}
+        text = self.text
+        while True:
+            index = self.skip(index)
+            if index >= self.length:
+                return result, index  # truncated
+            char = text[index]
+            if char in '}]':
+                return result, index + 1  # `]` closing an object is a mismatched closer
+            if char == ',':
+                index += 1
+                continue
+
+            if char in '"\'':
+                key, index = self.parse_string(index + 1, char)
+            else:
+                match = _BARE_WORD_RE.match(text, index)
+                if not match:
+                    index += 1  # stray character between members
+                    self.dropped += 1
+                    continue
+                key, index = match.group(), match.end()
+
+            index = self.skip(index)
+            if index < self.length and text[index] in ':=':
+                index += 1
+            value, index = self.parse_value(index)
+            if value is _MISSING:
+                # A key without a value only happens in truncated output; drop it.
+                if self.skip(index) >= self.length:
+                    return result, index
+                self.dropped += 1
+                continue
+            result[key] = value
+
+    def parse_array(self, index: int):
+        result = []
+        text = self.text
+        while True:
+            index = self.skip(index)
+            if index >= self.length:
+                return result, index  # truncated
+            char = text[index]
+            if char in ']}':
+                return result, index + 1  # `}` closing an array is a mismatched closer
+            if char == ',':
+                index += 1
+                continue
+            value, new_index = self.parse_value(index)
+            if value is _MISSING:
+                index = new_index + 1
+                self.dropped += 1
+                continue
+            result.append(value)
+            index = new_index
+
+    def parse_string(self, index: int, quote: str):
+        text = self.text
+        stop = _STRING_STOP[quote]
+        parts = []
+        while True:
+            # Copy each run of ordinary characters in one slice.
+            match = stop.search(text, index)
+            if match is None:
+                parts.append(text[index:])
+                return "".join(parts), self.length  # truncated mid-string
+            end = match.start()
+            parts.append(text[index:end])
+            if text[end] == quote:
+                return "".join(parts), end + 1
+            # Backslash escape
+            if end + 1 >= self.length:
+                return "".join(parts), self.length
+            escape = text[end + 1]
+            index = end + 2
+            if escape == 'u':
+                code_point, index = self._unicode_escape(end + 2)
+                parts.append(code_point)
+            else:
+                parts.append(_ESCAPES.get(escape, escape))
+
+    def _unicode_escape(self, index: int) -> tuple[str, int]:
+        """Decodes the hex digits of a `\\u` escape, joining UTF-16 surrogate pairs."""
+        try:
+            code = int(self.text[index:index + 4], 16)
+        except ValueError:
+            return 'u', index
+        index += 4
+        if 0xD800 <= code < 0xDC00 and self.text.startswith('\\u', index):
+            try:
+                low = int(self.text[index + 2:index + 6], 16)
+            except ValueError:
+                low = 0
+            if 0xDC00 <= low < 0xE000:
+                return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), index + 6
+        return chr(code), index
@@ -2,118 +2,362 @@
 import logging
 import os
 import json
-import re
+import threading
+from urllib.parse import urlparse
+
+from .profiling import span
+
+from .json_repair import JSONRepairError, repair_json
 
-from openai import OpenAI
-import lmstudio as lms
 logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_URL = "http://localhost:1234/v1"
+DEFAULT_MODEL = "google/gemma-3n-e4b"
+
+
 class LLMInterface:
-    def __init__(self):
-        # Point to the local server
-        self.client = OpenAI(base_url="http://localhost:1234/v1", api_key="not-needed")
-        lms.configure_default_client("localhost:1234")
-        try:
-            self.model = lms.llm("google/gemma-3n-e4b")
-            logger.info(f"LMStudioLLMInterface initialized. Pointing to: localhost:1234")
-            self.is_reachable = False  # Flag for initial health check
-        except Exception as e:
-            logger.error(f"Failed to initialize OpenAI client for LM Studio: {e}")
-            raise Exception("Could not initialize LM Studio client.") from e
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL,
+                 backend: str = "lmstudio", max_concurrency: int = 4, timeout: float = 120.0,
+                 cache=None, refresh: bool = False, prompt_cache: bool = False):
+        """
+        `backend` selects how the blocking `execute()` talks to the server: "lmstudio"
+        uses the LM Studio SDK, "openai" uses the OpenAI-compatible `/v1/chat/completions`
+        endpoint. `aexecute()` always uses the OpenAI-compatible endpoint.
+
+        If a `ResponseCache` is given, successful responses are stored in it and served
+        from it on identical requests. `refresh` skips the lookup but still stores.
+
+        `prompt_cache` adds llama.cpp's `cache_prompt` flag to OpenAI-compatible requests,
+        asking the server to keep the KV cache of the prompt prefix between requests. The
+        LM Studio SDK has no such option, so with the "lmstudio" backend it only reaches
+        `aexecute()`, and a warning says so.
+
+        Nothing is imported or connected here; the backend is set up on the first call.
+        """
+        if backend not in ("lmstudio", "openai"):
+            raise ValueError(f"Unknown LLM backend '{backend}'. Expected 'lmstudio' or 'openai'.")
+        self.base_url = base_url
+        self.model_id = model
+        self.backend = backend
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.sampling = {"temperature": 0.1}
+        self.cache = cache
+        self.refresh = refresh
+        self.prompt_cache = prompt_cache
+        if prompt_cache and backend == "lmstudio":
+            logger.warning("The prompt cache hint is only sent to OpenAI-compatible endpoints; blocking calls "
+                           "through the LM Studio SDK ignore it. Use the 'openai' backend to send it everywhere.")
+
+        self.client = None
+        self.model = None
+        self._init_lock = threading.Lock()
+
+        # The async client and its semaphore are bound to the event loop that created them.
+        self._async_client = None
+        self._async_semaphore = None
+        self._async_loop = None
+        # `execute_many()` runs on one long-lived loop in a daemon thread, so its pooled client stays open.
+        self._batch_loop = None
+        self._batch_thread = None
+
+    def _ensure_backend(self):
+        """Creates the blocking client (and connects to LM Studio) on first use."""
+        if self.client is not None:
+            return
+        with self._init_lock:
+            if self.client is not None:
+                return
+            from openai import OpenAI
+
+            if self.backend == "lmstudio":
+                import lmstudio as lms
+
+                host = urlparse(self.base_url).netloc
+                lms.configure_default_client(host)
+                try:
+                    self.model = lms.llm(self.model_id)
+                    logger.info(f"LMStudioLLMInterface initialized. Pointing to: {host}")
+                except Exception as e:
+                    logger.error(f"Failed to initialize OpenAI client for LM Studio: {e}")
+                    raise Exception("Could not initialize LM Studio client.") from e
+            # Point to the local server
+            self.client = OpenAI(base_url=self.base_url, api_key="not-needed", timeout=self.timeout)
+
+    def _messages(self, system_prompt: str, user_prompt: str) -> list[dict]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _request_options(self) -> dict:
+        options = dict(self.sampling)
+        if self.prompt_cache:
+            options["extra_body"] = {"cache_prompt": True}
+        return options
 
     def execute(self, system_prompt: str, user_prompt: str) -> dict:
         """
         Executes a prompt against the LLM and returns the parsed JSON output.
         """
-        logger.debug("\n--- Sending to LLM ---")
-        response_str = None
-        try:
-            chat = lms.Chat(system_prompt)
-            chat.add_user_message(user_prompt)
-            response_message = self.model.respond(chat, config={
-                "temperature": 0.1,
-                # "maxTokens": 50,
-            })
-            response_str = response_message.content
-            logger.debug("--- LLM Response ---")
-            clean_json = self.clean_json_string(response_str.strip()).strip()
+        with span("execute", backend=self.backend) as trace:
+            trace.set(prompt_chars=len(system_prompt) + len(user_prompt))
+            cache_key, cached = self._cache_lookup(system_prompt, user_prompt)
+            if cached is not None:
+                trace.set(cached=True)
+                return cached
+            logger.debug("\n--- Sending to LLM ---")
             try:
-                # The content should already be a valid JSON string
-                json_data = json.loads(clean_json)
-                logger.debug(f"LM STUDIO: Successfully extracted structured JSON data. \n {json_data}")
-                return json_data
-            except json.JSONDecodeError as e:
+                self._ensure_backend()
+                if self.backend == "openai":
+                    raw = self.client.chat.completions.with_raw_response.create(
+                        model=self.model_id,
+                        messages=self._messages(system_prompt, user_prompt),
+                        **self._request_options(),
+                    )
+                    completion = raw.parse()
+                    response_str = completion.choices[0].message.content or ""
+                    self._trace_usage(trace, completion.usage, raw.retries_taken)
+                else:
+                    import lmstudio as lms
+
+                    chat = lms.Chat(system_prompt)
+                    chat.add_user_message(user_prompt)
+                    response_message = self.model.respond(chat, config={
+                        **self.sampling,
+                        # "maxTokens": 50,
+                    })
+                    response_str = response_message.content
+                    self._trace_lmstudio_stats(trace, response_message)
+            except Exception as e:
+                logger.error(f"ERROR: An unexpected error occurred while calling the LLM: {e}")
+                trace.set(error=type(e).__name__)
+                return {"error": "LLM API call failed", "details": str(e)}
+            trace.set(response_chars=len(response_str))
+            return self._cache_store(cache_key, self._parse_response(response_str))
+
+    def execute_streaming(self, system_prompt: str, user_prompt: str, on_field) -> dict:
+        """
+        Streams the completion and calls `on_field(key, value)` as soon as each top-level
+        field of the JSON object is complete. If `on_field` returns False, generation is
+        cancelled and only the fields received so far are returned. Otherwise the full
+        completion is parsed exactly like `execute()`.
+        """
+        from .incremental_json import IncrementalObjectParser
+
+        with span("execute", backend=self.backend, streamed=True) as trace:
+            trace.set(prompt_chars=len(system_prompt) + len(user_prompt))
+            cache_key, cached = self._cache_lookup(system_prompt, user_prompt)
+            if cached is not None:
+                trace.set(cached=True)
+                return cached
+            logger.debug("\n--- Streaming from LLM ---")
+            parser = IncrementalObjectParser()
+            chunks = []
+            stream = None
+            try:
+                self._ensure_backend()
+                if self.backend == "openai":
+                    raw = self.client.chat.completions.with_raw_response.create(
+                        model=self.model_id,
+                        messages=self._messages(system_prompt, user_prompt),
+                        stream=True,
+                        **self._request_options(),
+                    )
+                    trace.set(retries=raw.retries_taken)
+                    stream = raw.parse()
+                    pieces = (chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+                else:
+                    import lmstudio as lms
+
+                    chat = lms.Chat(system_prompt)
+                    chat.add_user_message(user_prompt)
+                    stream = self.model.respond_stream(chat, config={**self.sampling})
+                    pieces = (fragment.content for fragment in stream)
+
+                for piece in pieces:
+                    chunks.append(piece)
+                    for key, value in parser.feed(piece):
+                        if on_field(key, value) is False:
+                            self._cancel_stream(stream)
+                            logger.debug(f"Generation cancelled after field '{key}'.")
+                            trace.set(cancelled=True, response_chars=sum(len(c) for c in chunks))
+                            return dict(parser.fields)
+            except Exception as e:
+                logger.error(f"ERROR: An unexpected error occurred while calling the LLM: {e}")
+                trace.set(error=type(e).__name__)
+                return {"error": "LLM API call failed", "details": str(e)}
+            response_str = "".join(chunks)
+            trace.set(response_chars=len(response_str))
+            return self._cache_store(cache_key, self._parse_response(response_str))
+
+    @staticmethod
+    def _cancel_stream(stream):
+        # LM Studio prediction streams are cancelled explicitly; closing an OpenAI stream
+        # drops the HTTP connection, which makes the server stop generating.
+        if hasattr(stream, "cancel"):
+            stream.cancel()
+        elif hasattr(stream, "close"):
+            stream.close()
+
+    async def aexecute(self, system_prompt: str, user_prompt: str) -> dict:
+        """
+        Coroutine counterpart of `execute()`. Requests go to the OpenAI-compatible
+        `/v1/chat/completions` endpoint over a pooled keep-alive connection, and at
+        most `max_concurrency` of them are in flight at once.
+        """
+        with span("execute", backend="openai", asynchronous=True) as trace:
+            trace.set(prompt_chars=len(system_prompt) + len(user_prompt))
+            cache_key, cached = self._cache_lookup(system_prompt, user_prompt)
+            if cached is not None:
+                trace.set(cached=True)
+                return cached
+            client, semaphore = await self._get_async_resources()
+            logger.debug("\n--- Sending to LLM (async) ---")
+            try:
+                async with semaphore:
+                    raw = await client.chat.completions.with_raw_response.create(
+                        model=self.model_id,
+                        messages=self._messages(system_prompt, user_prompt),
+                        **self._request_options(),
+                    )
+                completion = raw.parse()
+                response_str = completion.choices[0].message.content or ""
+                self._trace_usage(trace, completion.usage, raw.retries_taken)
+            except Exception as e:
+                logger.error(f"ERROR: An unexpected error occurred while calling the LLM: {e}")
+                trace.set(error=type(e).__name__)
+                return {"error": "LLM API call failed", "details": str(e)}
+            trace.set(response_chars=len(response_str))
+            return self._cache_store(cache_key, self._parse_response(response_str))
+
+    def execute_many(self, requests: list[tuple[str, str]]) -> list[dict]:
+        """
+        Runs a batch of (system_prompt, user_prompt) pairs concurrently through
+        `aexecute()` and returns the parsed outputs in request order. Blocks, so it
+        cannot be called from a running event loop; await `aexecute()` there instead.
+        Batches from several threads share one pooled client and `max_concurrency`.
+        """
+        import asyncio
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("execute_many() blocks and cannot run inside an event loop; await aexecute() instead.")
+        if not requests:
+            return []
+
+        async def run_all():
+            return await asyncio.gather(*(self.aexecute(s, u) for s, u in requests))
+
+        return asyncio.run_coroutine_threadsafe(run_all(), self._get_batch_loop()).result()
+
+    def _get_batch_loop(self):
+        import asyncio
+
+        with self._init_lock:
+            if self._batch_loop is None:
+                self._batch_loop = asyncio.new_event_loop()
+                self._batch_thread = threading.Thread(target=self._batch_loop.run_forever,
+                                                      name="llm-batch-loop", daemon=True)
+                self._batch_thread.start()
+            return self._batch_loop
+
+    def close(self):
+        """Closes the pooled client used by `execute_many()` and stops its event loop."""
+        import asyncio
+
+        with self._init_lock:
+            loop, thread = self._batch_loop, self._batch_thread
+            self._batch_loop = self._batch_thread = None
+        if loop is None:
+            return
+        if self._async_loop is loop:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    async def aclose(self):
+        """Closes the pooled async HTTP client, if one was opened."""
+        if self._async_client is not None:
+            await self._async_client.close()
+        self._async_client = None
+        self._async_semaphore = None
+        self._async_loop = None
+
+    def _cache_lookup(self, system_prompt: str, user_prompt: str) -> tuple[str | None, dict | None]:
+        if self.cache is None:
+            return None, None
+        key = self.cache.make_key(self.model_id, system_prompt, user_prompt, self.sampling)
+        return key, (None if self.refresh else self.cache.get(key))
+
+    def _cache_store(self, cache_key: str | None, response: dict) -> dict:
+        # Failed calls and unparseable output are never cached, so they are retried next run.
+        if cache_key is not None and "error" not in response:
+            self.cache.put(cache_key, response)
+        return response
+
+    @staticmethod
+    def _trace_usage(trace, usage, retries: int):
+        trace.set(retries=retries)
+        if usage is not None:
+            trace.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            details = getattr(usage, "prompt_tokens_details", None)
+            if details is not None and getattr(details, "cached_tokens", None) is not None:
+                trace.set(cached_tokens=details.cached_tokens)
+
+    @staticmethod
+    def _trace_lmstudio_stats(trace, response_message):
+        stats = getattr(response_message, "stats", None)
+        if stats is not None:
+            trace.set(prompt_tokens=getattr(stats, "prompt_tokens_count", None),
+                      completion_tokens=getattr(stats, "predicted_tokens_count", None))
+
+    async def _get_async_resources(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            from openai import AsyncOpenAI
+
+            # AsyncOpenAI keeps one pooled, keep-alive HTTP client for its lifetime;
+            # the semaphore is what bounds the number of in-flight requests.
+            stale = self._async_client
+            self._async_client = AsyncOpenAI(base_url=self.base_url, api_key="not-needed", timeout=self.timeout)
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._async_loop = loop
+            # The new client is swapped in first, so concurrent callers never see the stale one.
+            if stale is not None:
                 try:
-                    return self.fix_and_load_json(clean_json)
-                except e:
-                    logger.error(
-                        f"LLM returned invalid JSON despite JSON mode request: {response_str}")
-                    raise e
-        except json.JSONDecodeError as e:
-            logger.error(f"ERROR: Could not decode JSON from LLM response: {e}")
-            return {"error": "Invalid JSON response", "details": response_str}
-        except Exception as e:
-            logger.error(f"ERROR: An unexpected error occurred while calling the LLM: {e}")
-            return {"error": "LLM API call failed", "details": str(e)}
-
-    def fix_and_load_json(self, json_str: str) -> dict | None:
-        lines = json_str.splitlines()
-        fixed_lines = []
-        stack = []
-
-        for line in lines:
-            stripped = line.strip()
-
-            # Opening brackets
-            if stripped.endswith('{') or stripped.endswith('['):
-                stack.append(stripped[-1])
-                fixed_lines.append(line)
-                continue
-
-            # Closing brackets
-            if stripped.endswith(']') or stripped.endswith('}'):
-                if stack:
-                    expected = stack[-1]
-                    actual = stripped[-1]
-
-                    if expected == '{' and actual == ']':
-                        # Wrong close: should be }
-                        line = line.rstrip()[:-1] + '}'
-                        stack.pop()
-                    elif expected == '[' and actual == '}':
-                        # Wrong close: should be ]
-                        line = line.rstrip()[:-1] + ']'
-                        stack.pop()
-                    elif expected == actual:
-                        stack.pop()
-                fixed_lines.append(line)
-            else:
-                fixed_lines.append(line)
-
-        # Final check: if top-level closing bracket is mismatched
-        if fixed_lines:
-            last = fixed_lines[-1].strip()
-            if last == ']':
-                fixed_lines[-1] = '}'
-            elif last == '}':
-                if stack and stack[-1] == '[':
-                    fixed_lines[-1] = ']'
-
-        fixed_json = "\n".join(fixed_lines)
+                    await stale.close()
+                except Exception as e:
+                    # Its connections may belong to a loop that is already closed.
+                    logger.debug(f"Could not close the previous async client cleanly: {e}")
+        return self._async_client, self._async_semaphore
 
+    def _parse_response(self, response_str: str) -> dict:
+        """Extracts the JSON object from a raw completion, repairing it if needed."""
+        logger.debug("--- LLM Response ---")
         try:
-            return json.loads(fixed_json)
-        except json.JSONDecodeError as e:
-            logger.error("❌ Still broken:", e)
-            logger.error("---- Fixed Output ----")
-            logger.error(fixed_json)
-            raise e
-
-    def clean_json_string(self, s):
-        # Remove markdown-style triple backtick code fences
-        match = re.search(r"```json\s*(.*?)\s*```", s, re.DOTALL)
-        if match:
-            logger.debug("Got text in json markdown format")
-            json_str = match.group(1)
-            return json_str.strip()
-        return s
\ No newline at end of file
+            # Well-formed output takes the fast path through the C decoder.
+            json_data = json.loads(response_str)
+            logger.debug(f"LM STUDIO: Successfully extracted structured JSON data. \n {json_data}")
+            return json_data
+        except json.JSONDecodeError:
+            pass
+        except RecursionError:
+            # Nesting this deep is not a usable output, and repairing it would recurse just as far.
+            logger.error("ERROR: The LLM response is nested too deeply to decode.")
+            return {"error": "Invalid JSON response", "details": response_str}
+        with span("json-repair", response_chars=len(response_str)) as trace:
+            try:
+                json_data = repair_json(response_str)
+                logger.debug(f"Repaired malformed JSON from LLM response. \n {json_data}")
+                return json_data
+            except (JSONRepairError, RecursionError) as e:
+                logger.error(f"ERROR: Could not decode JSON from LLM response: {e}")
+                trace.set(error=type(e).__name__)
+                return {"error": "Invalid JSON response", "details": response_str}
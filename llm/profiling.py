@@ -0,0 +1,190 @@
+"""
+Opt-in tracing of where a command spends its time.
+
+Code is instrumented with `with span("phase") as s: ... s.set(key=value)`. While no
+tracer is enabled (the default), `span()` returns a shared no-op object, so
+instrumented code pays for one global lookup and an empty `with` block.
+`main.py --profile` enables a `Tracer`, which records every span with its duration,
+attributes and parent span, writes them as JSONL and prints a per-phase summary.
+
+Spans nest through a context variable. asyncio tasks inherit it; work handed to a
+thread pool must be wrapped with `propagate_context` so its spans keep their parent.
+
+This module lives in `llm` because both packages are instrumented and `axiom`
+already depends on `llm`, not the other way round.
+"""
+import contextvars
+import itertools
+import json
+import threading
+import time
+from pathlib import Path
+
+_current_span = contextvars.ContextVar("axiom_current_span", default=None)
+_tracer = None
+
+# Numeric span attributes that are summed per phase in the summary table.
+SUMMED_ATTRIBUTES = ("prompt_chars", "response_chars", "prompt_tokens", "completion_tokens", "retries")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "id", "parent_id", "name", "attributes", "thread", "start", "duration", "_token")
+
+    def __init__(self, tracer: "Tracer", span_id: int, name: str, attributes: dict):
+        self.tracer = tracer
+        self.id = span_id
+        self.parent_id = None
+        self.name = name
+        self.attributes = attributes
+        self.thread = None
+        self.start = None
+        self.duration = None
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent_id = parent.id if parent is not None else None
+        self._token = _current_span.set(self)
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes.setdefault("error", exc_type.__name__)
+        _current_span.reset(self._token)
+        self.tracer._record(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - self.tracer.origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "thread": self.thread,
+            **self.attributes,
+        }
+
+
+class Tracer:
+    """Collects finished spans. Safe to use from several threads at once."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attributes) -> Span:
+        return Span(self, next(self._ids), name, attributes)
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def export_jsonl(self, path: str | Path) -> Path:
+        """Writes one JSON object per span, in start order."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        with path.open("w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        return path
+
+    def summary(self) -> list[dict]:
+        """Aggregates the spans per phase name, slowest total first."""
+        phases = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            phase = phases.setdefault(span.name, {"phase": span.name, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                  **{attr: 0 for attr in SUMMED_ATTRIBUTES}})
+            duration_ms = span.duration * 1000
+            phase["count"] += 1
+            phase["total_ms"] += duration_ms
+            phase["max_ms"] = max(phase["max_ms"], duration_ms)
+            for attr in SUMMED_ATTRIBUTES:
+                value = span.attributes.get(attr)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    phase[attr] += value
+        for phase in phases.values():
+            phase["mean_ms"] = phase["total_ms"] / phase["count"]
+        return sorted(phases.values(), key=lambda p: p["total_ms"], reverse=True)
+
+    def format_summary(self) -> str:
+        wall_ms = (time.perf_counter() - self.origin) * 1000
+        rows = self.summary()
+        header = (f"{'phase':<16} {'count':>7} {'total ms':>11} {'mean ms':>10} {'max ms':>10} "
+                  f"{'chars in/out':>17} {'tokens in/out':>15} {'retries':>8}")
+        lines = [f"Profile ({wall_ms:.0f} ms wall clock; nested and parallel spans overlap)", header, "-" * len(header)]
+        for p in rows:
+            chars = f"{p['prompt_chars']}/{p['response_chars']}" if p['prompt_chars'] or p['response_chars'] else ""
+            tokens = (f"{p['prompt_tokens']}/{p['completion_tokens']}"
+                      if p['prompt_tokens'] or p['completion_tokens'] else "")
+            lines.append(f"{p['phase']:<16} {p['count']:>7} {p['total_ms']:>11.1f} {p['mean_ms']:>10.2f} "
+                         f"{p['max_ms']:>10.1f} {chars:>17} {tokens:>15} {p['retries'] or '':>8}")
+        return "\n".join(lines)
+
+
+def span(name: str, **attributes):
+    """Starts a span on the active tracer, or returns a no-op span when profiling is off."""
+    tracer = _tracer
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.span(name, **attributes)
+
+
+def propagate_context(fn):
+    """
+    Wraps `fn` to run in a copy of the caller's context, for `pool.submit` and `pool.map`.
+    Each call gets its own copy, so the wrapper can run in several threads at once.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def enable() -> Tracer:
+    """Starts recording spans on a fresh tracer and returns it."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Tracer | None:
+    """Stops recording and returns the tracer that was active, if any."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active_tracer() -> Tracer | None:
+    return _tracer
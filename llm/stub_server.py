@@ -0,0 +1,310 @@
+# stub_server.py
+"""
+Local OpenAI-compatible stand-in for an LLM server, for offline load and latency testing.
+
+Serves `POST /v1/chat/completions` (plain and `"stream": true` server-sent events),
+`GET /v1/models` and `GET /stats`. Point the SDK at it with
+`--backend openai --base-url http://127.0.0.1:8765/v1`.
+
+Every request is answered from a script of responses keyed by `prompt_hash()`, or
+with the default response. On top of that the server can inject latency drawn from a
+distribution, HTTP errors, hung requests and malformed JSON at configurable rates.
+All randomness comes from a seeded generator per request, so runs are reproducible.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from .httpd import Response, Service, StreamingResponse, serve
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STUB_HOST = "127.0.0.1"
+DEFAULT_STUB_PORT = 8765
+# Roughly four characters per token, which is close enough for pacing and usage counts.
+CHARS_PER_TOKEN = 4
+
+
+def prompt_hash(messages: list[dict]) -> str:
+    """The key scripted responses are looked up by: a hash of every message's role and content."""
+    canonical = json.dumps([[m.get("role"), m.get("content")] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LatencyModel:
+    """
+    A latency distribution in milliseconds, written as `kind:params`:
+    `fixed:MS`, `uniform:LOW:HIGH`, `normal:MEAN:STDDEV` or `lognormal:MEDIAN:SIGMA`.
+    A bare number is the same as `fixed:MS`.
+    """
+
+    KINDS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        if not params:
+            kind, params = "fixed", kind
+        try:
+            values = [float(p) for p in params.split(":")]
+        except ValueError:
+            values = []
+        if kind not in self.KINDS or len(values) != self.KINDS[kind] or any(v < 0 for v in values):
+            raise ValueError(f"Invalid latency '{spec}'. Expected fixed:MS, uniform:LOW:HIGH, "
+                             f"normal:MEAN:STDDEV or lognormal:MEDIAN:SIGMA.")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self, rng: random.Random) -> float:
+        """Draws one latency, in seconds."""
+        if self.kind == "fixed":
+            ms = self.values[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(*self.values)
+        elif self.kind == "normal":
+            ms = rng.gauss(*self.values)
+        else:
+            median, sigma = self.values
+            ms = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(ms, 0.0) / 1000
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    # Binary search over slice comparisons, which run in C, instead of a per-character loop.
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _corrupt(content: str, rng: random.Random) -> str:
+    """Applies one of the mistakes models make when asked for JSON."""
+    mutations = [
+        lambda c: f"Sure! Here is the JSON you asked for:\n```json\n{c}\n```",
+        lambda c: c[:max(1, int(len(c) * rng.uniform(0.4, 0.9)))],
+        lambda c: c.rstrip().rstrip("}") + ",\n}" if c.rstrip().endswith("}") else c + ",",
+        lambda c: c.replace('"', "'"),
+        lambda c: c.replace("true", "True").replace("false", "False").replace("null", "None"),
+    ]
+    return rng.choice(mutations)(content)
+
+
+class StubServer(Service):
+    DEFAULT_HOST = DEFAULT_STUB_HOST
+    DEFAULT_PORT = DEFAULT_STUB_PORT
+    THREAD_NAME = "axiom-stub-server"
+
+    def __init__(self, latency: str = "fixed:0", tokens_per_second: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 500, malformed_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang_seconds: float = 300.0, slots: int = 0, script: dict = None, default_response=None,
+                 record_path: str | Path = None, seed: int = 0, prefill_tokens_per_second: float = 0.0,
+                 prefix_cache_size: int = 0):
+        """
+        `latency` is the time to the first token. With `tokens_per_second` set, the rest
+        of the completion is paced at that rate (streamed or not). `slots` caps how many
+        requests are generated at once; the rest queue, like on a real server. A hung
+        request sleeps for `hang_seconds` before answering, to exercise client timeouts.
+
+        `script` maps prompt hashes to responses: a string is sent verbatim as the
+        completion, anything else is sent as JSON. Unscripted prompts get
+        `default_response` and, with `record_path`, are appended to that JSONL file so
+        they can be scripted later.
+
+        With `prefill_tokens_per_second`, the time to first token also grows with the
+        prompt length. Requests sent with `"cache_prompt": true` (as llama.cpp accepts)
+        only pay for the part of the prompt not shared with one of the last
+        `prefix_cache_size` such prompts, which simulates KV-cache prefix reuse.
+        """
+        for name, rate in (("error_rate", error_rate), ("malformed_rate", malformed_rate), ("hang_rate", hang_rate)):
+            if not 0.0 <= rate <= 1.0:
+                raise ValueError(f"{name} must be between 0 and 1.")
+        self.latency = LatencyModel(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.slots = slots
+        self.script = script or {}
+        self.default_response = {} if default_response is None else default_response
+        self.record_path = Path(record_path) if record_path else None
+        self.seed = seed
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.prefix_cache_size = prefix_cache_size
+
+        self.stats = {"requests": 0, "streamed": 0, "scripted": 0, "errors": 0, "hung": 0, "malformed": 0,
+                      "cancelled": 0, "in_flight": 0, "peak_in_flight": 0, "prompt_tokens": 0,
+                      "cached_prompt_tokens": 0}
+        self._recorded = set()
+        self._cached_prompts = OrderedDict()
+        self._semaphore = None
+        super().__init__()
+
+    @classmethod
+    def load_script(cls, path: str | Path) -> dict:
+        """Reads a JSON object mapping prompt hashes to responses."""
+        script = json.loads(Path(path).read_text(encoding="utf-8"))
+        if not isinstance(script, dict):
+            raise ValueError(f"'{path}' must contain a JSON object keyed by prompt hash.")
+        return script
+
+    # --- Request handling ---
+
+    async def handle(self, request):
+        if request.method == "GET" and request.path.rstrip("/") in ("/v1/models", "/models"):
+            return Response.json({"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "axiom"}]})
+        if request.method == "GET" and request.path == "/stats":
+            return Response.json(self.stats)
+        if request.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            return self._error(404, f"No route for {request.method} {request.path}.", "not_found")
+        if request.method != "POST":
+            return self._error(405, "Use POST.", "method_not_allowed")
+        try:
+            body = request.json()
+            messages = body["messages"]
+        except (ValueError, KeyError, TypeError):
+            return self._error(400, "Expected a JSON body with a 'messages' list.", "invalid_request_error")
+
+        self.stats["requests"] += 1
+        rng = random.Random(f"{self.seed}:{self.stats['requests']}")
+        key = prompt_hash(messages)
+
+        if rng.random() < self.hang_rate:
+            self.stats["hung"] += 1
+            await asyncio.sleep(self.hang_seconds)
+        if rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            await asyncio.sleep(self.latency.sample(rng))
+            return self._error(self.error_status, "Injected error from the stub server.", "server_error")
+
+        content = self._content_for(key, messages)
+        if rng.random() < self.malformed_rate:
+            self.stats["malformed"] += 1
+            content = _corrupt(content, rng)
+
+        model = body.get("model") or "stub"
+        prompt_text = "".join(f"<|{m.get('role')}|>\n{m.get('content')}\n" for m in messages)
+        prompt_tokens = len(prompt_text) // CHARS_PER_TOKEN
+        cached_tokens = self._use_prefix_cache(prompt_text) if body.get("cache_prompt") else 0
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["cached_prompt_tokens"] += cached_tokens
+        prefill = 0.0
+        if self.prefill_tokens_per_second > 0:
+            prefill = (prompt_tokens - cached_tokens) / self.prefill_tokens_per_second
+        if body.get("stream"):
+            self.stats["streamed"] += 1
+            return StreamingResponse(self._stream(content, model, rng, prefill))
+
+        async with self._slot():
+            await asyncio.sleep(self.latency.sample(rng) + prefill + self._generation_time(content))
+        completion_tokens = math.ceil(len(content) / CHARS_PER_TOKEN)
+        return Response.json({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens,
+                      "prompt_tokens_details": {"cached_tokens": cached_tokens}},
+        })
+
+    async def _stream(self, content: str, model: str, rng: random.Random, prefill: float = 0.0):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        def event(delta: dict, finish_reason=None) -> bytes:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        token_delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        finished = False
+        async with self._slot():
+            try:
+                await asyncio.sleep(self.latency.sample(rng) + prefill)
+                yield event({"role": "assistant", "content": ""})
+                for start in range(0, len(content), CHARS_PER_TOKEN):
+                    yield event({"content": content[start:start + CHARS_PER_TOKEN]})
+                    if token_delay:
+                        await asyncio.sleep(token_delay)
+                yield event({}, "stop")
+                yield b"data: [DONE]\n\n"
+                finished = True
+            finally:
+                if not finished:
+                    self.stats["cancelled"] += 1
+
+    def _use_prefix_cache(self, prompt_text: str) -> int:
+        """Returns how many tokens of the prompt are already cached, then caches the prompt."""
+        if self.prefix_cache_size <= 0:
+            return 0
+        shared = max((_common_prefix_length(prompt_text, cached) for cached in self._cached_prompts), default=0)
+        self._cached_prompts[prompt_text] = None
+        self._cached_prompts.move_to_end(prompt_text)
+        while len(self._cached_prompts) > self.prefix_cache_size:
+            self._cached_prompts.popitem(last=False)
+        return shared // CHARS_PER_TOKEN
+
+    def _content_for(self, key: str, messages: list[dict]) -> str:
+        if key in self.script:
+            self.stats["scripted"] += 1
+            response = self.script[key]
+        else:
+            response = self.default_response
+            self._record(key, messages)
+        return response if isinstance(response, str) else json.dumps(response, indent=2)
+
+    def _record(self, key: str, messages: list[dict]):
+        if key in self._recorded:
+            return
+        self._recorded.add(key)
+        logger.info(f"No scripted response for prompt hash {key}.")
+        if self.record_path is not None:
+            with self.record_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"hash": key, "messages": messages}, ensure_ascii=False) + "\n")
+
+    def _generation_time(self, content: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return math.ceil(len(content) / CHARS_PER_TOKEN) / self.tokens_per_second
+
+    @asynccontextmanager
+    async def _slot(self):
+        """Holds one of the server's generation slots, if the number of slots is limited."""
+        if self._semaphore is not None:
+            await self._semaphore.acquire()
+        self.stats["in_flight"] += 1
+        self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+        try:
+            yield
+        finally:
+            self.stats["in_flight"] -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    @staticmethod
+    def _error(status: int, message: str, error_type: str) -> Response:
+        return Response.json({"error": {"message": message, "type": error_type, "code": status}}, status)
+
+    # --- Lifecycle ---
+
+    async def start(self, host: str = DEFAULT_STUB_HOST, port: int = DEFAULT_STUB_PORT) -> str:
+        """Starts listening on the running event loop and returns the `/v1` base URL."""
+        self._semaphore = asyncio.Semaphore(self.slots) if self.slots > 0 else None
+        self._server = await serve(self.handle, host, port)
+        bound_port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}/v1"
@@ -1,21 +1,32 @@
 import logging
 import json
+from axiom.assertions import AssertionCompileError
+from axiom.history import TestHistory
 from axiom.sdk import AxiomSDK
-from jinja2 import Template
 import click
 
-from llm.llm_interface import LLMInterface
+from llm.cache import ResponseCache
+from llm.llm_interface import LLMInterface, DEFAULT_BASE_URL, DEFAULT_MODEL
 
 # --- Setup ---
 # Set up basic logging to show INFO and above.
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
 
-def _initialize_sdk():
-    """Helper to initialize the SDK and handle connection errors."""
+def _initialize_sdk(jobs: int = 1, stream: bool = False, use_cache: bool = True):
+    """
+    Helper to initialize the SDK and handle configuration errors.
+    The LLM backend itself only connects on the first request.
+    `use_cache=False` bypasses the response cache, for commands that need fresh samples.
+    """
+    ctx = click.get_current_context(silent=True)
+    llm_options = (ctx.obj if ctx else None) or {}
+    if not use_cache:
+        llm_options = {**llm_options, "cache": None}
     try:
-        llm = LLMInterface()
-        sdk = AxiomSDK(llm_interface=llm)
+        llm = LLMInterface(**llm_options)
+        sdk = AxiomSDK(llm_interface=llm, jobs=jobs, stream=stream, prompt_cache=llm.prompt_cache,
+                       history=TestHistory())
         return sdk
     except Exception as e:
         logging.error(f"Failed to initialize SDK. Is your LLM server running? Error: {e}")
@@ -38,15 +49,69 @@ def _parse_inputs(inputs: tuple) -> dict:
     return data
 
 
+def _report_cache_stats(cache: ResponseCache):
+    """Prints the response cache counters at the end of a command."""
+    stats = cache.stats()
+    if stats['hits'] or stats['misses']:
+        click.secho(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, "
+                    f"{stats['entries']} entries stored.", fg='blue', err=True)
+    cache.close()
+
+
+def _start_profiling(ctx: click.Context, trace_file: str):
+    """Records spans for the whole command and reports them when it finishes."""
+    from llm import profiling
+
+    tracer = profiling.enable()
+    command_span = tracer.span("command", command=ctx.invoked_subcommand)
+    command_span.__enter__()
+
+    def report():
+        command_span.__exit__(None, None, None)
+        profiling.disable()
+        path = tracer.export_jsonl(trace_file)
+        click.secho("\n" + tracer.format_summary(), fg='blue', err=True)
+        click.secho(f"Trace written to {path}", fg='blue', err=True)
+
+    ctx.call_on_close(report)
+
+
 # --- CLI Definition ---
 
 @click.group()
 @click.option('--verbose', '-v', is_flag=True, help="Enable verbose logging from the LLM interface.")
-def cli(verbose):
+@click.option('--base-url', default=DEFAULT_BASE_URL, show_default=True,
+              help="Base URL of the OpenAI-compatible LLM server.")
+@click.option('--model', default=DEFAULT_MODEL, show_default=True, help="Model identifier to request.")
+@click.option('--backend', type=click.Choice(['lmstudio', 'openai']), default='lmstudio', show_default=True,
+              help="Client used for blocking calls: the LM Studio SDK or the /v1/chat/completions endpoint.")
+@click.option('--max-concurrency', default=4, show_default=True, type=click.IntRange(min=1),
+              help="Maximum number of concurrent requests on the pooled async client.")
+@click.option('--cache/--no-cache', 'use_cache', default=False, envvar='AXIOM_CACHE', show_default=True,
+              help="Serve identical LLM requests from the on-disk cache in .axiom_cache/.")
+@click.option('--refresh', is_flag=True,
+              help="Ignore cached responses but store fresh ones (implies --cache).")
+@click.option('--prompt-cache', is_flag=True,
+              help="Pin one canonical system prompt per file and ask the server to reuse its cached prefix.")
+@click.option('--profile', is_flag=True,
+              help="Trace every phase (parse, transpile, render, execute, assertions...) and print a summary.")
+@click.option('--trace-file', default=".axiom_cache/trace.jsonl", show_default=True, type=click.Path(dir_okay=False),
+              help="Where --profile writes the JSONL trace.")
+@click.pass_context
+def cli(ctx, verbose, base_url, model, backend, max_concurrency, use_cache, refresh, prompt_cache, profile,
+        trace_file):
     """
     Axiom: A framework for building reliable AI applications.
     This CLI provides tools to test, improve, and compile .axiom prompt files.
     """
+    cache = ResponseCache() if (use_cache or refresh) else None
+    ctx.obj = {"base_url": base_url, "model": model, "backend": backend, "max_concurrency": max_concurrency,
+               "cache": cache, "refresh": refresh, "prompt_cache": prompt_cache}
+    if cache is not None:
+        ctx.call_on_close(lambda: _report_cache_stats(cache))
+    if profile:
+        _start_profiling(ctx, trace_file)
+
     # Configure logging level based on the verbose flag
     log_level = logging.INFO if verbose else logging.ERROR
     logging.basicConfig(level=log_level, format='%(levelname)s: (%(name)s) %(message)s')
@@ -59,20 +124,63 @@ def cli(verbose):
 
 @cli.command()
 @click.argument('filepath', type=click.Path(exists=True))
-def test(filepath: str):
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Number of tests to run concurrently against the LLM server.")
+@click.option('--stream', is_flag=True,
+              help="Stream outputs and cancel generation as soon as a deterministic assertion fails.")
+@click.option('--changed', is_flag=True,
+              help="Skip tests unchanged since a recent pass (prompt, inputs and assertions); run past failures first.")
+@click.option('--samples', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Sample each test up to this many times, stopping once its pass rate is decided.")
+@click.option('--confidence', default=0.95, show_default=True, type=click.FloatRange(0.5, 1, max_open=True),
+              help="Confidence required to decide a pass rate (with --samples).")
+@click.option('--threshold', default=0.8, show_default=True, type=click.FloatRange(0, 1, min_open=True, max_open=True),
+              help="Pass rate a test must reach to pass (with --samples).")
+def test(filepath: str, jobs: int, stream: bool, changed: bool, samples: int, confidence: float, threshold: float):
     """
     Run all assertion-based tests in an axiom file.
 
     This command executes the prompt for each test with an 'asserts' block
     and validates the LLM's output against the defined assertions.
     """
-    sdk = _initialize_sdk()
-    sdk.test(filepath)
+    # Repeated samples must reach the model; cached responses would all be the same sample.
+    sdk = _initialize_sdk(jobs=jobs, stream=stream, use_cache=samples == 1)
+    sdk.test(filepath, changed_only=changed, samples=samples, confidence=confidence, threshold=threshold)
+
+
+@cli.command()
+@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+@click.option('--input-file', type=click.Path(exists=True, dir_okay=False),
+              help="JSONL file with one object of inputs per line (default: the inputs of the file's tests).")
+@click.option('--output', '-o', 'output_path', type=click.Path(dir_okay=False),
+              help="Append results to this JSONL file and resume from it (default: print them).")
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Number of records to run concurrently against the LLM server.")
+@click.option('--retry-errors', is_flag=True, help="When resuming, run records whose result was an error again.")
+def run(filepath: str, input_file: str, output_path: str, jobs: int, retry_errors: bool):
+    """
+    Run the prompt over a JSONL file of inputs.
+
+    Each result is written as soon as it completes, as {"index": N, "output": {...}}
+    or {"index": N, "error": "..."}, where N is the 0-based line of its input.
+    Re-running with the same --output skips the records that already have a result.
+    """
+    sdk = _initialize_sdk(jobs=jobs)
+    try:
+        counts = sdk.run(filepath, input_file, output_path, retry_errors=retry_errors)
+    except ValueError as e:
+        click.secho(f"ERROR: {e}", fg='red')
+        raise click.Abort()
+    color = 'red' if counts['failed'] else 'green'
+    click.secho(f"Ran {counts['completed'] + counts['failed']} record(s): {counts['completed']} completed, "
+                f"{counts['failed']} failed, {counts['skipped']} already done.", fg=color, err=True)
 
 
 @cli.command('compile-examples')
 @click.argument('filepath', type=click.Path(exists=True))
-def compile_examples(filepath: str):
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Number of tests to run concurrently against the LLM server.")
+def compile_examples(filepath: str, jobs: int):
     """
     Run tests and update the 'expected_output' block for passing tests.
 
@@ -80,16 +188,36 @@ def compile_examples(filepath: str):
     "promotes" the successful LLM output to be a canonical few-shot example
     by inserting or updating the 'expected_output' block in the .axiom file.
     """
-    sdk = _initialize_sdk()
+    sdk = _initialize_sdk(jobs=jobs)
     sdk.compile_examples(filepath)
 
 @cli.command()
 @click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
-@click.option('--test-name', '-t', default=None, help="The name of the failing test to improve.")
-def improve(filepath: str, test_name: str):
+@click.option('--test-name', '-t', default=None,
+              help="The name of the failing test to improve. Not allowed with --auto.")
+@click.option('--auto', is_flag=True, help="Search for better rules without interaction, within the budgets below.")
+@click.option('--beam-width', default=3, show_default=True, type=click.IntRange(min=1),
+              help="With --auto: rule sets kept after each round.")
+@click.option('--max-rounds', default=5, show_default=True, type=click.IntRange(min=1),
+              help="With --auto: brainstorm and evaluation rounds.")
+@click.option('--max-llm-calls', default=None, type=click.IntRange(min=1),
+              help="With --auto: LLM calls allowed, counting every test and semantic check.")
+@click.option('--max-minutes', default=None, type=click.FloatRange(min=0, min_open=True),
+              help="With --auto: wall-clock time allowed.")
+@click.option('--dry-run', is_flag=True, help="With --auto: report the best rule set without writing it.")
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Number of tests to run concurrently for each candidate rule set.")
+def improve(filepath: str, test_name: str, auto: bool, beam_width: int, max_rounds: int, max_llm_calls: int,
+            max_minutes: float, dry_run: bool, jobs: int):
     """Suggest new rules to fix a failing test."""
-    sdk = _initialize_sdk()
-    sdk.improve(filepath, test_name)
+    if auto and test_name:
+        raise click.UsageError("--auto searches across the whole suite; drop --test-name or --auto.")
+    sdk = _initialize_sdk(jobs=jobs)
+    if auto:
+        sdk.improve_auto(filepath, beam_width=beam_width, max_rounds=max_rounds, max_llm_calls=max_llm_calls,
+                         max_seconds=max_minutes * 60 if max_minutes else None, dry_run=dry_run)
+    else:
+        sdk.improve(filepath, test_name)
 
 
 @cli.command()
@@ -107,7 +235,11 @@ def generate(filepath: str, inputs: tuple):
     sdk = _initialize_sdk()
 
     print(f"\n--- Generating Prompts for: {filepath} ---")
-    system_prompt, user_payload_template = sdk.load(filepath)
+    if inputs:
+        # Rendering for concrete inputs also selects per-request examples (example_selection: "knn").
+        system_prompt, final_user_message = sdk.render(filepath, _parse_inputs(inputs))
+    else:
+        system_prompt, user_payload_template = sdk.load(filepath)
 
     print("\n" + "=" * 70)
     click.secho("✅ COMPONENT 1: THE SYSTEM PROMPT", fg='green', bold=True)
@@ -115,9 +247,6 @@ def generate(filepath: str, inputs: tuple):
     print(system_prompt)
 
     if inputs:
-        user_data = _parse_inputs(inputs)
-        final_user_message = Template(user_payload_template).render(**user_data)
-
         print("\n" + "=" * 70)
         click.secho("✅ COMPONENT 2: THE FINAL USER PROMPT", fg='green', bold=True)
         print("=" * 70)
@@ -128,9 +257,41 @@ def generate(filepath: str, inputs: tuple):
         print("=" * 70)
         print(user_payload_template)
 
+    breakdown = sdk.token_breakdown(filepath)
+    print("\n" + "=" * 70)
+    click.secho("SYSTEM PROMPT TOKENS (estimated)", fg='blue', bold=True)
+    print("=" * 70)
+    for name, tokens in breakdown["sections"]:
+        print(f"  {name:<40} {tokens:>8}")
+    print(f"  {'total':<40} {breakdown['total']:>8}")
+    if breakdown["budget"] is not None:
+        over = breakdown["total"] > breakdown["budget"]
+        click.secho(f"  {'max_prompt_tokens':<40} {breakdown['budget']:>8}", fg='red' if over else 'green')
+
     print("\n")
 
 
+@cli.command()
+@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', '-o', 'output_path', type=click.Path(dir_okay=False), default=None,
+              help="Where to write the artifact (default: FILEPATH with a .axiomc extension).")
+def build(filepath: str, output_path: str):
+    """
+    Compile an axiom file into a .axiomc artifact for production loading.
+
+    The artifact holds the merged prompt, the rendered system prompt, the payload
+    template and the validated assertions. Load it with
+    axiom.runtime.load_compiled(), which does not need the ANTLR parser.
+    """
+    sdk = AxiomSDK(llm_interface=None)
+    try:
+        output = sdk.build(filepath, output_path)
+    except AssertionCompileError as e:
+        click.secho(f"ERROR: {e}", fg='red')
+        raise click.Abort()
+    click.secho(f"✅ Wrote compiled artifact to {output}", fg='green')
+
+
 @cli.command()
 @click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
 def validate(filepath: str):
@@ -138,6 +299,110 @@ def validate(filepath: str):
     sdk = _initialize_sdk()
     sdk.validate(filepath)
 
+
+@cli.command()
+@click.argument('filepaths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--host', default="127.0.0.1", show_default=True)
+@click.option('--port', default=8080, show_default=True, type=int)
+@click.option('--workers', default=4, show_default=True, type=click.IntRange(min=1),
+              help="Requests (or batches) sent to the LLM server at once.")
+@click.option('--queue-size', default=64, show_default=True, type=click.IntRange(min=1),
+              help="Requests that may wait for a worker; further requests get 503.")
+@click.option('--batch-size', default=1, show_default=True, type=click.IntRange(min=1),
+              help="Requests a worker collects and sends to the LLM server together.")
+@click.option('--batch-window-ms', default=5.0, show_default=True, type=click.FloatRange(min=0),
+              help="How long a worker waits to fill a batch.")
+def serve(filepaths, host, port, workers, queue_size, batch_size, batch_window_ms):
+    """
+    Serve .axiom files or compiled .axiomc artifacts over HTTP.
+
+    Each prompt is available as POST /prompts/<meta id> with its inputs as a JSON
+    object, and answers with the output validated against its interface. GET /metrics
+    reports latency histograms and queue depth in the Prometheus text format.
+    Requests go to the LLM through the OpenAI-compatible endpoint; raise
+    --max-concurrency to at least --workers x --batch-size.
+    """
+    from axiom.server import InferenceServer, load_prompts
+
+    sdk = _initialize_sdk()
+    try:
+        prompts = load_prompts(filepaths, sdk)
+        server = InferenceServer(prompts, sdk.llm, workers=workers, queue_size=queue_size, batch_size=batch_size,
+                                 batch_window_ms=batch_window_ms)
+    except (ValueError, AssertionCompileError) as e:
+        click.secho(f"ERROR: {e}", fg='red')
+        raise click.Abort()
+
+    def on_ready(base_url):
+        click.secho(f"Serving {len(prompts)} prompt(s) on {base_url}", fg='green')
+        for prompt_id in prompts:
+            click.echo(f"  POST {base_url}/prompts/{prompt_id}")
+
+    try:
+        server.run(host, port, on_ready=on_ready)
+    except KeyboardInterrupt:
+        click.echo("\nServer stopped.")
+
+
+@cli.command('stub-server')
+@click.option('--host', default="127.0.0.1", show_default=True)
+@click.option('--port', default=8765, show_default=True, type=int)
+@click.option('--latency', default="fixed:0", show_default=True,
+              help="Time to first token in ms: fixed:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV or lognormal:MEDIAN:SIGMA.")
+@click.option('--tokens-per-second', default=0.0, show_default=True, type=click.FloatRange(min=0),
+              help="Pace generation at this rate after the first token (0 means instant).")
+@click.option('--error-rate', default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Fraction of requests answered with --error-status.")
+@click.option('--error-status', default=500, show_default=True, type=int)
+@click.option('--malformed-rate', default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Fraction of completions whose JSON is deliberately broken.")
+@click.option('--hang-rate', default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Fraction of requests that stall for --hang-seconds, to exercise client timeouts.")
+@click.option('--hang-seconds', default=300.0, show_default=True, type=click.FloatRange(min=0))
+@click.option('--slots', default=0, show_default=True, type=click.IntRange(min=0),
+              help="Maximum requests generated at once; the rest queue (0 means unlimited).")
+@click.option('--script', type=click.Path(exists=True, dir_okay=False),
+              help="JSON object mapping prompt hashes to responses.")
+@click.option('--default-response', default="{}", show_default=True,
+              help="Completion for prompts that are not in the script.")
+@click.option('--record', type=click.Path(dir_okay=False),
+              help="Append unscripted prompts and their hashes to this JSONL file.")
+@click.option('--prefill-tokens-per-second', default=0.0, show_default=True, type=click.FloatRange(min=0),
+              help="Add the time to process uncached prompt tokens at this rate to the first token (0 means free).")
+@click.option('--prefix-cache', 'prefix_cache_size', default=0, show_default=True, type=click.IntRange(min=0),
+              help="Remember this many prompts sent with cache_prompt and skip prefilling their shared prefix.")
+@click.option('--seed', default=0, show_default=True, type=int, help="Seed for all injected randomness.")
+def stub_server(host, port, latency, tokens_per_second, error_rate, error_status, malformed_rate, hang_rate,
+                hang_seconds, slots, script, default_response, record, prefill_tokens_per_second, prefix_cache_size,
+                seed):
+    """
+    Run a local OpenAI-compatible stand-in for the LLM server.
+
+    Use it for offline load and latency testing by pointing the CLI at it with
+    --backend openai --base-url http://HOST:PORT/v1.
+    """
+    from llm.stub_server import StubServer
+
+    try:
+        server = StubServer(latency=latency, tokens_per_second=tokens_per_second, error_rate=error_rate,
+                            error_status=error_status, malformed_rate=malformed_rate, hang_rate=hang_rate,
+                            hang_seconds=hang_seconds, slots=slots,
+                            script=StubServer.load_script(script) if script else None,
+                            default_response=default_response, record_path=record, seed=seed,
+                            prefill_tokens_per_second=prefill_tokens_per_second,
+                            prefix_cache_size=prefix_cache_size)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    def on_ready(base_url):
+        click.secho(f"Stub LLM server listening on {base_url}", fg='green')
+        click.echo(f"Use: python main.py --backend openai --base-url {base_url} test FILE")
+
+    try:
+        server.run(host, port, on_ready=on_ready)
+    except KeyboardInterrupt:
+        click.echo(f"\nServed {server.stats['requests']} requests.")
+
+
 if __name__ == "__main__":
-    _initialize_sdk().improve("financial_bot.axiom", "Refuses to give stock advice")
     cli()
\ No newline at end of file
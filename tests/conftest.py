@@ -0,0 +1,17 @@
+import pytest
+
+from axiom.history import TestHistory
+from axiom.parse_cache import ParseCache
+from axiom.sdk import AxiomSDK
+
+
+@pytest.fixture
+def make_sdk(tmp_path, monkeypatch):
+    """Builds an AxiomSDK around a fake LLM, with every cache and history kept out of the working tree."""
+    monkeypatch.chdir(tmp_path)
+
+    def make(llm, **options):
+        options.setdefault("history", TestHistory(path=None))
+        return AxiomSDK(llm, parse_cache=ParseCache(directory=None), **options)
+
+    return make
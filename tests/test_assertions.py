@@ -0,0 +1,44 @@
+import pytest
+
+from axiom.assertions import AssertionCompileError, compile_assertion, evaluate_assertion, referenced_fields
+
+OUTPUT = {"sentiment": "Positive", "confidence": 0.95, "reasons": ["great quality", "fast shipping"]}
+
+
+@pytest.mark.parametrize("expression", [
+    "output['sentiment'] == 'Positive'",
+    "output['confidence'] > 0.9 and length_is(output['reasons'], '==', 2)",
+    "contains_substring(output['reasons'], 'quality')",
+    "[r for r in output['reasons'] if 'quality' in r] == ['great quality']",
+    "is_in_range(output['confidence'], 0.5, 1)",
+    "f\"{output['sentiment']}!\" == 'Positive!'",
+    "output['sentiment'].upper() == 'POSITIVE'",
+])
+def test_allowed_assertions_evaluate(expression):
+    assert evaluate_assertion(expression, OUTPUT)
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("output['a'] ==", "Invalid syntax"),
+    ("output.__class__", "Private name"),
+    ("_secret", "Private name"),
+    ("(lambda: 1)()", "'Lambda' is not allowed"),
+    ("[x := 1]", "'NamedExpr' is not allowed"),
+    ("'{0.__class__.__mro__}'.format(output)", "'.format' is not allowed"),
+    ("'{o.__class__}'.format_map({'o': output})", "'.format_map' is not allowed"),
+    ("output['sentiment'].format", "'.format' is not allowed"),
+])
+def test_disallowed_assertions_are_rejected(expression, message):
+    with pytest.raises(AssertionCompileError, match=message):
+        compile_assertion(expression)
+
+
+@pytest.mark.parametrize("expression", ["open('x')", "len(output)"])
+def test_builtins_are_not_available(expression):
+    with pytest.raises(NameError):
+        evaluate_assertion(expression, OUTPUT)
+
+
+def test_referenced_fields():
+    assert referenced_fields("output['a'] == 1 and output['b'] > 2") == {"a", "b"}
+    assert referenced_fields("length_is(output, '==', 3)") is None
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from axiom.batch import CompletedRecords, result_line, scan_output
+
+
+def _lines(*records) -> str:
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def test_completed_records_tracks_indices_out_of_order():
+    completed = CompletedRecords()
+    for index in (0, 2, 3, 1, 3, 6):
+        completed.add(index)
+    assert completed.count == 5
+    assert completed.watermark == 4
+    assert completed.ahead == {6}
+    assert [i for i in range(8) if i in completed] == [0, 1, 2, 3, 6]
+
+
+def test_missing_output_has_no_completed_records(tmp_path):
+    assert scan_output(tmp_path / "out.jsonl").count == 0
+
+
+def test_final_line_without_newline_is_truncated(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(_lines({"index": 0, "output": {}}) + '{"index": 1, "out')
+    completed = scan_output(path)
+    assert completed.count == 1 and 0 in completed and 1 not in completed
+    assert path.read_text() == _lines({"index": 0, "output": {}})
+
+
+def test_complete_final_line_is_kept(tmp_path):
+    path = tmp_path / "out.jsonl"
+    content = _lines({"index": 0, "output": {}}, {"index": 1, "output": {}})
+    path.write_text(content)
+    assert scan_output(path).count == 2
+    assert path.read_text() == content
+
+
+@pytest.mark.parametrize("bad_line", ['not json\n', '{"output": {}}\n', '[1, 2]\n', '{"index": "1"}\n'])
+def test_malformed_line_raises_and_leaves_the_file_alone(tmp_path, bad_line):
+    path = tmp_path / "out.jsonl"
+    content = _lines({"index": 0, "output": {}}) + bad_line + _lines({"index": 2, "output": {}}) + '{"ind'
+    path.write_text(content)
+    with pytest.raises(ValueError, match="line 2"):
+        scan_output(path)
+    assert path.read_text() == content
+
+
+def test_errors_are_kept_without_retry(tmp_path):
+    path = tmp_path / "out.jsonl"
+    content = _lines({"index": 0, "error": "boom"}, {"index": 1, "output": {}})
+    path.write_text(content)
+    assert scan_output(path).count == 2
+    assert path.read_text() == content
+
+
+def test_retry_errors_removes_error_lines(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(_lines({"index": 0, "error": "boom"}, {"index": 1, "output": {}}, {"index": 2, "error": "x"})
+                    + '{"index": 3')
+    completed = scan_output(path, retry_errors=True)
+    assert completed.count == 1 and 1 in completed and 0 not in completed
+    assert path.read_text() == _lines({"index": 1, "output": {}})
+
+    # Appending the retried results leaves one line per index.
+    with path.open("a") as f:
+        f.write(result_line(0, {"answer": 1}))
+        f.write(result_line(2, {"error": "still failing"}))
+    indices = [json.loads(line)["index"] for line in path.read_text().splitlines()]
+    assert sorted(indices) == [0, 1, 2]
+    assert scan_output(path, retry_errors=True).count == 2
+    assert len(path.read_text().splitlines()) == 2
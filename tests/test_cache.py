@@ -0,0 +1,62 @@
+import pytest
+
+from llm import cache as cache_module
+from llm.cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def test_key_depends_on_every_part_of_the_request():
+    key = ResponseCache.make_key("m", "system", "user", {"temperature": 0.1})
+    assert key == ResponseCache.make_key("m", "system", "user", {"temperature": 0.1})
+    assert key != ResponseCache.make_key("other", "system", "user", {"temperature": 0.1})
+    assert key != ResponseCache.make_key("m", "system", "user!", {"temperature": 0.1})
+    assert key != ResponseCache.make_key("m", "system", "user", {"temperature": 0.2})
+
+
+def test_hits_misses_and_persistence(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path)
+    assert cache.get("k") is None
+    cache.put("k", {"answer": 42})
+    assert cache.get("k") == {"answer": 42}
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("k") == {"answer": 42}
+    reopened.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "responses.sqlite3", max_entries=2)
+    cache.put("a", {"v": "a"})
+    clock[0] += 1
+    cache.put("b", {"v": "b"})
+    clock[0] += 1
+    assert cache.get("a") == {"v": "a"}  # "b" is now the least recently used entry.
+    clock[0] += 1
+    cache.put("c", {"v": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": "a"}
+    assert cache.get("c") == {"v": "c"}
+    cache.close()
+
+
+def test_expired_entries_are_misses_and_purged_on_open(tmp_path, clock):
+    path = tmp_path / "responses.sqlite3"
+    cache = ResponseCache(path, max_age_seconds=60)
+    cache.put("k", {"v": 1})
+    clock[0] += 61
+    assert cache.get("k") is None
+    cache.close()
+
+    reopened = ResponseCache(path, max_age_seconds=60)
+    assert reopened.stats()["entries"] == 0
+    reopened.close()
@@ -0,0 +1,101 @@
+import sqlite3
+
+from axiom.history import TestHistory
+from axiom.sdk import AxiomSDK, _template
+
+FINGERPRINT = ("prompt", "user", "assertions")
+OTHER_FINGERPRINT = ("edited prompt", "user", "assertions")
+
+
+def test_fingerprint_changes_with_everything_a_test_depends_on():
+    template = _template("Review: {{ text }}")
+    test_case = {"name": "t", "inputs": {"text": "great"}, "assert": [{"expression": "output['ok']"}]}
+    base = AxiomSDK._test_fingerprint(test_case, "p1", template)
+
+    assert AxiomSDK._test_fingerprint(dict(test_case), "p1", template) == base
+    assert AxiomSDK._test_fingerprint(test_case, "p2", template) != base
+    assert AxiomSDK._test_fingerprint({**test_case, "inputs": {"text": "awful"}}, "p1", template) != base
+    assert AxiomSDK._test_fingerprint(test_case, "p1", _template("Text: {{ text }}")) != base
+    assert AxiomSDK._test_fingerprint({**test_case, "assert": [{"expression": "not output['ok']"}]},
+                                      "p1", template) != base
+
+
+def test_prompt_hash_includes_the_model(make_sdk):
+    class Model:
+        def __init__(self, model_id):
+            self.model_id = model_id
+
+    sdk_a = make_sdk(Model("a"))
+    sdk_b = make_sdk(Model("b"))
+    assert sdk_a._prompt_hash("system") != sdk_b._prompt_hash("system")
+    assert sdk_a._prompt_hash("system") == sdk_a._prompt_hash("system")
+
+
+def test_recent_passes_are_per_fingerprint():
+    history = TestHistory(path=None)
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT), ("t2", False, 0.1, FINGERPRINT)])
+    history.record("suite", [("t1", False, 0.1, OTHER_FINGERPRINT)])
+    assert history.recent_passes("suite") == {("t1", FINGERPRINT)}
+    assert history.recent_passes("other suite") == set()
+
+
+def test_later_failure_invalidates_a_pass():
+    history = TestHistory(path=None)
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT)])
+    history.record("suite", [("t1", False, 0.1, FINGERPRINT)])
+    assert history.recent_passes("suite") == set()
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT)])
+    assert history.recent_passes("suite") == {("t1", FINGERPRINT)}
+
+
+def test_old_passes_are_not_trusted(monkeypatch):
+    history = TestHistory(path=None, recent_pass_seconds=60)
+    monkeypatch.setattr("axiom.history.time.time", lambda: 1_000_000.0)
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT)])
+    monkeypatch.setattr("axiom.history.time.time", lambda: 1_000_000.0 + 61)
+    assert history.recent_passes("suite") == set()
+
+
+def test_last_outcomes_follow_the_latest_run():
+    history = TestHistory(path=None)
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT), ("t2", True, 0.1, FINGERPRINT)])
+    history.record("suite", [("t2", False, 0.1, OTHER_FINGERPRINT)])
+    assert history.last_outcomes("suite") == {"t1": True, "t2": False}
+
+
+def test_failure_scores_are_smoothed_over_the_window():
+    history = TestHistory(path=None, window=3)
+    for passed in (False, False, True, True, False):
+        history.record("suite", [("t1", passed, 0.1, FINGERPRINT)])
+    history.record("suite", [("t2", True, 0.1, FINGERPRINT)])
+    scores = history.failure_scores("suite")
+    # Only the last three runs of t1 count: one failure in three runs.
+    assert scores["t1"] == (1 + 1) / (3 + 2)
+    assert scores["t2"] == (0 + 1) / (1 + 2)
+    assert "t3" not in scores
+
+
+def test_history_persists_across_instances(tmp_path):
+    path = tmp_path / "history.sqlite3"
+    history = TestHistory(path=path)
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT)])
+    history.close()
+    assert TestHistory(path=path).recent_passes("suite") == {("t1", FINGERPRINT)}
+
+
+def test_history_without_fingerprints_is_migrated(tmp_path):
+    path = tmp_path / "history.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE results (id INTEGER PRIMARY KEY, suite TEXT NOT NULL, test TEXT NOT NULL,"
+                 " passed INTEGER NOT NULL, latency REAL, created_at REAL NOT NULL)")
+    conn.execute("INSERT INTO results (suite, test, passed, latency, created_at) VALUES ('suite', 't1', 0, 0.1,"
+                 " strftime('%s', 'now'))")
+    conn.commit()
+    conn.close()
+
+    history = TestHistory(path=path)
+    # Old rows still count towards ordering, but never as a fingerprinted pass.
+    assert history.last_outcomes("suite") == {"t1": False}
+    assert history.recent_passes("suite") == set()
+    history.record("suite", [("t1", True, 0.1, FINGERPRINT)])
+    assert history.recent_passes("suite") == {("t1", FINGERPRINT)}
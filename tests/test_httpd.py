@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from llm.httpd import Response, serve
+
+
+async def _hello(request):
+    return Response(200, f"{request.method} {request.path} {request.body.decode()}")
+
+
+async def _exchange(payload: bytes, pause: float = 0.0, **timeouts) -> bytes:
+    server = await serve(_hello, "127.0.0.1", 0, **timeouts)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(payload)
+        await writer.drain()
+        if pause:
+            await asyncio.sleep(pause)
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+    finally:
+        server.close()
+        await server.wait_closed()
+
+
+def test_request_is_answered():
+    response = asyncio.run(_exchange(b"POST /x HTTP/1.1\r\nContent-Length: 2\r\nConnection: close\r\n\r\nhi"))
+    assert response.startswith(b"HTTP/1.1 200 OK")
+    assert response.endswith(b"POST /x hi")
+
+
+def test_oversized_header_is_rejected_with_431():
+    payload = b"GET / HTTP/1.1\r\nX-Big: " + b"a" * 100_000 + b"\r\n\r\n"
+    assert asyncio.run(_exchange(payload)).startswith(b"HTTP/1.1 431 ")
+
+
+def test_oversized_request_line_is_rejected_with_414():
+    payload = b"GET /" + b"a" * 100_000 + b" HTTP/1.1\r\n\r\n"
+    assert asyncio.run(_exchange(payload)).startswith(b"HTTP/1.1 414 ")
+
+
+@pytest.mark.parametrize("length", [b"-1", b"abc", b"+2", b"1_0", b""])
+def test_invalid_content_length_is_rejected_with_400(length):
+    payload = b"POST / HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\nhi"
+    assert asyncio.run(_exchange(payload)).startswith(b"HTTP/1.1 400 ")
+
+
+def test_slow_request_times_out_with_408():
+    # The body never arrives.
+    payload = b"POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc"
+    assert asyncio.run(_exchange(payload, read_timeout=0.1)).startswith(b"HTTP/1.1 408 ")
+
+
+def test_idle_connection_is_closed():
+    assert asyncio.run(_exchange(b"", idle_timeout=0.1)) == b""
@@ -0,0 +1,49 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from llm.json_repair import JSONRepairError, repair_json
+
+CORPUS = Path(__file__).parent.parent / "benchmarks" / "data" / "malformed_json.jsonl"
+
+
+def _corpus():
+    with CORPUS.open() as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("case", _corpus(), ids=lambda case: case["name"])
+def test_corpus_is_recovered(case):
+    assert repair_json(case["raw"]) == case["expected"]
+
+
+def test_json_fence_is_preferred_over_braces_in_prose():
+    text = 'Here is the JSON with {sentiment} filled in:\n```json\n{"sentiment": "Positive"}\n```'
+    assert repair_json(text) == {"sentiment": "Positive"}
+
+
+def test_broken_json_inside_a_fence_is_repaired_alone():
+    text = 'Use {this}:\n```json\n{"a": 1, "b": [1, 2,],}\n```\nThen {that}.'
+    assert repair_json(text) == {"a": 1, "b": [1, 2]}
+
+
+def test_braces_in_prose_are_skipped_for_the_real_object():
+    text = 'I filled in {sentiment} and {reasons} below.\n{"sentiment": "Mixed", "reasons": ["late"]}'
+    assert repair_json(text) == {"sentiment": "Mixed", "reasons": ["late"]}
+
+
+@pytest.mark.parametrize("text", [
+    "No JSON here at all.",
+    "Here is the JSON with {sentiment} filled in.",
+    "The answer is {} as expected.",
+    "Pick one of {positive negative mixed}.",
+])
+def test_prose_is_not_mistaken_for_json(text):
+    with pytest.raises(JSONRepairError):
+        repair_json(text)
+
+
+def test_truncated_output_keeps_what_arrived():
+    assert repair_json('{"sentiment": "Positive", "reasons": ["great val') == {
+        "sentiment": "Positive", "reasons": ["great val"]}
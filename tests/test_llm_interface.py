@@ -0,0 +1,87 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from llm.llm_interface import LLMInterface
+
+
+class FakeAsyncOpenAI:
+    """Stands in for openai.AsyncOpenAI: echoes the user prompt back as JSON."""
+
+    created = 0
+
+    def __init__(self, **options):
+        FakeAsyncOpenAI.created += 1
+        self.closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=SimpleNamespace(create=self._create)))
+
+    async def _create(self, model, messages, **options):
+        await asyncio.sleep(0.001)
+        completion = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"echo": messages[-1]["content"]})))],
+            usage=None,
+        )
+        return SimpleNamespace(parse=lambda: completion, retries_taken=0)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    import openai
+
+    monkeypatch.setattr(openai, "AsyncOpenAI", FakeAsyncOpenAI)
+    FakeAsyncOpenAI.created = 0
+    llm = LLMInterface(backend="openai")
+    yield llm
+    llm.close()
+
+
+def test_execute_many_returns_outputs_in_request_order(llm):
+    outputs = llm.execute_many([("system", f"user {i}") for i in range(5)])
+    assert outputs == [{"echo": f"user {i}"} for i in range(5)]
+
+
+def test_execute_many_keeps_the_pooled_client_between_calls(llm):
+    llm.execute_many([("system", "a")])
+    client = llm._async_client
+    llm.execute_many([("system", "b"), ("system", "c")])
+    assert llm._async_client is client
+    assert FakeAsyncOpenAI.created == 1
+    llm.close()
+    assert client.closed
+
+
+def test_client_of_a_previous_event_loop_is_closed(llm):
+    assert asyncio.run(llm.aexecute("system", "a")) == {"echo": "a"}
+    first = llm._async_client
+    assert asyncio.run(llm.aexecute("system", "b")) == {"echo": "b"}
+    assert llm._async_client is not first
+    assert first.closed
+    assert not llm._async_client.closed
+
+
+def test_execute_many_refuses_to_run_inside_an_event_loop(llm):
+    async def call():
+        return llm.execute_many([("system", "a")])
+
+    with pytest.raises(RuntimeError, match="aexecute"):
+        asyncio.run(call())
+
+
+@pytest.mark.parametrize("response", ["[" * 100_000 + "]" * 100_000,
+                                      "Here you go: " + '{"a": ' * 50_000 + "1" + "}" * 50_000])
+def test_deeply_nested_response_is_reported_as_invalid_json(response):
+    parsed = LLMInterface(backend="openai")._parse_response(response)
+    assert parsed["error"] == "Invalid JSON response"
+
+
+def test_prompt_cache_with_the_lmstudio_backend_warns(caplog):
+    LLMInterface(backend="lmstudio", prompt_cache=True)
+    assert "LM Studio SDK ignore it" in caplog.text
+    caplog.clear()
+    LLMInterface(backend="openai", prompt_cache=True)
+    assert caplog.text == ""
@@ -0,0 +1,16 @@
+import pytest
+from click.testing import CliRunner
+
+import main
+
+
+def test_improve_rejects_a_test_name_with_auto(tmp_path, monkeypatch):
+    def initialize_sdk(**kwargs):
+        pytest.fail("the SDK must not be initialised for an invalid option combination")
+
+    path = tmp_path / "prompt.axiom"
+    path.write_text("")
+    monkeypatch.setattr(main, "_initialize_sdk", initialize_sdk)
+    result = CliRunner().invoke(main.cli, ["improve", str(path), "--auto", "--test-name", "t1"])
+    assert result.exit_code == 2
+    assert "drop --test-name or --auto" in result.output
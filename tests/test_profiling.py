@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from llm import profiling
+from axiom.sdk import _template
+
+
+@pytest.fixture
+def tracer():
+    tracer = profiling.enable()
+    yield tracer
+    profiling.disable()
+
+
+class EchoLLM:
+    def execute(self, system_prompt, user_prompt):
+        with profiling.span("execute"):
+            time.sleep(0.01)
+            return {"ok": True}
+
+
+def test_spans_nest_across_the_test_pool(make_sdk, tracer):
+    tests = [{"name": f"t{i}", "inputs": {}, "assert": [{"expression": "output['ok']"}]} for i in range(4)]
+    sdk = make_sdk(EchoLLM(), jobs=4)
+    with profiling.span("command") as command:
+        sdk._run_tests(tests, "system", _template("hi"), echo=lambda *a, **k: None)
+
+    by_id = {span.id: span for span in tracer.spans}
+    test_spans = [span for span in tracer.spans if span.name == "test"]
+    assert len(test_spans) == 4
+    assert {span.parent_id for span in test_spans} == {command.id}
+    assert len({span.thread for span in test_spans}) > 1
+    for span in tracer.spans:
+        if span.name == "execute":
+            assert by_id[span.parent_id].name == "test"
+
+
+def test_span_is_a_no_op_while_profiling_is_off():
+    assert profiling.active_tracer() is None
+    with profiling.span("anything") as span:
+        span.set(key="value")
@@ -0,0 +1,191 @@
+import threading
+import time
+
+import pytest
+
+from axiom.parse_cache import ParseCache
+from axiom.sdk import AxiomSDK, _template
+
+
+class SlowLLM:
+    """Answers later tests faster, so a pool finishes them out of order."""
+
+    def __init__(self, count: int):
+        self.count = count
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def execute(self, system_prompt, user_prompt):
+        index = int(user_prompt.split()[-1])
+        with self._lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01 * (self.count - index))
+        with self._lock:
+            self.active -= 1
+        return {"value": index}
+
+
+def _tests(count):
+    return [{"name": f"t{i}", "inputs": {"i": i}, "assert": [{"expression": f"output['value'] == {i}"}]}
+            for i in range(count)]
+
+
+def test_run_tests_keeps_suite_order_with_jobs(make_sdk):
+    llm = SlowLLM(6)
+    sdk = make_sdk(llm, jobs=3)
+    lines = []
+    results = sdk._run_tests(_tests(6), "system", _template("Item {{ i }}"),
+                             echo=lambda message='', **style: lines.append(message))
+
+    assert [name for name, *_ in results] == [f"t{i}" for i in range(6)]
+    assert all(passed for _, passed, _, _ in results)
+    running = [line for line in lines if "[RUNNING]" in line]
+    assert running == [f"\n[RUNNING] Test: \"t{i}\"" for i in range(6)]
+    assert llm.peak == 3
+
+
+def test_run_tests_is_sequential_with_one_job(make_sdk):
+    llm = SlowLLM(3)
+    sdk = make_sdk(llm)
+    results = sdk._run_tests(_tests(3), "system", _template("Item {{ i }}"), echo=lambda *a, **k: None)
+    assert [passed for _, passed, _, _ in results] == [True, True, True]
+    assert llm.peak == 1
+
+
+def test_nested_pools_share_the_jobs_bound(make_sdk):
+    llm = SlowLLM(4)
+    sdk = make_sdk(llm, jobs=2)
+    quiet = lambda *a, **k: None
+    # Three suites at once, as beam candidates or improve sandboxes run them.
+    suites = [threading.Thread(target=sdk._run_tests, args=(_tests(4), f"system {n}", _template("Item {{ i }}"),
+                                                            quiet)) for n in range(3)]
+    for thread in suites:
+        thread.start()
+    for thread in suites:
+        thread.join()
+    assert llm.peak == 2
+
+
+def test_parse_batch_verdicts_orders_by_id():
+    response = {"results": [{"id": 2, "isValid": False}, {"id": 1, "isValid": True}]}
+    assert AxiomSDK._parse_batch_verdicts(response, 2) == [True, False]
+
+
+def test_parse_batch_verdicts_uses_position_without_ids():
+    response = {"results": [{"isValid": True}, {"isValid": False}]}
+    assert AxiomSDK._parse_batch_verdicts(response, 2) == [True, False]
+
+
+@pytest.mark.parametrize("response", [
+    {},
+    {"results": "yes"},
+    {"results": [{"id": 1, "isValid": True}]},  # One verdict short.
+    {"results": [{"id": 1, "isValid": True}, {"id": 1, "isValid": False}]},  # Duplicate id.
+    {"results": [{"id": 1, "isValid": True}, {"id": 3, "isValid": False}]},  # Id out of range.
+    {"results": [{"id": 1, "isValid": "true"}, {"id": 2, "isValid": False}]},  # Not a boolean.
+    {"results": [{"id": True, "isValid": True}, {"id": 2, "isValid": False}]},
+])
+def test_parse_batch_verdicts_rejects_malformed_responses(response):
+    assert AxiomSDK._parse_batch_verdicts(response, 2) is None
+
+
+def test_parse_batch_conflicts_orders_by_pair():
+    response = {"results": [{"pair": 2, "is_conflicting": False}, {"pair": 1, "is_conflicting": True, "reason": "r"}]}
+    assert AxiomSDK._parse_batch_conflicts(response, 2) == [(True, "r"), (False, None)]
+
+
+@pytest.mark.parametrize("response", [
+    {},
+    {"results": [{"pair": 1, "is_conflicting": True}]},  # One verdict short.
+    {"results": [{"pair": 1, "is_conflicting": True}, {"pair": 1, "is_conflicting": False}]},  # Duplicate pair.
+    {"results": [{"pair": 1, "is_conflicting": True}, {"pair": 3, "is_conflicting": False}]},  # Pair out of range.
+    {"results": [{"pair": 1, "is_conflicting": "no"}, {"pair": 2, "is_conflicting": False}]},  # Not a boolean.
+    {"results": [{"pair": True, "is_conflicting": True}, {"pair": 2, "is_conflicting": False}]},
+])
+def test_parse_batch_conflicts_rejects_malformed_responses(response):
+    assert AxiomSDK._parse_batch_conflicts(response, 2) is None
+
+
+class ValidatorLLM:
+    def __init__(self, batch_response):
+        self.batch_response = batch_response
+        self.calls = []
+
+    def execute(self, system_prompt, user_prompt):
+        self.calls.append(user_prompt)
+        if system_prompt == AxiomSDK.BATCH_SEMANTIC_CHECK_SYSTEM_PROMPT:
+            return self.batch_response
+        return {"isValid": "good" in user_prompt}
+
+
+def test_semantic_checks_are_validated_in_one_call(make_sdk):
+    llm = ValidatorLLM({"results": [{"id": 1, "isValid": True}, {"id": 2, "isValid": False}]})
+    verdicts = make_sdk(llm)._run_semantic_checks([("good", "is good"), ("bad", "is good")])
+    assert verdicts == [True, False]
+    assert len(llm.calls) == 1
+
+
+def test_validator_system_prompt_is_the_same_for_every_check(make_sdk):
+    sdk = make_sdk(None)
+    first, first_checks = sdk._construct_semantic_check_prompt({"a": 1}, "is short")
+    second, second_checks = sdk._construct_semantic_check_prompt(["b"], "mentions b")
+    assert first == second == AxiomSDK.SEMANTIC_CHECK_SYSTEM_PROMPT
+    assert "is short" in first_checks and "mentions b" in second_checks
+    batch, batch_checks = sdk._construct_batch_semantic_check_prompt([("a", "r1"), ("b", "r2")])
+    assert batch == AxiomSDK.BATCH_SEMANTIC_CHECK_SYSTEM_PROMPT
+    assert "**Check 2:**" in batch_checks
+
+
+def test_prompt_cache_sends_a_canonical_system_prompt(make_sdk, monkeypatch):
+    sdk = make_sdk(None, prompt_cache=True)
+    monkeypatch.setattr(sdk, "_generate_system_prompt", lambda prompt_dict, use_examples: prompt_dict["text"])
+    first = sdk._test_system_prompt({"text": "Rules:  \r\n- Be brief.\t\r\n"})
+    second = sdk._test_system_prompt({"text": "Rules:\n- Be brief.\n\n"})
+    assert first == "Rules:\n- Be brief."
+    assert first is second
+
+
+def test_malformed_batch_verdicts_fall_back_to_one_call_per_check(make_sdk):
+    llm = ValidatorLLM({"results": []})
+    verdicts = make_sdk(llm)._run_semantic_checks([("good", "r1"), ("bad", "r2")], echo=lambda *a, **k: None)
+    assert verdicts == [True, False]
+    assert len(llm.calls) == 3
+
+
+def test_history_is_in_memory_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sdk = AxiomSDK(None, parse_cache=ParseCache(directory=None))
+    assert sdk.history.path is None
+    assert not (tmp_path / ".axiom_cache").exists()
+
+
+def test_trial_rule_sets_are_not_recorded(make_sdk):
+    sdk = make_sdk(SlowLLM(2))
+    prompt_dict = {"meta": {"id": "suite"}, "rules": ["Be brief."], "payload": "Item {{ i }}", "tests": _tests(2)}
+    strategy = {"proposed_rules": ["Be very brief."]}
+    fixed, regression, ran, _ = sdk._sandbox_strategy(prompt_dict, strategy, prompt_dict["tests"][0],
+                                                      _template(prompt_dict["payload"]))
+    assert (fixed, regression, ran) == (True, None, 2)
+    sdk._run_all_tests_and_get_failures(prompt_dict, echo=lambda *a, **k: None, record=False)
+    assert sdk.history.last_outcomes("suite") == {}
+
+    sdk._run_all_tests_and_get_failures(prompt_dict, echo=lambda *a, **k: None)
+    assert sdk.history.last_outcomes("suite") == {"t0": True, "t1": True}
+
+
+def test_sampling_with_every_test_skipped_reports_nothing_to_do(make_sdk, capsys):
+    sdk = make_sdk(SlowLLM(1))
+    assert sdk._test_pass_rates([], "system", _template(""), samples=20, confidence=0.95, threshold=0.8) is True
+    assert "No tests left to sample" in capsys.readouterr().out
+
+
+def test_too_few_samples_to_pass_are_reported(make_sdk, capsys):
+    sdk = make_sdk(SlowLLM(1))
+    passed = sdk._test_pass_rates(_tests(1), "system", _template("Item {{ i }}"), samples=5, confidence=0.95,
+                                  threshold=0.8)
+    out = capsys.readouterr().out
+    assert "use --samples 12 or more" in out
+    assert passed is False
+    assert "UNDECIDED" in out
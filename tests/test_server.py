@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+from axiom.runtime import CompiledPrompt
+from axiom.server import InferenceServer, ServedPrompt
+from llm.httpd import Request
+
+
+class GatedLLM:
+    """Holds every completion until `release` is set, so requests pile up in the queue."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.calls = 0
+
+    async def aexecute(self, system_prompt, user_prompt):
+        self.calls += 1
+        await self.release.wait()
+        return {"echo": user_prompt}
+
+    async def aclose(self):
+        pass
+
+
+def _prompt() -> ServedPrompt:
+    return ServedPrompt(CompiledPrompt({
+        "id": "echo", "source_hash": "0", "system_prompt": "Echo.", "payload": "{{ text }}",
+        "prompt": {"interface": {"inputs": [{"name": "text", "type": "string"}],
+                                 "outputs": [{"name": "echo", "type": "string"}]}},
+    }))
+
+
+def _post(text: str) -> Request:
+    return Request("POST", "/prompts/echo", {}, json.dumps({"text": text}).encode())
+
+
+async def _serve_backlog(requests: int, queue_size: int) -> tuple[list, InferenceServer]:
+    llm = GatedLLM()
+    server = InferenceServer({"echo": _prompt()}, llm, workers=1, queue_size=queue_size)
+    await server.start("127.0.0.1", 0)
+    try:
+        tasks = []
+        for i in range(requests):
+            tasks.append(asyncio.create_task(server.handle(_post(f"request {i}"))))
+            # Give the worker the chance to take the first request before the queue fills up.
+            await asyncio.sleep(0.01)
+        llm.release.set()
+        return await asyncio.gather(*tasks), server
+    finally:
+        await server._shutdown()
+
+
+def test_full_queue_is_answered_with_503_and_retry_after():
+    responses, server = asyncio.run(_serve_backlog(requests=5, queue_size=2))
+    statuses = sorted(response.status for response in responses)
+    # One request is with the worker, two wait in the queue and the rest are turned away.
+    assert statuses == [200, 200, 200, 503, 503]
+    rejected = [response for response in responses if response.status == 503]
+    assert all(response.headers["Retry-After"] == "1" for response in rejected)
+    assert server.stats["rejected"] == 2
+    assert "axiom_rejected_total 2" in server.metrics()
+
+
+def test_requests_within_capacity_are_all_served():
+    responses, server = asyncio.run(_serve_backlog(requests=3, queue_size=2))
+    assert [response.status for response in responses] == [200, 200, 200]
+    assert json.loads(responses[0].body)["output"] == {"echo": "request 0"}
+    assert server.stats["rejected"] == 0
+
+
+class FixedLLM:
+    def __init__(self, output):
+        self.output = output
+
+    async def aexecute(self, system_prompt, user_prompt):
+        return self.output
+
+    async def aclose(self):
+        pass
+
+
+def _post_enum(llm_output, inputs) -> tuple:
+    prompt = ServedPrompt(CompiledPrompt({
+        "id": "mood", "source_hash": "0", "system_prompt": "Label.", "payload": "{{ mood }}",
+        "prompt": {"interface": {"inputs": [{"name": "mood", "type": 'Enum("happy","sad")'}],
+                                 "outputs": [{"name": "label", "type": 'Enum("up","down")'}]}},
+    }))
+    server = InferenceServer({"mood": prompt}, FixedLLM(llm_output), workers=1)
+
+    async def post():
+        await server.start("127.0.0.1", 0)
+        try:
+            return await server.handle(Request("POST", "/prompts/mood", {}, json.dumps(inputs).encode()))
+        finally:
+            await server._shutdown()
+
+    response = asyncio.run(post())
+    return response.status, json.loads(response.body)
+
+
+def test_unhashable_enum_input_is_a_bad_request():
+    for value in (["happy"], {"mood": "happy"}):
+        status, body = _post_enum({"label": "up"}, {"mood": value})
+        assert status == 400
+        assert "mood must be one of happy, sad" in body["error"]["details"][0]
+
+
+def test_unhashable_enum_output_is_a_bad_gateway():
+    for value in (["up"], {"label": "up"}):
+        status, body = _post_enum({"label": value}, {"mood": "happy"})
+        assert status == 502
+        assert "label must be one of down, up" in body["error"]["details"][0]
+
+
+def test_enum_values_are_accepted():
+    assert _post_enum({"label": "up"}, {"mood": "happy"}) == (200, {"id": "mood", "output": {"label": "up"}})
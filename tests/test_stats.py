@@ -0,0 +1,61 @@
+import pytest
+
+from axiom.stats import SequentialPassRate, wilson_interval
+
+
+def _runs_until_verdict(tracker: SequentialPassRate, passed: bool) -> int:
+    while tracker.verdict is None:
+        tracker.add(passed)
+    return tracker.runs
+
+
+def test_always_passing_test_is_accepted_after_the_minimum_runs():
+    tracker = SequentialPassRate(0.8, 0.95, 0.1)
+    assert tracker.min_runs_to_accept == 12
+    assert _runs_until_verdict(tracker, True) == 12
+    assert tracker.verdict is True
+
+
+def test_always_failing_test_is_rejected_quickly():
+    tracker = SequentialPassRate(0.8, 0.95, 0.1)
+    assert tracker.min_runs_to_reject == 3
+    assert _runs_until_verdict(tracker, False) == 3
+    assert tracker.verdict is False
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.95])
+@pytest.mark.parametrize("confidence", [0.8, 0.95, 0.99])
+def test_minimum_runs_match_the_test(threshold, confidence):
+    tracker = SequentialPassRate(threshold, confidence)
+    assert _runs_until_verdict(SequentialPassRate(threshold, confidence), True) == tracker.min_runs_to_accept
+    assert _runs_until_verdict(SequentialPassRate(threshold, confidence), False) == tracker.min_runs_to_reject
+
+
+def test_verdict_does_not_change_once_decided():
+    tracker = SequentialPassRate(0.8)
+    _runs_until_verdict(tracker, False)
+    for _ in range(20):
+        assert tracker.add(True) is False
+    assert (tracker.passes, tracker.runs) == (20, 23)
+
+
+def test_rate_at_the_threshold_stays_undecided_longer_than_clear_rates():
+    tracker = SequentialPassRate(0.8)
+    for passed in [True, True, True, True, False] * 4:
+        tracker.add(passed)
+    assert tracker.verdict is None
+
+
+@pytest.mark.parametrize("threshold, confidence, margin", [(0.5, 1.0, 0.1), (0.5, 0.0, 0.1), (0.5, 0.95, 0.0)])
+def test_impossible_parameters_are_rejected(threshold, confidence, margin):
+    with pytest.raises(ValueError):
+        SequentialPassRate(threshold, confidence, margin)
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(8, 10, 0.95)
+    assert low == pytest.approx(0.4902, abs=1e-4)
+    assert high == pytest.approx(0.9433, abs=1e-4)
+    assert wilson_interval(10, 10)[1] == pytest.approx(1.0)
+    assert wilson_interval(0, 10)[0] == pytest.approx(0.0, abs=1e-12)